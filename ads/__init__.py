@@ -5,8 +5,15 @@
 
 __version__ = "0.12.3"
 
+import sys
+
 from .metrics import MetricsQuery
 from .export import ExportQuery
-from .search import SearchQuery, query
+from .search import SearchQuery, BigQuery, query, fetch_references, \
+    fetch_citations
+from .harvest import Harvester
 from .base import RateLimits
+if sys.version_info >= (3, 5):
+    from .aio import AsyncSearchQuery, AsyncBigQuery, AsyncMetricsQuery, \
+        AsyncExportQuery
 #from .libraries import LibraryQuery, Library #soon
@@ -0,0 +1,342 @@
+"""
+asyncio interfaces to the adsws search, metrics and export services.
+Requires Python 3.5+ and aiohttp.
+"""
+
+import asyncio
+import collections
+import json
+import os
+import weakref
+
+import six
+
+import ads.config
+from .search import SearchQuery, SolrResponse, BigQuery
+from .metrics import MetricsQuery, MetricsResponse
+from .export import ExportQuery, ExportResponse
+
+
+class _HTTPResponse(object):
+    """
+    The parts of a requests.Response that APIResponse.load_http_response and
+    the response classes use, for a fully read aiohttp response
+    """
+    encoding = "utf-8"
+
+    def __init__(self, status_code, headers, content, url=None):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.url = url
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8")
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class AsyncQuery(object):
+    """
+    Mixin that sends the requests of a BaseQuery through an aiohttp
+    connection pool. All async queries running on an event loop share one
+    pool, and at most `max_concurrency` of their requests are in flight at
+    any time.
+    """
+    max_concurrency = 10
+    _pools = weakref.WeakKeyDictionary()  # event loop -> (session, semaphore)
+
+    @classmethod
+    def _pool(cls):
+        loop = asyncio.get_event_loop()
+        if loop not in AsyncQuery._pools:
+            import aiohttp
+            session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=cls.max_concurrency)
+            )
+            semaphore = asyncio.Semaphore(cls.max_concurrency)
+            AsyncQuery._pools[loop] = (session, semaphore)
+        return AsyncQuery._pools[loop]
+
+    @classmethod
+    async def close(cls):
+        """
+        Close the connection pool of the running event loop
+        """
+        pool = AsyncQuery._pools.pop(asyncio.get_event_loop(), None)
+        if pool is not None:
+            await pool[0].close()
+
+    @property
+    def session(self):
+        raise TypeError("{} sends its requests through an aiohttp pool; "
+                        "await execute() instead".format(type(self).__name__))
+
+    async def _request(self, method, url, params=None, data=None,
+                       headers=None):
+        """
+        Send a http request through the shared pool, or take its response
+        from ads.config.cache if it is set. Requests wait for
+        ads.config.scheduler, if it is set, without blocking the event loop;
+        cached responses do not wait for it
+        :param headers: headers to send in addition to self.headers
+        :return: the fully read response
+        :rtype: _HTTPResponse
+        """
+        cache = ads.config.cache
+        if cache is not None:
+            key = cache.key(method, url, params, data)
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+        scheduler = ads.config.scheduler
+        if scheduler is not None:
+            await self._acquire(scheduler, url)
+        http_response = await self._send_request(method, url, params, data,
+                                                 headers)
+        if scheduler is not None:
+            scheduler.update(url, http_response.headers)
+        if cache is not None:
+            cache.set(key, url, http_response)
+        return http_response
+
+    @staticmethod
+    async def _acquire(scheduler, url):
+        """
+        Wait until a request to `url` may be sent, as Scheduler.acquire
+        does, but by sleeping on the event loop
+        :raises BudgetExceededError: if the current job used its budget
+        """
+        priority = scheduler.charge()
+        while True:
+            wait = scheduler.try_acquire(url, priority)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    async def _send_request(self, method, url, params, data, headers=None):
+        if params is not None:
+            # Send lists as repeated params, like requests does
+            params = [
+                (k, six.text_type(v))
+                for k, values in six.iteritems(params)
+                for v in (values if isinstance(values, list) else [values])
+            ]
+        session, semaphore = self._pool()
+        async with semaphore:
+            async with session.request(method, url, params=params, data=data,
+                                       headers=dict(self.headers,
+                                                    **(headers or {}))) as r:
+                content = await r.read()
+                return _HTTPResponse(r.status, r.headers, content, str(r.url))
+
+
+def _sync_only(name):
+    """
+    Return a method that refuses to run the synchronous SearchQuery method
+    `name`, which would page through the results with blocking requests
+    """
+    def method(self, *args, **kwargs):
+        raise TypeError("{}.{} is not supported; use 'async for' instead"
+                        .format(type(self).__name__, name))
+    method.__name__ = name
+    return method
+
+
+class AsyncSearchQuery(AsyncQuery, SearchQuery):
+    """
+    Represents a query to apache solr that is iterated with `async for`
+    """
+    # SearchQuery options that rely on threads or blocking requests
+    UNSUPPORTED = ("prefetch", "parallel_pages", "incremental", "auto_fl")
+
+    def __init__(self, *args, **kwargs):
+        """
+        Takes the arguments of SearchQuery, except UNSUPPORTED
+        """
+        unsupported = [name for name in self.UNSUPPORTED if name in kwargs]
+        if unsupported:
+            raise TypeError("AsyncSearchQuery does not support {}".format(
+                ", ".join(unsupported)))
+        super(AsyncSearchQuery, self).__init__(*args, **kwargs)
+
+    stream = _sync_only("stream")
+    pages = _sync_only("pages")
+    to_columns = _sync_only("to_columns")
+    to_dataframe = _sync_only("to_dataframe")
+    to_arrow = _sync_only("to_arrow")
+
+    def __iter__(self):
+        raise TypeError("Use 'async for' to iterate over an AsyncSearchQuery")
+
+    def __next__(self):
+        raise TypeError("Use 'async for' to iterate over an AsyncSearchQuery")
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.response is None:
+            await self.execute()
+
+        if self._iter_counter - self._dropped >= len(self._articles):
+            reason = self._stop_reason(
+                self._retrieved, self.response.numFound, self.query['rows']
+            )
+            if reason is not None:
+                raise StopAsyncIteration(reason)
+            await self.execute()
+            if self._iter_counter - self._dropped >= len(self._articles):
+                raise StopAsyncIteration("All records found")
+
+        cur = self._articles[self._iter_counter - self._dropped]
+        self._iter_counter += 1
+        return cur
+
+    async def _get_response(self, query):
+        return SolrResponse.load_http_response(
+            await self._request("GET", self.HTTP_ENDPOINT, params=query)
+        )
+
+    async def execute(self):
+        """
+        Sends the http request implied by the self.query, and sets up the
+        query for the next page of results
+        """
+        self._load_response(await self._get_response(self.query))
+
+
+class AsyncBigQuery(AsyncSearchQuery, BigQuery):
+    """
+    Represents a query to the solr bigquery endpoint that is iterated with
+    `async for`
+    """
+    HTTP_ENDPOINT = BigQuery.HTTP_ENDPOINT
+
+    async def _get_response(self, query):
+        return SolrResponse.load_http_response(await self._request(
+            "POST",
+            self.HTTP_ENDPOINT,
+            params=query,
+            data=self.payload.encode("utf-8"),
+            headers={"Content-Type": "big-query/csv"},
+        ))
+
+
+class AsyncMetricsQuery(AsyncQuery, MetricsQuery):
+    """
+    Represents a query to the adsws metrics service, executed with await
+    """
+    async def execute(self):
+        """
+        Execute the http request to the metrics service. More than
+        MAX_BIBCODES bibcodes are sent in chunks, concurrently, and their
+        metrics are merged as MetricsQuery.execute merges them; the number
+        of concurrent requests is bounded by `max_concurrency` rather than
+        `workers`.
+        """
+        if len(self.bibcodes) <= self.MAX_BIBCODES:
+            self.response = MetricsResponse.load_http_response(
+                await self._request("POST", self.HTTP_ENDPOINT,
+                                    data=self.json_payload)
+            )
+        else:
+            self.response = self._merge(await asyncio.gather(
+                *[self._execute_chunk(chunk) for chunk in self._chunks()]
+            ))
+        return self.response.metrics
+
+    async def _execute_chunk(self, bibcodes):
+        """
+        Return the metrics of a chunk of bibcodes, and the (citation_count,
+        refereed, year) of its papers
+        """
+        async def fetch_articles():
+            # the counts are fetched from the api, as stored ones may be
+            # stale
+            articles = []
+            async for article in AsyncBigQuery(bibcodes,
+                                               fl=self.PAPER_FIELDS):
+                articles.append(article)
+            return articles
+
+        http_response, articles = await asyncio.gather(
+            self._request("POST", self.HTTP_ENDPOINT,
+                          data=json.dumps({"bibcodes": bibcodes})),
+            fetch_articles(),
+        )
+        metrics = MetricsResponse.load_http_response(http_response).metrics
+        return metrics, self._papers(articles, metrics)
+
+
+class AsyncExportQuery(AsyncQuery, ExportQuery):
+    """
+    Represents a query to the adsws export service, executed with await
+    """
+    async def execute(self):
+        """
+        Execute the http request to the export service, through
+        ads.config.export_cache if it is set
+        :return ads-classic formatted export string
+        """
+        self.response = await self._export_bibcodes(self.bibcodes,
+                                                    self.json_payload)
+        return self.response.result
+
+    async def stream(self, fp, chunk_size=None, workers=4):
+        """
+        Export the bibcodes in chunks, `workers` of them concurrently, and
+        write the export of each chunk to `fp` in the order of the
+        bibcodes, as ExportQuery.stream does
+        :param fp: file object, opened in text mode
+        :param chunk_size: bibcodes per request, CHUNK_SIZE by default
+        :param workers: number of requests to send concurrently
+        :return: number of characters written
+        """
+        pending = collections.deque()
+        written = 0
+        try:
+            for chunk in self._chunks(chunk_size):
+                pending.append(
+                    asyncio.ensure_future(self._export_bibcodes(chunk))
+                )
+                if len(pending) >= workers:
+                    written += self._write(fp, (await pending.popleft()).result)
+            while pending:
+                written += self._write(fp, (await pending.popleft()).result)
+        finally:
+            # a failed chunk abandons the requests of the following ones
+            for future in pending:
+                future.cancel()
+        return written
+
+    async def _export_bibcodes(self, bibcodes, payload=None):
+        """
+        Export `bibcodes`, requesting only those whose entries
+        ads.config.export_cache does not hold, as
+        ExportQuery._export_bibcodes does
+        :rtype: ExportResponse
+        """
+        payload = payload or json.dumps({"bibcode": bibcodes})
+        if ads.config.export_cache is None:
+            return await self._export(payload)
+        bibcodes, entries, missing = self._cached_entries(bibcodes)
+        if missing:
+            response = await self._export(json.dumps({"bibcode": missing}))
+            if not self._add_entries(entries, response, missing):
+                if len(missing) == len(bibcodes):
+                    return response
+                return await self._export(payload)
+        return self._assemble(entries, bibcodes)
+
+    async def _export(self, payload):
+        url = os.path.join(self.HTTP_ENDPOINT, self.format)
+        return ExportResponse.load_http_response(
+            await self._request("POST", url, data=payload)
+        )
@@ -6,6 +6,7 @@ import requests
 import warnings
 import json
 import os
+import six
 
 from .exceptions import APIResponseError
 from .config import TOKEN_FILES, TOKEN_ENVIRON_VARS
@@ -70,12 +71,44 @@ class RateLimits(Singleton):
         )
 
 
+class _HTTPHead(object):
+    """
+    The status and headers of a http response, without its body
+    """
+    def __init__(self, http_response):
+        self.status_code = http_response.status_code
+        self.headers = http_response.headers
+        self.ok = http_response.ok
+
+
 class APIResponse(object):
     """
     Represents an adsws-api http response
     """
     response = None
 
+    @staticmethod
+    def _lean():
+        """
+        True if responses should not hold on to their raw body
+        """
+        return ads.config.lean_responses and not ads.config.debug
+
+    @classmethod
+    def _decode(cls, http_response):
+        """
+        Decode the json body of `http_response` from its bytes, once, with
+        ads.config.json_decoder if it is set
+        :return: the decoded body, and the raw body text or None if
+            responses are lean
+        """
+        decoder = ads.config.json_decoder or json.loads
+        content = http_response.content
+        if decoder is json.loads and six.PY3 and isinstance(content, bytes):
+            content = content.decode("utf-8")
+        raw = None if cls._lean() else http_response.text
+        return decoder(content), raw
+
     @classmethod
     def get_ratelimits(cls):
         """
@@ -85,17 +118,21 @@ class APIResponse(object):
         return RateLimits.getRateLimits(cls.__name__).to_dict()
 
     @classmethod
-    def load_http_response(cls, http_response):
+    def load_http_response(cls, http_response, **kwargs):
         """
         This method should return an instantiated class and set its response
         to the requests.Response object.
+        :param kwargs: passed on to the constructor
         """
         if not http_response.ok:
             raise APIResponseError(http_response.text)
-        c = cls(http_response)
-        c.response = http_response
+        c = cls(http_response, **kwargs)
+        # Lean responses keep the status and headers, but not the body
+        c.response = _HTTPHead(http_response) if cls._lean() else http_response
 
-        RateLimits.getRateLimits(cls.__name__).set(c.response.headers)
+        # The rate limit headers of a cached response are out of date
+        if not getattr(http_response, "from_cache", False):
+            RateLimits.getRateLimits(cls.__name__).set(c.response.headers)
 
         return c
 
@@ -139,6 +176,17 @@ class BaseQuery(object):
     def token(self, value):
         self._token = value
 
+    @property
+    def headers(self):
+        """
+        http headers sent with every request
+        """
+        return {
+            "Authorization": "Bearer {}".format(self.token),
+            "User-Agent": "ads-api-client/{}".format(__version__),
+            "Content-Type": "application/json",
+        }
+
     @property
     def session(self):
         """
@@ -146,15 +194,38 @@ class BaseQuery(object):
         """
         if self._session is None:
             self._session = requests.session()
-            self._session.headers.update(
-                {
-                    "Authorization": "Bearer {}".format(self.token),
-                    "User-Agent": "ads-api-client/{}".format(__version__),
-                    "Content-Type": "application/json",
-                }
-            )
+            self._session.headers.update(self.headers)
         return self._session
 
+    def _request(self, method, url, params=None, data=None, headers=None,
+                 stream=False):
+        """
+        Send a http request with the session, through ads.config.cache and
+        ads.config.scheduler if they are set; cached responses do not wait
+        for the scheduler
+        :param stream: if True, the body is not read until it is iterated;
+            such responses are served from but not added to the cache
+        :return: requests.Response, with `from_cache` set if it was cached
+        """
+        cache = ads.config.cache
+        if cache is not None:
+            key = cache.key(method, url, params, data)
+            http_response = cache.get(key)
+            if http_response is not None:
+                return http_response
+        scheduler = ads.config.scheduler
+        if scheduler is not None:
+            scheduler.acquire(url)
+        http_response = self.session.request(
+            method, url, params=params, data=data, headers=headers,
+            stream=stream
+        )
+        if scheduler is not None:
+            scheduler.update(url, http_response.headers)
+        if cache is not None and not stream:
+            cache.set(key, url, http_response)
+        return http_response
+
     def __call__(self):
         return self.execute()
 
@@ -0,0 +1,386 @@
+"""
+Caches of adsws-api http responses, used by every BaseQuery when set as
+ads.config.cache
+"""
+
+from collections import OrderedDict
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+import requests
+import six
+
+from .config import ADSWS_API_URL
+from .utils import SQLiteDatabase
+
+
+def _record(http_response):
+    """
+    Return the parts of a requests.Response that a cache keeps
+    """
+    return {
+        "status_code": http_response.status_code,
+        "headers": dict(http_response.headers),
+        "url": http_response.url,
+        "encoding": http_response.encoding,
+        "content": http_response.content,
+    }
+
+
+def _response(record):
+    """
+    Rebuild a requests.Response from a cached record; its `from_cache`
+    attribute is True
+    """
+    http_response = requests.Response()
+    http_response.status_code = record["status_code"]
+    http_response.headers = requests.structures.CaseInsensitiveDict(
+        record["headers"]
+    )
+    http_response.url = record["url"]
+    http_response.encoding = record["encoding"]
+    http_response._content = record["content"]
+    # the body is read, so that iter_content serves it from _content
+    http_response._content_consumed = True
+    http_response.from_cache = True
+    return http_response
+
+
+class BaseCache(object):
+    """
+    Base class of the response caches. Subclasses store records under the
+    keys computed by `key`, until they expire.
+    """
+    def __init__(self, ttl=3600, ttls=None):
+        """
+        :param ttl: seconds for which responses are kept; None keeps them
+            until they are evicted
+        :param ttls: seconds for which the responses of each service are
+            kept, e.g. {"search": 600, "metrics": 86400}, overriding `ttl`
+        """
+        self.ttl = ttl
+        self.ttls = dict(ttls or {})
+        self.hits = 0
+        self.misses = 0
+        self._counter_lock = threading.Lock()
+
+    @staticmethod
+    def key(method, url, params=None, data=None):
+        """
+        Return the key of a request, from a canonical form of its method,
+        url, params and payload: values are stripped of redundant
+        whitespace, and the fields of "fl" are sorted
+        """
+        params_ = []
+        for name, values in sorted(six.iteritems(params or {})):
+            if not isinstance(values, (list, tuple)):
+                values = [values]
+            values = [u" ".join(six.text_type(v).split()) for v in values]
+            if name == "fl":
+                values = sorted(set(
+                    f.strip() for v in values for f in v.split(",")
+                ))
+            params_.append([name, values])
+        if isinstance(data, six.binary_type):
+            data = data.decode("utf-8")
+        canonical = json.dumps([method.upper(), url, params_, data])
+        return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def service(url):
+        """
+        Return the name of the adsws service of `url`, e.g. "search"
+        """
+        if url.startswith(ADSWS_API_URL):
+            url = url[len(ADSWS_API_URL):]
+        return url.strip("/").split("/")[0]
+
+    def get(self, key):
+        """
+        Return the cached response for `key`, or None
+        :rtype: requests.Response
+        """
+        record = self._load(key, time.time())
+        with self._counter_lock:
+            if record is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return None if record is None else _response(record)
+
+    def set(self, key, url, http_response):
+        """
+        Cache a successful response for `key`
+        :param url: url of the request, which selects the ttl
+        :param http_response: requests.Response with a read body
+        """
+        if not http_response.ok:
+            return
+        ttl = self.ttls.get(self.service(url), self.ttl)
+        expires = None if ttl is None else time.time() + ttl
+        self._store(key, _record(http_response), expires)
+
+    def _load(self, key, now):
+        """
+        Return the record stored for `key` if it has not expired by `now`
+        """
+        raise NotImplementedError
+
+    def _store(self, key, record, expires):
+        """
+        Store `record` for `key` until the time `expires` (or None)
+        """
+        raise NotImplementedError
+
+    def clear(self):
+        """
+        Remove all cached responses
+        """
+        raise NotImplementedError
+
+
+class ResponseCache(BaseCache):
+    """
+    In-memory cache of the most recently used responses, shared by the
+    threads of a process
+    """
+    def __init__(self, maxsize=1024, ttl=3600, ttls=None):
+        """
+        :param maxsize: maximum number of responses kept
+        :param ttl: seconds for which responses are kept; None keeps them
+            until they are evicted
+        :param ttls: seconds for which the responses of each service are
+            kept, e.g. {"search": 600, "metrics": 86400}, overriding `ttl`
+        """
+        super(ResponseCache, self).__init__(ttl=ttl, ttls=ttls)
+        self.maxsize = maxsize
+        self._records = OrderedDict()  # key -> (expires, record)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._records)
+
+    def _load(self, key, now):
+        with self._lock:
+            entry = self._records.pop(key, None)
+            if entry is None:
+                return None
+            expires, record = entry
+            if expires is not None and expires <= now:
+                return None
+            # re-insert as the most recently used
+            self._records[key] = entry
+            return record
+
+    def _store(self, key, record, expires):
+        with self._lock:
+            self._records.pop(key, None)
+            self._records[key] = (expires, record)
+            while len(self._records) > self.maxsize:
+                self._records.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+
+class DiskCache(BaseCache):
+    """
+    Cache of responses in an sqlite database, shared by the processes and
+    threads that use the same file and kept across restarts. Bodies are
+    stored compressed, and the database is in WAL mode so that readers do
+    not block the writer. The total size of the bodies is kept up to date
+    as responses are stored; once it exceeds `maxbytes`, the expired
+    responses are evicted, then the oldest ones. Expired responses are
+    also evicted every EXPIRE_EVERY writes of an instance.
+    """
+    DEFAULT_PATH = "~/.ads/cache.sqlite"
+    EXPIRE_EVERY = 256  # writes between evictions of the expired responses
+
+    def __init__(self, path=DEFAULT_PATH, maxbytes=256 * 2**20, ttl=86400,
+                 ttls=None, timeout=30):
+        """
+        :param path: path of the sqlite database, created if needed
+        :param maxbytes: maximum total size of the compressed bodies
+        :param ttl: seconds for which responses are kept; None keeps them
+            until they are evicted
+        :param ttls: seconds for which the responses of each service are
+            kept, e.g. {"search": 600, "metrics": 86400}, overriding `ttl`
+        :param timeout: seconds to wait for a lock held by another writer
+        """
+        super(DiskCache, self).__init__(ttl=ttl, ttls=ttls)
+        self.maxbytes = maxbytes
+        self._writes = 0
+        self._db = SQLiteDatabase(path, timeout=timeout)
+        self.path = self._db.path
+        with self._db.transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, stored REAL, expires REAL, "
+                "size INTEGER, meta TEXT, body BLOB)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_stored "
+                         "ON responses (stored)")
+            # a single row holding the total size of the bodies
+            conn.execute("CREATE TABLE IF NOT EXISTS usage ("
+                         "id INTEGER PRIMARY KEY CHECK (id = 0), size INTEGER)")
+            conn.execute("INSERT OR IGNORE INTO usage SELECT 0, "
+                         "COALESCE(SUM(size), 0) FROM responses")
+
+    def __len__(self):
+        return self._db.connection().execute(
+            "SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    @property
+    def size(self):
+        """
+        Total size of the compressed bodies, in bytes
+        """
+        return self._db.connection().execute(
+            "SELECT size FROM usage").fetchone()[0]
+
+    def _load(self, key, now):
+        row = self._db.connection().execute(
+            "SELECT expires, meta, body FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or (row[0] is not None and row[0] <= now):
+            return None
+        record = json.loads(row[1])
+        record["content"] = zlib.decompress(bytes(row[2]))
+        return record
+
+    def _store(self, key, record, expires):
+        record = dict(record)
+        body = zlib.compress(record.pop("content"))
+        with self._counter_lock:
+            self._writes += 1
+            expire = self._writes % self.EXPIRE_EVERY == 0
+        with self._db.transaction() as conn:
+            replaced = conn.execute(
+                "SELECT size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, time.time(), expires, len(body), json.dumps(record),
+                 sqlite3.Binary(body))
+            )
+            self._resize(conn, len(body) - (replaced[0] if replaced else 0))
+            size = conn.execute("SELECT size FROM usage").fetchone()[0]
+            if expire or size > self.maxbytes:
+                self._evict(conn, size)
+
+    @staticmethod
+    def _resize(conn, delta):
+        conn.execute("UPDATE usage SET size = size + ?", (delta,))
+
+    def _evict(self, conn, size):
+        """
+        Delete the expired responses, then the oldest ones until the bodies
+        fit in maxbytes
+        :param size: current total size of the bodies
+        """
+        now = time.time()
+        expired = conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses WHERE expires <= ?",
+            (now,)
+        ).fetchone()[0]
+        if expired:
+            conn.execute("DELETE FROM responses WHERE expires <= ?", (now,))
+            self._resize(conn, -expired)
+        excess = size - expired - self.maxbytes
+        if excess <= 0:
+            return
+        keys, freed = [], 0
+        for key, body_size in conn.execute(
+                "SELECT key, size FROM responses ORDER BY stored"):
+            keys.append((key,))
+            freed += body_size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM responses WHERE key = ?", keys)
+        self._resize(conn, -freed)
+
+    def clear(self):
+        with self._db.transaction() as conn:
+            conn.execute("DELETE FROM responses")
+            conn.execute("UPDATE usage SET size = 0")
+
+
+class ExportCache(object):
+    """
+    Cache of the entries of exports, per bibcode and format, in an sqlite
+    database shared by the processes and threads that use the same file.
+    While it is set as ads.config.export_cache, ExportQuery only requests
+    the bibcodes whose entries it does not hold, and assembles its result
+    from the cache.
+    """
+    DEFAULT_PATH = "~/.ads/exports.sqlite"
+    CHUNK_SIZE = 500  # keys per statement, within sqlite's variable limit
+
+    def __init__(self, path=DEFAULT_PATH, ttl=30 * 86400, timeout=30):
+        """
+        :param path: path of the sqlite database, created if needed
+        :param ttl: seconds for which entries are kept, so that they follow
+            the updates of the records; None keeps them forever
+        :param timeout: seconds to wait for a lock held by another writer
+        """
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._counter_lock = threading.Lock()
+        self._db = SQLiteDatabase(path, timeout=timeout)
+        self.path = self._db.path
+        self._db.connection().execute(
+            "CREATE TABLE IF NOT EXISTS exports ("
+            "bibcode TEXT, format TEXT, expires REAL, entry TEXT, "
+            "PRIMARY KEY (bibcode, format))"
+        )
+
+    def __len__(self):
+        return self._db.connection().execute(
+            "SELECT COUNT(*) FROM exports").fetchone()[0]
+
+    def get_many(self, bibcodes, format):
+        """
+        Return the cached entries of `bibcodes` in `format`
+        :return: dict of bibcode -> entry
+        """
+        bibcodes = list(bibcodes)
+        conn = self._db.connection()
+        now = time.time()
+        entries = {}
+        for i in range(0, len(bibcodes), self.CHUNK_SIZE):
+            chunk = bibcodes[i:i+self.CHUNK_SIZE]
+            entries.update(conn.execute(
+                "SELECT bibcode, entry FROM exports WHERE format = ? AND "
+                "(expires IS NULL OR expires > ?) AND bibcode IN ({})"
+                .format(",".join("?" * len(chunk))),
+                [format, now] + chunk
+            ))
+        with self._counter_lock:
+            self.hits += len(entries)
+            self.misses += len(set(bibcodes)) - len(entries)
+        return entries
+
+    def set_many(self, format, entries):
+        """
+        Cache entries in `format`
+        :param entries: dict of bibcode -> entry
+        """
+        expires = None if self.ttl is None else time.time() + self.ttl
+        with self._db.transaction() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO exports VALUES (?, ?, ?, ?)",
+                [(bibcode, format, expires, entry)
+                 for bibcode, entry in six.iteritems(entries)]
+            )
+
+    def clear(self):
+        """
+        Remove all cached entries
+        """
+        self._db.connection().execute("DELETE FROM exports")
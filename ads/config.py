@@ -19,3 +19,31 @@ TOKEN_FILES = list(map(os.path.expanduser,
 ))
 TOKEN_ENVIRON_VARS = ["ADS_API_TOKEN", "ADS_DEV_KEY"]
 token = None  # for setting in-situ
+
+# json file in which SearchQuery(auto_fl=True) persists the fields it learns
+auto_fl_file = None
+
+# Callable that decodes a json response body (bytes), e.g. orjson.loads;
+# json.loads is used if None
+json_decoder = None
+# If True, responses do not keep their raw body, and search responses release
+# their parsed documents once these have become articles
+lean_responses = False
+# If True, responses keep their raw body in `_raw`, even if lean_responses
+debug = False
+
+# Cache through which all queries send their requests, e.g.
+# ads.cache.ResponseCache(); None disables caching
+cache = None
+
+# ads.scheduler.Scheduler through which all queries send their requests, to
+# pace them within the rate limits; None sends them at once
+scheduler = None
+
+# ads.cache.ExportCache that keeps the export of each bibcode, per format, so
+# that ExportQuery only requests the bibcodes it does not hold; None disables it
+export_cache = None
+
+# ads.store.ArticleStore that keeps every record returned by a search, and
+# serves lazily loaded fields and bibcode lookups; None disables it
+store = None
@@ -22,4 +22,14 @@ class SolrResponseParseError(Exception):
         self.value = value
 
     def __str__(self):
-        return repr(self.value)
\ No newline at end of file
+        return repr(self.value)
+
+class BudgetExceededError(Exception):
+    """
+    Raised when a request would exceed the budget of its scheduler job
+    """
+    def __init__(self, value=None):
+        self.value = value
+
+    def __str__(self):
+        return repr(self.value)
@@ -2,12 +2,59 @@
 interfaces to the adsws export service
 """
 
+from collections import OrderedDict
 import json
+import re
 import six
 import os
 
+import ads.config
 from .base import APIResponse, BaseQuery
 from .config import EXPORT_URL
+from .utils import ordered_map
+
+# First line of each entry of the export formats
+_ENTRY_START = {
+    "bibtex": re.compile(r"^@", re.M),
+    "endnote": re.compile(r"^%0 ", re.M),
+    "ris": re.compile(r"^TY  - ", re.M),
+}
+_BIBITEM = re.compile(r"^\\bibitem", re.M)
+# Start of the digits that may begin a bibcode
+_YEAR = re.compile(r"(?<!\d)\d{4}")
+
+
+def split_export(result, format, bibcodes):
+    """
+    Split an export into the entries of its bibcodes. An entry is
+    attributed to the first of `bibcodes` that it contains, in its plain
+    or escaped ("\\&", "%26") forms; bibcodes that the export left out
+    have no entry.
+    :param result: export of `bibcodes`
+    :param format: format of the export
+    :return: dict of bibcode -> entry, or None if the export cannot be
+        split exactly
+    """
+    starts = [m.start() for m in
+              _ENTRY_START.get(format, _BIBITEM).finditer(result)]
+    if not starts or result[:starts[0]].strip():
+        return None
+    wanted = set(bibcodes)
+    entries = {}
+    for start, end in zip(starts, starts[1:] + [len(result)]):
+        entry = result[start:end]
+        for m in _YEAR.finditer(entry):
+            candidate = entry[m.start():m.start() + 21]
+            candidate = candidate.replace("\\&", "&").replace("%26", "&")
+            if candidate[:19] in wanted:
+                bibcode = candidate[:19]
+                break
+        else:
+            return None
+        if bibcode in entries:
+            return None
+        entries[bibcode] = entry
+    return entries
 
 
 class ExportResponse(APIResponse):
@@ -15,8 +62,8 @@ class ExportResponse(APIResponse):
     Data structure that represents a response from the ads export service
     """
     def __init__(self, http_response):
-        self._raw = http_response.text
-        self.result = http_response.json()['export']
+        body, self._raw = self._decode(http_response)
+        self.result = body['export']
 
     def __str__(self):
         if six.PY3:
@@ -26,6 +73,15 @@ class ExportResponse(APIResponse):
     def __unicode__(self):
         return self.result
 
+    @classmethod
+    def from_result(cls, result):
+        """
+        Return a response holding `result`, e.g. assembled from a cache
+        """
+        response = cls.__new__(cls)
+        response.result, response._raw = result, None
+        return response
+
 
 class ExportQuery(BaseQuery):
     """
@@ -35,6 +91,7 @@ class ExportQuery(BaseQuery):
     HTTP_ENDPOINT = EXPORT_URL
     FORMATS = ['bibtex', 'endnote', 'aastex',
                'ris', 'icarus', 'mnras', 'soph']
+    CHUNK_SIZE = 2000  # bibcodes per request of stream()
 
     def __init__(self, bibcodes, format="bibtex"):
         """
@@ -58,8 +115,110 @@ class ExportQuery(BaseQuery):
         Execute the http request to the export service
         :return ads-classic formatted export string
         """
+        self.response = self._export_bibcodes(self.bibcodes,
+                                              self.json_payload)
+        return self.response.result
+
+    def stream(self, fp, chunk_size=None, workers=4):
+        """
+        Export the bibcodes in chunks, `workers` of them concurrently, and
+        write the export of each chunk to `fp` as soon as it and those of
+        the chunks before it are done, so that the file is in the order of
+        the bibcodes and at most 2 * `workers` chunks are held in memory
+        :param fp: file object, opened in text mode
+        :param chunk_size: bibcodes per request, CHUNK_SIZE by default
+        :param workers: number of requests to send concurrently
+        :return: number of characters written
+        """
+        def export(bibcodes):
+            return self._export_bibcodes(bibcodes).result
+
+        written = 0
+        for result in ordered_map(export, self._chunks(chunk_size), workers):
+            written += self._write(fp, result)
+        return written
+
+    def _chunks(self, chunk_size=None):
+        """
+        Generate the chunks of bibcodes of stream()
+        :param chunk_size: bibcodes per chunk, CHUNK_SIZE by default
+        """
+        chunk_size = chunk_size or self.CHUNK_SIZE
+        for i in range(0, len(self.bibcodes), chunk_size):
+            yield self.bibcodes[i:i+chunk_size]
+
+    @staticmethod
+    def _write(fp, result):
+        """
+        Write the export of a chunk to `fp`
+        :return: number of characters written
+        """
+        # Keep the entries of consecutive chunks apart
+        if result and not result.endswith("\n"):
+            result += "\n"
+        fp.write(result)
+        return len(result)
+
+    def _export_bibcodes(self, bibcodes, payload=None):
+        """
+        Export `bibcodes`. If ads.config.export_cache is set, only the
+        bibcodes whose entries it does not hold are requested, and the
+        result is assembled from their entries, in the order of `bibcodes`.
+        Exports that cannot be split into entries are not cached.
+        :param payload: json payload of the request, if already encoded
+        :rtype: ExportResponse
+        """
+        payload = payload or json.dumps({"bibcode": bibcodes})
+        if ads.config.export_cache is None:
+            return self._export(payload)
+        bibcodes, entries, missing = self._cached_entries(bibcodes)
+        if missing:
+            response = self._export(json.dumps({"bibcode": missing}))
+            if not self._add_entries(entries, response, missing):
+                if len(missing) == len(bibcodes):
+                    return response
+                return self._export(payload)
+        return self._assemble(entries, bibcodes)
+
+    def _cached_entries(self, bibcodes):
+        """
+        Look up `bibcodes` in ads.config.export_cache
+        :return: the unique bibcodes, dict of bibcode -> cached entry, and
+            the bibcodes that have no cached entry
+        """
+        bibcodes = list(OrderedDict.fromkeys(bibcodes))
+        entries = ads.config.export_cache.get_many(bibcodes, self.format)
+        return bibcodes, entries, [b for b in bibcodes if b not in entries]
+
+    def _add_entries(self, entries, response, missing):
+        """
+        Split the export of the `missing` bibcodes into their entries, and
+        add them to `entries` and ads.config.export_cache
+        :return: False if the export cannot be split
+        """
+        exported = split_export(response.result, self.format, missing)
+        if exported is None:
+            return False
+        ads.config.export_cache.set_many(self.format, exported)
+        entries.update(exported)
+        return True
+
+    @staticmethod
+    def _assemble(entries, bibcodes):
+        """
+        Return the ExportResponse of the entries of `bibcodes`, in order
+        """
+        return ExportResponse.from_result(u"".join(
+            entries[b] for b in bibcodes if b in entries
+        ))
+
+    def _export(self, payload):
+        """
+        Send an export request
+        :param payload: json payload of the request
+        :rtype: ExportResponse
+        """
         url = os.path.join(self.HTTP_ENDPOINT, self.format)
-        self.response = ExportResponse.load_http_response(
-            self.session.post(url, data=self.json_payload)
+        return ExportResponse.load_http_response(
+            self._request("POST", url, data=payload)
         )
-        return self.response.result
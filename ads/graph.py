@@ -0,0 +1,343 @@
+"""
+Compact citation graphs, for graph analytics over the citation and
+reference data of many articles. Requires numpy.
+"""
+
+import os
+
+import six
+
+from .search import SearchQuery
+from .utils import np, _require_numpy
+
+
+def _encode(bibcode):
+    if isinstance(bibcode, six.text_type):
+        return bibcode.encode("utf-8")
+    return bibcode
+
+
+def _csr(rows, columns, size):
+    """
+    Return the (offsets, indices) of the compressed sparse rows of the
+    edges rows[i] -> columns[i], which are sorted by row
+    """
+    offsets = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=size), out=offsets[1:])
+    return offsets, np.ascontiguousarray(columns, dtype=np.int32)
+
+
+def _state(record):
+    """
+    Return the (citation_count, indexstamp) of a solr record, in the form
+    they are kept in a graph
+    """
+    count = record.get("citation_count")
+    return (-1 if count is None else count,
+            _encode(record.get("indexstamp") or ""))
+
+
+def _record_edges(records):
+    """
+    Yield the (citing, cited) bibcodes of the reference and citation
+    fields of solr records
+    """
+    for record in records:
+        for reference in record.get("reference") or []:
+            yield record["bibcode"], reference
+        for citation in record.get("citation") or []:
+            yield citation, record["bibcode"]
+
+
+class CitationGraph(object):
+    """
+    A citation graph in compressed sparse row (CSR) form. Bibcodes are
+    interned as int32 node ids, their rank in the sorted array `bibcodes`,
+    and an edge goes from a citing paper to the paper it cites. The
+    references of node i are out_indices[out_offsets[i]:out_offsets[i+1]]
+    and its citations are the in_indices of the same slice of in_offsets,
+    so both directions are read without any Python object per edge.
+
+    The citation_count and indexstamp of the nodes whose edges were
+    crawled are kept in `citation_counts` (-1 if unknown) and `indexstamps`
+    (empty if unknown), so that `refresh` only re-crawls the nodes that
+    changed since.
+
+    Graphs are saved as a directory of .npy files, which `load` memory
+    maps: the operating system pages in the parts of the graph that are
+    used, and processes that load the same graph share them.
+    """
+    ARRAYS = ["bibcodes", "out_offsets", "out_indices",
+              "in_offsets", "in_indices", "citation_counts", "indexstamps"]
+    # Fields of the records fetched to crawl edges
+    CRAWL_FIELDS = ["bibcode", "citation_count", "indexstamp",
+                    "citation", "reference"]
+
+    def __init__(self, bibcodes, out_offsets, out_indices, in_offsets,
+                 in_indices, citation_counts=None, indexstamps=None):
+        """
+        :param bibcodes: sorted array of the bibcodes (bytes) of the nodes
+        :param out_offsets: int64 offsets of the references of each node
+        :param out_indices: int32 node ids of the references
+        :param in_offsets: int64 offsets of the citations of each node
+        :param in_indices: int32 node ids of the citations
+        :param citation_counts: int32 citation_count of each node, -1 if
+            unknown
+        :param indexstamps: indexstamp (bytes) of each node, empty if
+            unknown
+        """
+        _require_numpy("ads.graph")
+        self.bibcodes = bibcodes
+        self.out_offsets = out_offsets
+        self.out_indices = out_indices
+        self.in_offsets = in_offsets
+        self.in_indices = in_indices
+        if citation_counts is None:
+            citation_counts = np.full(len(bibcodes), -1, dtype=np.int32)
+        if indexstamps is None:
+            indexstamps = np.zeros(len(bibcodes), dtype="S1")
+        self.citation_counts = citation_counts
+        self.indexstamps = indexstamps
+
+    @classmethod
+    def from_edges(cls, edges):
+        """
+        Build a graph from bibcode pairs; duplicate edges are dropped
+        :param edges: iterable of (citing bibcode, cited bibcode)
+        """
+        _require_numpy("ads.graph")
+        return cls._build(edges)
+
+    @classmethod
+    def from_articles(cls, articles):
+        """
+        Build a graph from the `reference` and `citation` fields already
+        loaded on articles; they are not loaded if they are missing. Papers
+        that are only cited or citing are nodes too. The citation_count and
+        indexstamp of the articles are kept for `refresh`, if they are
+        loaded.
+        :param articles: Articles or solr records (dicts)
+        """
+        _require_numpy("ads.graph")
+        records = [getattr(article, "_raw", article) for article in articles]
+        records = [r for r in records if r.get("bibcode")]
+        return cls._build(_record_edges(records), records)
+
+    @classmethod
+    def crawl(cls, bibcodes, **kwargs):
+        """
+        Build the graph of the citations and references of `bibcodes`,
+        fetched with bigqueries
+        :param kwargs: kwargs passed to SearchQuery.from_bibcodes
+        """
+        return cls.from_articles(SearchQuery.from_bibcodes(
+            bibcodes, fl=cls.CRAWL_FIELDS, use_store=False, **kwargs
+        ))
+
+    @classmethod
+    def _build(cls, edges, records=(), base=None, keep=None):
+        """
+        Build a graph from bibcode pairs, the bibcodes and states of solr
+        records, and the edges of the graph `base` selected by the boolean
+        mask `keep`; the states of the records replace those of `base`
+        """
+        citing, cited = [], []
+        for source, target in edges:
+            citing.append(_encode(source))
+            cited.append(_encode(target))
+        names = [_encode(r["bibcode"]) for r in records]
+        parts = [np.array(citing + cited + names, dtype=bytes)]
+        if base is not None:
+            parts.append(base.bibcodes)
+        bibcodes = np.unique(np.concatenate(parts))
+        size = len(bibcodes)
+
+        citing = np.searchsorted(bibcodes, np.array(citing, dtype=bytes))
+        cited = np.searchsorted(bibcodes, np.array(cited, dtype=bytes))
+        nodes = np.searchsorted(bibcodes, np.array(names, dtype=bytes))
+        states = [_state(r) for r in records]
+        stamps = np.array([stamp for _, stamp in states], dtype=bytes)
+        counts = np.full(size, -1, dtype=np.int32)
+        indexstamps = np.zeros(size, dtype=stamps.dtype)
+        if base is not None:
+            # The bibcodes of base keep their order among the new ones
+            remap = np.searchsorted(bibcodes, base.bibcodes)
+            base_citing = np.repeat(np.arange(len(base)),
+                                    np.diff(base.out_offsets))
+            citing = np.concatenate([citing, remap[base_citing[keep]]])
+            cited = np.concatenate([cited, remap[base.out_indices[keep]]])
+            counts[remap] = base.citation_counts
+            indexstamps = np.zeros(size, dtype=np.promote_types(
+                stamps.dtype, base.indexstamps.dtype))
+            indexstamps[remap] = base.indexstamps
+        counts[nodes] = [count for count, _ in states]
+        indexstamps[nodes] = stamps
+
+        # Sorting the unique edge keys sorts the edges by citing paper
+        keys = np.unique(citing.astype(np.int64) * size + cited)
+        citing, cited = keys // max(size, 1), keys % max(size, 1)
+        out_offsets, out_indices = _csr(citing, cited, size)
+        order = np.lexsort((citing, cited))
+        in_offsets, in_indices = _csr(cited[order], citing[order], size)
+        return cls(bibcodes, out_offsets, out_indices, in_offsets,
+                   in_indices, counts, indexstamps)
+
+    def refresh(self, bibcodes=None, **kwargs):
+        """
+        Update the graph with the changes in ADS since its nodes were
+        crawled. The citation_count and indexstamp of the nodes are fetched
+        first, with bigqueries that only return those two fields, and the
+        edges are only re-crawled for the nodes where either of them
+        changed; the arrays of the graph are then replaced by patched ones.
+        Responses held by ads.config.cache are used, so its ttl should be
+        shorter than the interval between refreshes.
+        :param bibcodes: bibcodes of the nodes to check, by default those
+            that were crawled; nodes that were not are re-crawled
+        :param kwargs: kwargs passed to SearchQuery.from_bibcodes
+        :return: list of the bibcodes whose edges were re-crawled
+        """
+        if bibcodes is None:
+            nodes = np.flatnonzero((np.asarray(self.citation_counts) >= 0) |
+                                   (np.asarray(self.indexstamps) != b""))
+        else:
+            nodes = self.nodes(bibcodes)
+            nodes = nodes[nodes >= 0]
+        bibcodes = [self.bibcode(n) for n in nodes]
+        current = SearchQuery.from_bibcodes(
+            bibcodes, fl=["bibcode", "citation_count", "indexstamp"],
+            use_store=False, **kwargs
+        )
+        current = dict((a.bibcode, a._raw) for a in current)
+        changed = []
+        for node, bibcode in zip(nodes, bibcodes):
+            record = current.get(bibcode)
+            if record is not None and _state(record) != \
+                    (self.citation_counts[node], self.indexstamps[node]):
+                changed.append(bibcode)
+        if not changed:
+            return changed
+
+        records = [a._raw for a in SearchQuery.from_bibcodes(
+            changed, fl=self.CRAWL_FIELDS, use_store=False, **kwargs
+        )]
+        # The edges of the re-crawled nodes are replaced by theirs
+        crawled = np.zeros(len(self), dtype=bool)
+        crawled[self.nodes([r["bibcode"] for r in records])] = True
+        citing = np.repeat(np.arange(len(self)), np.diff(self.out_offsets))
+        keep = ~(crawled[citing] | crawled[self.out_indices])
+        patched = self._build(_record_edges(records), records, self, keep)
+        for name in self.ARRAYS:
+            setattr(self, name, getattr(patched, name))
+        return changed
+
+    def __len__(self):
+        return len(self.bibcodes)
+
+    @property
+    def num_edges(self):
+        return len(self.out_indices)
+
+    def __contains__(self, bibcode):
+        return self.nodes([bibcode])[0] >= 0
+
+    def nodes(self, bibcodes):
+        """
+        Return the node ids of `bibcodes`, -1 for those not in the graph
+        :rtype: numpy.ndarray
+        """
+        keys = np.array([_encode(b) for b in bibcodes], dtype=bytes)
+        if not len(self) or not len(keys):
+            return np.full(len(keys), -1, dtype=np.int32)
+        ids = np.searchsorted(self.bibcodes, keys)
+        ids = np.minimum(ids, len(self) - 1).astype(np.int32)
+        ids[self.bibcodes[ids] != keys] = -1
+        return ids
+
+    def node(self, bibcode):
+        """
+        Return the node id of `bibcode`
+        :raises KeyError: if it is not in the graph
+        """
+        node = int(self.nodes([bibcode])[0])
+        if node < 0:
+            raise KeyError(bibcode)
+        return node
+
+    def bibcode(self, node):
+        """
+        Return the bibcode of the node id `node`
+        """
+        return self.bibcodes[node].decode("utf-8")
+
+    def out_neighbors(self, node):
+        """
+        Return the node ids of the references of the node id `node`
+        """
+        return self.out_indices[self.out_offsets[node]:
+                                self.out_offsets[node+1]]
+
+    def in_neighbors(self, node):
+        """
+        Return the node ids of the citations of the node id `node`
+        """
+        return self.in_indices[self.in_offsets[node]:
+                               self.in_offsets[node+1]]
+
+    def references(self, bibcode):
+        """
+        Return the bibcodes of the papers that `bibcode` cites
+        """
+        return [self.bibcode(n)
+                for n in self.out_neighbors(self.node(bibcode))]
+
+    def citations(self, bibcode):
+        """
+        Return the bibcodes of the papers that cite `bibcode`
+        """
+        return [self.bibcode(n)
+                for n in self.in_neighbors(self.node(bibcode))]
+
+    def out_degree(self, bibcode=None):
+        """
+        Return the number of references of `bibcode`, or an array of those
+        of every node
+        """
+        if bibcode is None:
+            return np.diff(self.out_offsets)
+        return len(self.out_neighbors(self.node(bibcode)))
+
+    def in_degree(self, bibcode=None):
+        """
+        Return the number of citations of `bibcode`, or an array of those
+        of every node
+        """
+        if bibcode is None:
+            return np.diff(self.in_offsets)
+        return len(self.in_neighbors(self.node(bibcode)))
+
+    def save(self, path):
+        """
+        Save the graph as .npy files in the directory `path`, created if
+        needed
+        """
+        path = os.path.expanduser(path)
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        for name in self.ARRAYS:
+            np.save(os.path.join(path, name + ".npy"), getattr(self, name))
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Load a graph saved with `save`
+        :param mmap: memory map the arrays rather than reading them
+        """
+        _require_numpy("ads.graph")
+        path = os.path.expanduser(path)
+        arrays = []
+        for name in cls.ARRAYS:
+            filename = os.path.join(path, name + ".npy")
+            # the node states are missing from graphs saved without them
+            arrays.append(np.load(filename, mmap_mode="r" if mmap else None)
+                          if os.path.exists(filename) else None)
+        return cls(*arrays)
@@ -0,0 +1,273 @@
+"""
+Parallel, range-partitioned harvesting of very large result sets
+"""
+
+import sys
+import threading
+import six
+
+from .base import BaseQuery
+from .config import SEARCH_URL
+from .scheduler import propagate
+from .search import SearchQuery, SolrResponse
+
+
+class Partition(object):
+    """
+    A range of values of the partition field, [lo, hi] in units of years
+    or months, that selects a disjoint subset of a query's results. The
+    partition of the records outside of the range is `outside`, and one
+    without a range selects every record.
+    """
+    def __init__(self, field, lo, hi, count, outside=False):
+        """
+        :param field: name of the partition field, "year" or "pubdate"
+        :param lo: first unit of the range, or None for every record
+        :param hi: last unit of the range (inclusive)
+        :param count: number of records found in the range
+        :param outside: if True, the partition holds the records outside
+            of the range
+        """
+        self.field = field
+        self.lo = lo
+        self.hi = hi
+        self.count = count
+        self.outside = outside
+
+    @staticmethod
+    def unit(field, date):
+        """
+        Return the unit of a solr "date" value for the partition field
+        :param field: name of the partition field
+        :param date: solr date such as "1971-10-01T00:00:00Z"
+        """
+        year = int(date[:4])
+        if field == "year":
+            return year
+        return 12 * year + max(int(date[5:7] or 1), 1) - 1
+
+    def _format(self, unit):
+        if self.field == "year":
+            return "{}".format(unit)
+        return "{:04d}-{:02d}".format(unit // 12, unit % 12 + 1)
+
+    @property
+    def fq(self):
+        """
+        solr "fq" param that restricts a query to this partition, or None
+        if it selects every record
+        """
+        if self.lo is None:
+            return None
+        return "{}{}:[{} TO {}]".format(
+            "-" if self.outside else "", self.field,
+            self._format(self.lo), self._format(self.hi)
+        )
+
+    def split(self):
+        """
+        Return the two halves of this range, without their counts
+        """
+        mid = (self.lo + self.hi) // 2
+        return (Partition(self.field, self.lo, mid, None),
+                Partition(self.field, mid + 1, self.hi, None))
+
+    def __repr__(self):
+        return "<Partition {} ({} records)>".format(self.fq, self.count)
+
+
+class Harvester(BaseQuery):
+    """
+    Harvests all records of a query that is too large for a single cursor.
+
+    The query is split into disjoint "year" or "pubdate" ranges whose sizes
+    are learned from rows=0 probes, bisecting any range that still holds
+    more than `partition_size` records. The partitions are then paged
+    concurrently by a pool of worker threads, and their records are merged
+    into a single iterator without duplicates. The ranges span the dates
+    of the dated records; the records outside of them, which have no date,
+    are harvested as one more partition.
+
+    Partitioning on bibcode prefixes is not supported: bibcodes begin with
+    the year, so their prefixes would only split the ranges of a year by
+    journal, which pubdate ranges already split by month.
+    """
+    HTTP_ENDPOINT = SEARCH_URL
+    PARTITION_FIELDS = ["year", "pubdate"]
+
+    def __init__(self, q, fq=None, fl=SearchQuery.DEFAULT_FIELDS,
+                 partition="year", partition_size=100000, workers=4,
+                 rows=2000, token=None):
+        """
+        :param q: solr "q" param (query)
+        :param fq: solr "fq" param (filter query)
+        :param fl: solr "fl" param (filter limit)
+        :param partition: field to partition the results on, "year" or
+            "pubdate" (month resolution)
+        :param partition_size: maximum number of records per partition
+        :param workers: number of partitions to harvest concurrently
+        :param rows: solr "rows" param of the harvesting queries
+        :param token: optional API token to use for this harvest
+        """
+        assert q, "q must not be empty"
+        assert partition in self.PARTITION_FIELDS, \
+            "partition must be one of {}".format(self.PARTITION_FIELDS)
+        assert partition_size > 0, "partition_size must be greater than 0"
+        if fq is None:
+            fq = []
+        elif isinstance(fq, six.string_types):
+            fq = [fq]
+
+        self.q = q
+        self.fq = list(fq)
+        self.fl = fl
+        self.partition = partition
+        self.partition_size = partition_size
+        self.workers = workers
+        self.rows = rows
+        self._partitions = None
+
+        if token is not None:
+            self.token = token
+
+    def _probe(self, **params):
+        """
+        Send a query restricted by self.fq and return the SolrResponse
+        """
+        fq = self.fq + params.pop("fq", [])
+        params.update({"q": self.q, "fq": fq})
+        return SolrResponse.load_http_response(
+            self._request("GET", self.HTTP_ENDPOINT, params=params)
+        )
+
+    def count(self, partition=None):
+        """
+        Return the number of records found, optionally within a partition
+        :param partition: Partition to count the records of
+        """
+        fq = [] if partition is None else [partition.fq]
+        return self._probe(fq=fq, rows=0).numFound
+
+    def _bound(self, order):
+        """
+        Return the first unit of the dated records in `order` ("asc" or
+        "desc"), or None if no record has a date
+        """
+        docs = self._probe(sort="date {}".format(order), rows=1, fl="date",
+                           fq=["date:[* TO *]"]).docs
+        if not docs or not docs[0].get("date"):
+            return None
+        return Partition.unit(self.partition, docs[0]["date"])
+
+    @property
+    def partitions(self):
+        """
+        Disjoint partitions covering all records of the query, learned from
+        rows=0 probes on the first access
+        """
+        if self._partitions is None:
+            count = self.count()
+            if count == 0:
+                self._partitions = []
+                return self._partitions
+            lo, hi = self._bound("asc"), self._bound("desc")
+            if lo is None or hi is None:
+                # without dates, the records cannot be partitioned
+                self._partitions = [Partition(self.partition, None, None,
+                                              count)]
+                return self._partitions
+            pending = [Partition(self.partition, lo, hi,
+                                 self.count(Partition(self.partition, lo, hi,
+                                                      None)))]
+            self._partitions = []
+            while pending:
+                p = pending.pop()
+                if p.count == 0:
+                    continue
+                if p.count <= self.partition_size or p.lo == p.hi:
+                    self._partitions.append(p)
+                    continue
+                # A single probe sizes both halves of the range
+                left, right = p.split()
+                left.count = self.count(left)
+                right.count = p.count - left.count
+                pending.extend([right, left])
+            self._partitions.sort(key=lambda p: p.lo)
+            outside = count - sum(p.count for p in self._partitions)
+            if outside > 0:
+                # records without a date may lie outside of the range
+                self._partitions.append(Partition(self.partition, lo, hi,
+                                                  outside, outside=True))
+        return self._partitions
+
+    def _harvest(self, partitions, pages, stop):
+        """
+        Worker thread: page through partitions and put the pages of articles
+        on the `pages` queue, then put None
+        """
+        try:
+            while not stop.is_set():
+                try:
+                    partition = partitions.get_nowait()
+                except six.moves.queue.Empty:
+                    break
+                fq = self.fq + [partition.fq] if partition.fq else self.fq
+                sq = SearchQuery(q=self.q, fq=fq,
+                                 fl=self.fl, rows=self.rows,
+                                 max_pages=sys.maxsize, token=self.token)
+                for articles in sq.pages():
+                    self._put(pages, articles, stop)
+                    if stop.is_set():
+                        break
+        except Exception as error:
+            self._put(pages, error, stop)
+        self._put(pages, None, stop)
+
+    @staticmethod
+    def _put(pages, item, stop):
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return
+            except six.moves.queue.Full:
+                pass
+
+    def __iter__(self):
+        partitions = six.moves.queue.Queue()
+        for p in self.partitions:
+            partitions.put(p)
+        pages = six.moves.queue.Queue(maxsize=2 * self.workers)
+        stop = threading.Event()
+        workers = [
+            threading.Thread(target=propagate(self._harvest),
+                             args=(partitions, pages, stop))
+            for _ in range(min(self.workers, len(self.partitions)))
+        ]
+        for worker in workers:
+            worker.daemon = True
+            worker.start()
+
+        seen = set()
+        running = len(workers)
+        try:
+            while running:
+                page = pages.get()
+                if page is None:
+                    running -= 1
+                    continue
+                if isinstance(page, Exception):
+                    raise page
+                for article in page:
+                    if article.id in seen:
+                        continue
+                    seen.add(article.id)
+                    yield article
+        finally:
+            stop.set()
+
+    def execute(self):
+        """
+        Harvest all records of the query
+        :return: list of Article
+        """
+        return list(self)
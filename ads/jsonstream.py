@@ -0,0 +1,145 @@
+"""
+Incremental parsing of solr json responses, as their body arrives
+"""
+
+import codecs
+import json
+import re
+
+from .exceptions import SolrResponseParseError
+
+# A string (group 2 is None if it is not complete yet), a structural
+# character, or a number/true/false/null
+_TOKEN = re.compile(
+    r'\s*(?:"((?:[^"\\]|\\.)*)(")?|([{}\[\]:,])|([^\s{}\[\]:,"]+))'
+)
+_DECODER = json.JSONDecoder()
+# Keys of the containers enclosing the list of documents
+_DOCS_PATH = [None, "response", "docs"]
+
+
+class SolrStreamParser(object):
+    """
+    Parses the body of a solr json response chunk by chunk. The documents
+    of response.docs are returned as soon as each of them is complete,
+    and only the document being received is buffered; the rest of the body
+    (responseHeader, numFound, nextCursorMark, highlighting) is kept as a
+    skeleton, with an empty docs list, which is decoded once the body is
+    complete and set as `result`.
+    """
+    def __init__(self):
+        self.result = None
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = u""
+        self._pos = 0  # position in the buffer up to which it is parsed
+        self._final = False
+        self._skeleton = []
+        self._stack = []  # keys of the open containers outside documents
+        self._last = None  # last string outside documents
+        self._key = None  # key of the next value outside documents
+        self._in_docs = False
+        self._doc_start = None  # buffer position of the current document
+        self._tried = 0  # buffer position up to which decoding it failed
+
+    def feed(self, chunk):
+        """
+        Parse the next chunk of the body
+        :param chunk: the next bytes of the body, or None at its end
+        :return: list of the documents that were completed by the chunk
+        """
+        self._final = chunk is None
+        self._buffer += self._utf8.decode(chunk or b"", self._final)
+        docs = []
+        while True:
+            if self._doc_start is not None:
+                if not self._scan_document(docs):
+                    break
+            elif not self._scan_token():
+                break
+
+        # Only keep the unparsed text and the document being received
+        cut = self._pos if self._doc_start is None else self._doc_start
+        self._buffer = self._buffer[cut:]
+        self._pos -= cut
+        if self._doc_start is not None:
+            self._doc_start -= cut
+            self._tried -= cut
+
+        if self._final:
+            if self._stack or self._doc_start is not None \
+                    or self._buffer.strip():
+                raise SolrResponseParseError("Incomplete response body")
+            try:
+                self.result = json.loads(u"".join(self._skeleton))
+            except ValueError as e:
+                raise SolrResponseParseError("{}".format(e))
+        return docs
+
+    def _scan_token(self):
+        """
+        Parse the next token outside of the documents
+        :return: False if more of the body is needed
+        """
+        buf = self._buffer
+        m = _TOKEN.match(buf, self._pos)
+        if m is None:
+            if buf[self._pos:].strip():
+                raise SolrResponseParseError(
+                    "Invalid json: {}".format(buf[self._pos:self._pos+20])
+                )
+            return False
+        string, closed, char, scalar = m.groups()
+        if m.group(1) is not None and closed is None:
+            return False
+        if scalar is not None and m.end() == len(buf) and not self._final:
+            return False
+
+        text = buf[self._pos:m.end()]
+        self._pos = m.end()
+        if self._in_docs:
+            # Only the documents, their commas and the end of the list
+            if char == "{":
+                self._doc_start = self._tried = m.start(3)
+            elif char == "]":
+                self._in_docs = False
+                self._stack.pop()
+                self._skeleton.append(text)
+            return True
+
+        self._skeleton.append(text)
+        if string is not None:
+            self._last = string
+        elif char == ":":
+            self._key = self._last
+        elif char == ",":
+            self._key = None
+        elif char in ("{", "["):
+            self._stack.append(self._key)
+            self._key = None
+            self._in_docs = char == "[" and self._stack == _DOCS_PATH
+        elif char in ("}", "]"):
+            if not self._stack:
+                raise SolrResponseParseError("Invalid json: unexpected {}"
+                                             .format(char))
+            self._stack.pop()
+        return True
+
+    def _scan_document(self, docs):
+        """
+        Decode the current document if it has been received completely
+        :return: False if more of the body is needed
+        """
+        # A document can only be complete once another "}" has arrived
+        if "}" not in self._buffer[self._tried:] and not self._final:
+            return False
+        self._tried = len(self._buffer)
+        try:
+            doc, end = _DECODER.raw_decode(self._buffer, self._doc_start)
+        except ValueError as e:
+            if self._final:
+                raise SolrResponseParseError("{}".format(e))
+            return False
+        docs.append(doc)
+        self._doc_start = None
+        self._pos = end
+        return True
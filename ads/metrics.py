@@ -2,11 +2,452 @@
 interfaces to the adsws metrics service
 """
 
+import datetime
 import json
 import six
 
 from .base import APIResponse, BaseQuery
 from .config import METRICS_URL
+from .utils import np, ordered_map, _require_numpy
+
+# Statistics that are sums over the papers, per section of the response
+ADDITIVE_STATS = {
+    "basic stats": [
+        "number of papers", "normalized paper count",
+        "total number of reads", "total number of downloads",
+        "recent number of reads", "recent number of downloads",
+    ],
+    "citation stats": [
+        "total number of citations", "total number of refereed citations",
+        "normalized number of citations",
+        "normalized number of refereed citations",
+    ],
+}
+
+
+def _median(values):
+    values = sorted(values)
+    if not values:
+        return None
+    middle = len(values) // 2
+    if len(values) % 2:
+        return float(values[middle])
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def _indicators(citations):
+    """
+    Return the h, g, i10 and i100 indices of papers with the given numbers
+    of citations
+    """
+    citations = sorted(citations, reverse=True)
+    h = g = total = 0
+    for rank, count in enumerate(citations, 1):
+        total += count
+        if count >= rank:
+            h = rank
+        if total >= rank * rank:
+            g = rank
+    return {
+        "h": h,
+        "g": g,
+        "i10": sum(1 for c in citations if c >= 10),
+        "i100": sum(1 for c in citations if c >= 100),
+    }
+
+
+def _add_histograms(total, histograms):
+    """
+    Add nested dicts of histograms to `total`, year by year
+    """
+    for name, value in six.iteritems(histograms):
+        if isinstance(value, dict):
+            _add_histograms(total.setdefault(name, {}), value)
+        else:
+            total[name] = total.get(name, 0) + value
+
+
+def merge_metrics(parts, papers, current_year=None):
+    """
+    Merge the metrics of disjoint sets of bibcodes into those of their
+    union. Sums, histograms, skipped bibcodes and the read10 index are
+    added, and averages are divided by the total number of papers. Order
+    statistics and the other indicators cannot be merged: the median
+    number of citations and the h, g, i10, i100 and m indices are
+    recomputed from the per-paper citation counts and years of `papers`,
+    and the quantities that would need more than that are None: the
+    medians of reads, downloads and refereed citations, the numbers of
+    citing papers and self-citations, the riq and tori indices, and the
+    time series.
+    :param parts: metrics (dicts) returned for each set of bibcodes
+    :param papers: (citation_count, refereed, year) of each paper
+    :param current_year: year up to which the m index counts the years
+        since the first paper; defaults to the current year
+    :return: metrics (dict)
+    """
+    current_year = current_year or datetime.date.today().year
+    years = [int(year) for _, _, year in papers if year]
+    # m is h / the number of years since the first paper, as
+    # compute_local computes it
+    active = current_year - min(years) + 1.0 if years else None
+    metrics = {"skipped bibcodes": [], "histograms": {}, "time series": None}
+    for part in parts:
+        metrics["skipped bibcodes"].extend(part.get("skipped bibcodes", []))
+        _add_histograms(metrics["histograms"], part.get("histograms", {}))
+
+    for suffix, refereed_only in [("", False), (" refereed", True)]:
+        citations = [count for count, refereed, _ in papers
+                     if refereed or not refereed_only]
+        for section, names in six.iteritems(ADDITIVE_STATS):
+            stats = metrics[section + suffix] = {}
+            for part in parts:
+                for name, value in six.iteritems(part.get(section + suffix,
+                                                          {})):
+                    stats[name] = value + stats.get(name, 0) \
+                        if name in names else None
+        basic = metrics["basic stats" + suffix]
+        number = basic.get("number of papers")
+        for name in ["reads", "downloads"]:
+            basic["average number of " + name] = \
+                float(basic.get("total number of " + name, 0)) / number \
+                if number else None
+        stats = metrics["citation stats" + suffix]
+        for name in ["citations", "refereed citations"]:
+            stats["average number of " + name] = \
+                float(stats.get("total number of " + name, 0)) / number \
+                if number else None
+        stats["median number of citations"] = _median(citations)
+
+        indicators = metrics["indicators" + suffix] = dict(
+            (name, None) for part in parts
+            for name in part.get("indicators" + suffix, {})
+        )
+        indicators.update(_indicators(citations))
+        indicators["m"] = indicators["h"] / active if active else None
+        # read10 is a sum over the papers
+        read10 = [part.get("indicators" + suffix, {}).get("read10")
+                  for part in parts]
+        if "read10" in indicators and None not in read10:
+            indicators["read10"] = sum(read10)
+    return metrics
+
+
+class _Groups(object):
+    """
+    Memberships of papers in groups (e.g. the papers of authors), sorted by
+    group, over which per-paper values are aggregated with one vectorized
+    pass
+    """
+    def __init__(self, groups, members, size, ordered=False):
+        """
+        :param groups: group of each membership
+        :param members: paper (index) of each membership
+        :param size: number of groups
+        :param ordered: whether the memberships are already sorted by group
+        """
+        if not ordered:
+            order = np.argsort(groups, kind="mergesort")
+            groups, members = groups[order], members[order]
+        self.groups = groups
+        self.members = members
+        self.size = size
+        self.counts = np.bincount(self.groups, minlength=size)
+        self.starts = np.cumsum(self.counts) - self.counts
+
+    def select(self, mask):
+        """
+        Return the memberships of the papers selected by `mask`
+        """
+        keep = mask[self.members]
+        return _Groups(self.groups[keep], self.members[keep], self.size,
+                       ordered=True)
+
+    def sum(self, values):
+        return np.bincount(self.groups, weights=values[self.members],
+                           minlength=self.size)
+
+    def sum_rows(self, matrix):
+        """
+        Return the sums of the rows of a per-paper matrix, per group
+        """
+        total = np.zeros((self.size, matrix.shape[1]))
+        filled = self.counts > 0
+        if filled.any():
+            total[filled] = np.add.reduceat(matrix[self.members],
+                                            self.starts[filled], axis=0)
+        return total
+
+    def ranked(self, values):
+        """
+        Return the values of the memberships sorted in decreasing order
+        within each group, their 1-based ranks and their cumulative sums
+        within each group
+        """
+        order = np.lexsort((-values[self.members], self.groups))
+        ranked = values[self.members][order]
+        first = np.repeat(self.starts, self.counts)
+        ranks = np.arange(len(ranked)) - first + 1
+        cumsum = np.cumsum(ranked)
+        before = np.concatenate([[0], cumsum])[first]
+        return ranked, ranks, cumsum - before
+
+    def median(self, values):
+        ranked = self.ranked(values)[0]
+        low = self.starts + (self.counts - 1) // 2
+        high = self.starts + self.counts // 2
+        median = np.full(self.size, np.nan)
+        filled = self.counts > 0
+        median[filled] = (ranked[low[filled]] + ranked[high[filled]]) / 2.0
+        return median
+
+
+def _indices(papers, citations, first_years, current_year):
+    """
+    Return the h, g, i10, i100 and m indices of the groups of `papers`
+    """
+    ranked, ranks, cumsum = papers.ranked(citations)
+    # Within a group, both conditions hold for the first ranks only
+    h = np.bincount(papers.groups, weights=ranked >= ranks,
+                    minlength=papers.size)
+    g = np.bincount(papers.groups, weights=cumsum >= ranks ** 2,
+                    minlength=papers.size)
+    return {
+        "h": h.astype(int),
+        "g": g.astype(int),
+        "i10": papers.sum(citations >= 10).astype(int),
+        "i100": papers.sum(citations >= 100).astype(int),
+        "m": h / (current_year - first_years + 1.0),
+    }
+
+
+def _histogram(values, first_year):
+    return dict((str(first_year + i), v) for i, v in enumerate(values))
+
+
+def compute_local(citations, years, authors, refereed=None, reads=None,
+                  read_years=None, citing_offsets=None, citing_years=None,
+                  citing_references=None, citing_refereed=None,
+                  groups=None, members=None, current_year=None):
+    """
+    Compute bibliometric indicators from per-paper data, in the layout of
+    the metrics returned by MetricsQuery, without any request. Groups of
+    papers, e.g. the papers of thousands of authors, are computed at once
+    with vectorized operations. Requires numpy.
+
+    The indicators follow the definitions of the metrics service: tori is
+    the sum over the citations of 1 / the number of references of the
+    citing paper, divided by the number of authors of the cited paper
+    (self-citations are not excluded), riq is 1000 sqrt(tori) / the number
+    of years since the first paper, m is h / that number of years, and
+    read10 is the sum of the reads of the current year of the papers of
+    the last 10 years, divided by their numbers of authors. Sections that
+    need data that is not given are left out (e.g. the refereed sections
+    without `refereed`, and the citation histograms without citing_*),
+    and indicators that need it are None.
+
+    :param citations: citation count of each paper; defaults to the
+        lengths of the citing lists
+    :param years: publication year of each paper
+    :param authors: number of authors of each paper
+    :param refereed: whether each paper is refereed
+    :param reads: matrix of the reads of each paper (rows) in each year
+        of `read_years` (columns)
+    :param read_years: years of the columns of `reads`
+    :param citing_offsets: the citing papers of paper i are the items
+        citing_offsets[i]:citing_offsets[i+1] of the citing_* arrays
+    :param citing_years: publication year of each citing paper
+    :param citing_references: number of references of each citing paper
+    :param citing_refereed: whether each citing paper is refereed
+    :param groups: group of each membership; by default all the papers
+        are one group
+    :param members: paper (index) of each membership
+    :param current_year: defaults to the current year
+    :return: metrics (dict), or a list of the metrics of each group; the
+        counts and indicators of no papers are zero, and their ratios None
+    """
+    _require_numpy("ads.metrics.compute_local")
+    current_year = current_year or datetime.date.today().year
+    years = np.asarray(years, dtype=np.int64)
+    authors = np.maximum(np.asarray(authors, dtype=float), 1)
+    size = len(years)
+    per_citation = None
+    if citing_offsets is not None:
+        citing_offsets = np.asarray(citing_offsets, dtype=np.int64)
+        counts = np.diff(citing_offsets)
+        per_citation = np.repeat(np.arange(size), counts)
+        if citations is None:
+            citations = counts
+    citations = np.asarray(citations, dtype=float)
+    if refereed is not None:
+        refereed = np.asarray(refereed, dtype=bool)
+
+    if groups is None:
+        papers = _Groups(np.zeros(size, dtype=np.int64),
+                         np.arange(size), 1)
+    else:
+        groups = np.asarray(groups, dtype=np.int64)
+        papers = _Groups(groups, np.asarray(members, dtype=np.int64),
+                         int(groups.max()) + 1 if len(groups) else 0)
+        if not papers.size:
+            return []
+
+    # Per-paper values
+    values = {"citations": citations,
+              "normalized citations": citations / authors}
+    tori = None
+    if per_citation is not None and citing_refereed is not None:
+        refereed_citations = np.bincount(
+            per_citation, weights=np.asarray(citing_refereed, dtype=float),
+            minlength=size
+        )
+        values["refereed citations"] = refereed_citations
+        values["normalized refereed citations"] = refereed_citations / authors
+    if per_citation is not None and citing_references is not None:
+        weights = 1.0 / np.maximum(np.asarray(citing_references, float), 1)
+        tori = np.bincount(per_citation, weights=weights,
+                           minlength=size) / authors
+    read10 = None
+    if reads is not None:
+        reads = np.asarray(reads, dtype=float)
+        read_years = list(read_years)
+        values["reads"] = reads.sum(axis=1)
+        if current_year in read_years:
+            recent = years > current_year - 10
+            read10 = np.where(recent, reads[:, read_years.index(current_year)],
+                              0) / authors
+
+    first_years = np.full(papers.size, current_year)
+    np.minimum.at(first_years, papers.groups, years[papers.members])
+    active = current_year - first_years + 1.0
+
+    sections = []  # (suffix, per-group arrays of each section)
+    masks = [("", np.ones(size, dtype=bool))]
+    if refereed is not None:
+        masks.append((" refereed", refereed))
+    for suffix, mask in masks:
+        selected = papers.select(mask)
+        number = selected.counts.astype(float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            basic = {
+                "number of papers": selected.counts,
+                "normalized paper count": selected.sum(1.0 / authors),
+            }
+            if "reads" in values:
+                basic["total number of reads"] = \
+                    selected.sum(values["reads"]).astype(int)
+                basic["average number of reads"] = \
+                    basic["total number of reads"] / number
+                basic["median number of reads"] = \
+                    selected.median(values["reads"])
+            stats = {}
+            for name in ["citations", "refereed citations"]:
+                if name not in values:
+                    continue
+                stats["total number of " + name] = \
+                    selected.sum(values[name]).astype(int)
+                stats["average number of " + name] = \
+                    stats["total number of " + name] / number
+                stats["median number of " + name] = \
+                    selected.median(values[name])
+                stats["normalized number of " + name] = \
+                    selected.sum(values["normalized " + name])
+            indicators = _indices(selected, citations, first_years,
+                                  current_year)
+            indicators["tori"] = None if tori is None else selected.sum(tori)
+            indicators["riq"] = None if tori is None else \
+                np.floor(1000 * np.sqrt(indicators["tori"]) /
+                         active).astype(int)
+            indicators["read10"] = None if read10 is None else \
+                selected.sum(read10)
+        sections.append((suffix, basic, stats, indicators))
+
+    # Histograms of each group over consecutive years, as
+    # (kind, name, per-group counts, per-group normalized counts, first year)
+    histograms = []
+    first_year = int(years.min()) if size else current_year
+    ny = current_year - first_year + 1
+    year_index = np.clip(years - first_year, 0, ny - 1)
+    for name, mask in masks:
+        selected = papers.select(mask)
+        index = selected.groups * ny + year_index[selected.members]
+        histograms.append((
+            "publications",
+            "{} publications".format("refereed" if name else "all"),
+            np.bincount(index, minlength=papers.size * ny),
+            np.bincount(index, weights=1.0 / authors[selected.members],
+                        minlength=papers.size * ny),
+            first_year,
+        ))
+    matrices = []
+    if reads is not None:
+        for name, mask in masks:
+            matrices.append(("reads", "{} reads".format(
+                "refereed" if name else "all"), reads, mask, read_years[0]))
+    if per_citation is not None and citing_years is not None and \
+            citing_refereed is not None and refereed is not None:
+        citing_years = np.asarray(citing_years, dtype=np.int64)
+        start = int(min(citing_years.min(), first_year)) \
+            if len(citing_years) else first_year
+        cny = current_year - start + 1
+        index = per_citation * cny + np.clip(citing_years - start, 0, cny - 1)
+        from_refereed = np.asarray(citing_refereed, dtype=bool)
+        for source, source_mask in [("refereed", from_refereed),
+                                    ("nonrefereed", ~from_refereed)]:
+            matrix = np.bincount(index[source_mask],
+                                 minlength=size * cny).reshape(size, cny)
+            for target, target_mask in [("refereed", refereed),
+                                        ("nonrefereed", ~refereed)]:
+                matrices.append(("citations",
+                                 "{} to {}".format(source, target),
+                                 matrix, target_mask, start))
+    for kind, name, matrix, mask, start in matrices:
+        selected = papers.select(mask)
+        histograms.append((kind, name, selected.sum_rows(matrix),
+                           selected.sum_rows(matrix / authors[:, None]),
+                           start))
+
+    # Python values of each group, converting whole arrays at once
+    columns = []
+    for suffix, basic, stats, indicators in sections:
+        for section, arrays in [("basic stats", basic),
+                                ("citation stats", stats),
+                                ("indicators", indicators)]:
+            for name, array in six.iteritems(arrays):
+                columns.append((section + suffix, name, _values(
+                    array, papers.size)))
+    rows = []
+    for kind, name, plain, normalized, start in histograms:
+        plain = plain.reshape(papers.size, -1)
+        normalized = normalized.reshape(papers.size, -1)
+        keys = [str(start + i) for i in range(plain.shape[1])]
+        rows.append((kind, name, keys, np.rint(plain).astype(int).tolist(),
+                     normalized.tolist()))
+
+    results = []
+    for group in range(papers.size):
+        metrics = {"histograms": {}}
+        for section, name, column in columns:
+            metrics.setdefault(section, {})[name] = column[group]
+        for kind, name, keys, plain, normalized in rows:
+            histogram = metrics["histograms"].setdefault(kind, {})
+            histogram[name] = dict(zip(keys, plain[group]))
+            histogram[name + " normalized"] = \
+                dict(zip(keys, normalized[group]))
+        results.append(metrics)
+    return results if groups is not None else results[0]
+
+
+def _values(array, size):
+    """
+    Return the python values of an array, with None for nan, or `size`
+    None if the array is None
+    """
+    if array is None:
+        return [None] * size
+    values = array.tolist()
+    if array.dtype.kind == "f":
+        values = [None if v != v else v for v in values]
+    return values
 
 
 class MetricsResponse(APIResponse):
@@ -14,8 +455,7 @@ class MetricsResponse(APIResponse):
     Data structure that represents a response from the ads metrics service
     """
     def __init__(self, http_response):
-        self._raw = http_response.text
-        self.metrics = http_response.json()
+        self.metrics, self._raw = self._decode(http_response)
 
     def __str__(self):
         if six.PY3:
@@ -25,6 +465,15 @@ class MetricsResponse(APIResponse):
     def __unicode__(self):
         return self.metrics
 
+    @classmethod
+    def from_metrics(cls, metrics):
+        """
+        Return a response holding `metrics`, e.g. merged ones
+        """
+        response = cls.__new__(cls)
+        response.metrics, response._raw = metrics, None
+        return response
+
 
 class MetricsQuery(BaseQuery):
     """
@@ -32,23 +481,89 @@ class MetricsQuery(BaseQuery):
     """
 
     HTTP_ENDPOINT = METRICS_URL
+    MAX_BIBCODES = 2000  # maximum number of bibcodes per request
+    # fields of the papers that merge_metrics needs
+    PAPER_FIELDS = ["bibcode", "citation_count", "property", "year"]
 
-    def __init__(self, bibcodes):
+    def __init__(self, bibcodes, workers=4):
         """
         :param bibcodes: Bibcodes to send to in the metrics query
         :type bibcodes: list or string
+        :param workers: number of requests to send concurrently, for more
+            than MAX_BIBCODES bibcodes
         """
         self.response = None  # current MetricsResponse object
         if isinstance(bibcodes, six.string_types):
             bibcodes = [bibcodes]
         self.bibcodes = bibcodes
+        self.workers = workers
         self.json_payload = json.dumps({"bibcodes": bibcodes})
 
     def execute(self):
         """
-        Execute the http request to the metrics service
+        Execute the http request to the metrics service. More than
+        MAX_BIBCODES bibcodes are sent in chunks, concurrently, and the
+        metrics of the chunks are merged with merge_metrics: the citation
+        counts and years of the papers are then fetched with bigqueries,
+        bypassing ads.config.store, to recompute
+        the order statistics and indicators, and the quantities that cannot
+        be recomputed are None.
         """
-        self.response = MetricsResponse.load_http_response(
-            self.session.post(self.HTTP_ENDPOINT, data=self.json_payload)
-        )
-        return self.response.metrics
\ No newline at end of file
+        if len(self.bibcodes) <= self.MAX_BIBCODES:
+            self.response = MetricsResponse.load_http_response(
+                self._request("POST", self.HTTP_ENDPOINT,
+                              data=self.json_payload)
+            )
+        else:
+            self.response = self._merge(ordered_map(
+                self._execute_chunk, self._chunks(), self.workers
+            ))
+        return self.response.metrics
+
+    def _chunks(self):
+        """
+        Split the bibcodes into chunks of MAX_BIBCODES
+        """
+        return [self.bibcodes[i:i+self.MAX_BIBCODES] for i in
+                range(0, len(self.bibcodes), self.MAX_BIBCODES)]
+
+    @staticmethod
+    def _merge(results):
+        """
+        Return the MetricsResponse of the (metrics, papers) of each chunk
+        """
+        parts, papers = [], []
+        for metrics, chunk_papers in results:
+            parts.append(metrics)
+            papers.extend(chunk_papers)
+        return MetricsResponse.from_metrics(merge_metrics(parts, papers))
+
+    @staticmethod
+    def _papers(articles, metrics):
+        """
+        Return the (citation_count, refereed, year) of the articles that
+        the metrics of their chunk did not skip
+        """
+        skipped = set(metrics.get("skipped bibcodes", []))
+        return [
+            (article._raw.get("citation_count") or 0,
+             "REFEREED" in (article._raw.get("property") or []),
+             article._raw.get("year"))
+            for article in articles if article.bibcode not in skipped
+        ]
+
+    def _execute_chunk(self, bibcodes):
+        """
+        Return the metrics of a chunk of bibcodes, and the (citation_count,
+        refereed, year) of its papers
+        """
+        # search imports this module
+        from .search import SearchQuery
+        metrics = MetricsResponse.load_http_response(self._request(
+            "POST", self.HTTP_ENDPOINT,
+            data=json.dumps({"bibcodes": bibcodes})
+        )).metrics
+        # the counts are fetched from the api, as stored ones may be stale
+        articles = SearchQuery.from_bibcodes(bibcodes, fl=self.PAPER_FIELDS,
+                                             use_store=False)
+        return metrics, self._papers(articles, metrics)
\ No newline at end of file
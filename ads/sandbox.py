@@ -6,12 +6,13 @@ responses rather than contact the live API
 import re
 
 from ads import search
-from .search import SearchQuery as _SearchQuery, Article as _Article
+from .search import SearchQuery as _SearchQuery, Article as _Article, \
+    BigQuery as _BigQuery
 from .metrics import MetricsQuery as _MetricsQuery
 from .export import ExportQuery as _ExportQuery
 
 from .tests.mocks import MockSolrResponse, MockMetricsResponse, \
-    MockExportResponse
+    MockExportResponse, MockBigQueryResponse
 
 
 class Article(_Article):
@@ -27,9 +28,23 @@ class SearchQuery(_SearchQuery):
     """
     Wrapper for ads.SearchQuery
     """
-    def execute(self):
+    def _send(self, query, stream=False):
         with MockSolrResponse(SearchQuery.HTTP_ENDPOINT):
-            super(SearchQuery, self).execute()
+            http_response = super(SearchQuery, self)._send(query, stream)
+            # read a streamed body while it is mocked
+            http_response.content
+            return http_response
+
+
+class BigQuery(_BigQuery):
+    """
+    Wrapper for ads.search.BigQuery
+    """
+    def _send(self, query, stream=False):
+        with MockBigQueryResponse(BigQuery.HTTP_ENDPOINT):
+            http_response = super(BigQuery, self)._send(query, stream)
+            http_response.content
+            return http_response
 
 
 class MetricsQuery(_MetricsQuery):
@@ -51,8 +66,13 @@ class ExportQuery(_ExportQuery):
         with MockExportResponse(re.compile(ExportQuery.HTTP_ENDPOINT)):
             return super(ExportQuery, self).execute()
 
+    def stream(self, fp, chunk_size=None, workers=4):
+        with MockExportResponse(re.compile(ExportQuery.HTTP_ENDPOINT)):
+            return super(ExportQuery, self).stream(fp, chunk_size, workers)
+
 
 # Monkey patch relevant classes that are called in ads.search
 search.Article = Article
+search.BigQuery = BigQuery
 search.MetricsQuery = MetricsQuery
 search.ExportQuery = ExportQuery
@@ -0,0 +1,311 @@
+"""
+Scheduling of the requests of all queries within the rate limits of the
+adsws api, used by every BaseQuery when set as ads.config.scheduler
+"""
+
+import threading
+import time
+
+from .config import ADSWS_API_URL
+from .exceptions import BudgetExceededError
+
+# Priority lanes: interactive requests are sent as soon as the rate limit
+# allows, bulk requests are paced and give way to interactive ones
+INTERACTIVE = "interactive"
+BULK = "bulk"
+PRIORITIES = (INTERACTIVE, BULK)
+
+try:
+    import contextvars
+except ImportError:
+    contextvars = None
+
+# The stack of jobs entered, per asyncio task and thread where contextvars
+# are available, and per thread before Python 3.7
+if contextvars is not None:
+    _jobs = contextvars.ContextVar("ads_jobs", default=())
+
+    def _get_jobs():
+        return _jobs.get()
+
+    def _set_jobs(jobs):
+        _jobs.set(jobs)
+else:
+    _local = threading.local()
+
+    def _get_jobs():
+        return getattr(_local, "jobs", ())
+
+    def _set_jobs(jobs):
+        _local.jobs = jobs
+
+
+def current_job():
+    """
+    Return the Job that the calling task or thread is running in, or None
+    """
+    jobs = _get_jobs()
+    return jobs[-1] if jobs else None
+
+
+def propagate(func):
+    """
+    Return `func` wrapped to run in the job of the calling thread, so that
+    the requests it sends from worker threads count against that job
+    """
+    if contextvars is not None:
+        context = contextvars.copy_context()
+
+        def wrapper(*args, **kwargs):
+            # a context is entered by one thread at a time
+            return context.copy().run(func, *args, **kwargs)
+        return wrapper
+
+    jobs = _get_jobs()
+
+    def wrapper(*args, **kwargs):
+        previous = _get_jobs()
+        _set_jobs(jobs)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _set_jobs(previous)
+    return wrapper
+
+
+class Job(object):
+    """
+    A unit of work whose requests share a priority and a budget. The
+    requests sent within `with job:`, including those of the worker
+    threads of the queries, are scheduled in the lane of the job and
+    counted against its budget. Jobs are entered per thread, and on Python
+    3.7+ per asyncio task.
+    """
+    def __init__(self, name=None, budget=None, priority=BULK):
+        """
+        :param name: name of the job, for error messages
+        :param budget: maximum number of requests; None for no limit
+        :param priority: INTERACTIVE or BULK
+        """
+        if priority not in PRIORITIES:
+            raise ValueError("priority must be one of {}".format(PRIORITIES))
+        self.name = name
+        self.budget = budget
+        self.priority = priority
+        self.used = 0
+        self._lock = threading.Lock()
+
+    @property
+    def remaining(self):
+        """
+        Number of requests left in the budget, or None if unlimited
+        """
+        if self.budget is None:
+            return None
+        return max(self.budget - self.used, 0)
+
+    def charge(self):
+        """
+        Count a request against the budget
+        :raises BudgetExceededError: if the budget is used up
+        """
+        with self._lock:
+            if self.budget is not None and self.used >= self.budget:
+                raise BudgetExceededError(
+                    "job {} used its budget of {} requests"
+                    .format(self.name, self.budget)
+                )
+            self.used += 1
+
+    def __enter__(self):
+        _set_jobs(_get_jobs() + (self,))
+        return self
+
+    def __exit__(self, *exc_info):
+        _set_jobs(_get_jobs()[:-1])
+
+
+class _Window(object):
+    """
+    The rate limit of an endpoint until its reset
+    """
+    def __init__(self, limit, remaining, reset):
+        self.limit = limit
+        self.remaining = remaining
+        self.reset = reset
+        self.next_bulk = 0
+
+
+class Scheduler(object):
+    """
+    Holds back requests to stay within the rate limits of each adsws
+    endpoint, read from the x-ratelimit headers of their responses.
+    Interactive requests are sent at once while the limit is not reached.
+    Bulk requests may not use the share of the limit kept in reserve for
+    interactive ones, and are spread evenly over the time left until the
+    reset, so that a bulk job never exhausts the limit before then. Bulk
+    requests also wait while interactive requests are waiting.
+
+    Until an endpoint has returned its rate limit headers, and after their
+    reset, its requests are not held back.
+    """
+    # Seconds that try_acquire holds back bulk requests while interactive
+    # requests are waiting
+    POLL = 0.1
+
+    def __init__(self, reserve=0.1):
+        """
+        :param reserve: fraction of the rate limit of each endpoint that
+            bulk requests leave to interactive ones
+        """
+        self.reserve = reserve
+        self._windows = {}
+        self._interactive = 0  # interactive requests waiting
+        self._cond = threading.Condition()
+
+    @staticmethod
+    def endpoint(url):
+        """
+        Return the adsws endpoint of `url`, e.g. "search/query", which the
+        api rate limits separately from the other endpoints, even those of
+        the same service
+        """
+        if url.startswith(ADSWS_API_URL):
+            url = url[len(ADSWS_API_URL):]
+        return url.split("?")[0].strip("/")
+
+    def limits(self):
+        """
+        Return the known rate limits of each endpoint
+        :return: dict of endpoint -> dict of limit, remaining and reset
+        """
+        with self._cond:
+            return dict(
+                (endpoint, {"limit": w.limit, "remaining": w.remaining,
+                            "reset": w.reset})
+                for endpoint, w in self._windows.items()
+            )
+
+    def update(self, url, headers):
+        """
+        Update the rate limit of the endpoint of `url` from the headers of
+        one of its responses; headers without rate limits are ignored
+        """
+        try:
+            limit = int(headers["x-ratelimit-limit"])
+            remaining = int(headers["x-ratelimit-remaining"])
+            reset = float(headers["x-ratelimit-reset"])
+        except (KeyError, TypeError, ValueError):
+            return
+        endpoint = self.endpoint(url)
+        with self._cond:
+            window = self._windows.get(endpoint)
+            if window is None or window.reset != reset:
+                self._windows[endpoint] = _Window(limit, remaining, reset)
+            else:
+                # responses to requests sent concurrently arrive out of order
+                window.remaining = min(window.remaining, remaining)
+            self._cond.notify_all()
+
+    def delay(self, url, priority=INTERACTIVE, now=None):
+        """
+        Return the seconds a request to `url` should wait before it is sent
+        """
+        now = now or time.time()
+        with self._cond:
+            return self._delay(self._window(self.endpoint(url), now),
+                               priority, now)
+
+    def _window(self, endpoint, now):
+        """
+        Return the current rate limit of `endpoint`, or None if unknown
+        """
+        window = self._windows.get(endpoint)
+        if window is not None and now >= window.reset:
+            del self._windows[endpoint]
+            return None
+        return window
+
+    def _delay(self, window, priority, now):
+        if window is None:
+            return 0
+        if priority == INTERACTIVE:
+            return 0 if window.remaining > 0 else window.reset - now
+        usable = window.remaining - int(self.reserve * window.limit)
+        if usable <= 0:
+            return window.reset - now
+        return max(window.next_bulk - now, 0)
+
+    def _take(self, endpoint, priority, now):
+        """
+        Count a request to `endpoint` against its rate limit if it may be
+        sent at `now`, and return 0; otherwise return the seconds to wait,
+        or None to wait for the interactive requests that are waiting
+        """
+        interactive = priority == INTERACTIVE
+        window = self._window(endpoint, now)
+        wait = self._delay(window, priority, now)
+        if wait > 0:
+            return wait
+        if not interactive and self._interactive:
+            return None
+        if window is not None:
+            window.remaining -= 1
+            if not interactive:
+                # spread what bulk may use over the rest of the window
+                usable = max(window.remaining -
+                             int(self.reserve * window.limit), 1)
+                window.next_bulk = now + (window.reset - now) / usable
+        return 0
+
+    def charge(self, priority=None):
+        """
+        Count a request against the budget of the current job
+        :param priority: INTERACTIVE or BULK; by default that of the
+            current job, or INTERACTIVE outside of jobs
+        :return: the priority of the request
+        :raises BudgetExceededError: if the current job used its budget
+        """
+        job = current_job()
+        if priority is None:
+            priority = INTERACTIVE if job is None else job.priority
+        if job is not None:
+            job.charge()
+        return priority
+
+    def acquire(self, url, priority=None):
+        """
+        Block until a request to `url` may be sent, and count it against
+        the rate limit, and the budget of the current job
+        :param priority: INTERACTIVE or BULK; by default that of the
+            current job, or INTERACTIVE outside of jobs
+        :raises BudgetExceededError: if the current job used its budget
+        """
+        priority = self.charge(priority)
+        endpoint = self.endpoint(url)
+        interactive = priority == INTERACTIVE
+        with self._cond:
+            if interactive:
+                self._interactive += 1
+            try:
+                while True:
+                    wait = self._take(endpoint, priority, time.time())
+                    if wait == 0:
+                        break
+                    self._cond.wait(wait)
+            finally:
+                if interactive:
+                    self._interactive -= 1
+                    self._cond.notify_all()
+
+    def try_acquire(self, url, priority=INTERACTIVE):
+        """
+        Count a request to `url` against the rate limit if it may be sent
+        now, without blocking, for callers that wait otherwise, e.g. on an
+        event loop. The budget of the current job is charged by charge().
+        :return: 0 if the request may be sent, or the seconds to wait
+            before trying again
+        """
+        with self._cond:
+            wait = self._take(self.endpoint(url), priority, time.time())
+        return self.POLL if wait is None else wait
@@ -2,16 +2,59 @@
 Interface to the adsws search api.
 """
 
+from collections import OrderedDict
 import warnings
+import itertools
+import threading
+import traceback
+import weakref
+import json
+import os
 import six
 import math
+import tempfile
 
-from .config import SEARCH_URL
+from .config import SEARCH_URL, BIGQUERY_URL
+import ads.config
 from .exceptions import SolrResponseParseError, APIResponseError
 from .base import BaseQuery, APIResponse
 from .metrics import MetricsQuery
 from .export import ExportQuery
-from .utils import cached_property
+from .utils import cached_property, ordered_map
+from .scheduler import propagate
+from .jsonstream import SolrStreamParser
+
+
+class _derived_property(cached_property):
+    """
+    A cached_property for a value computed from the record of an article,
+    e.g. by another service, which is cached in the _derived dict of the
+    article rather than in its record
+    """
+    def __get__(self, obj, type=None):
+        if obj is None:
+            return self
+        if self.__name__ not in obj._derived:
+            obj._derived[self.__name__] = self._compute(obj)
+        return obj._derived[self.__name__]
+
+    def __set__(self, obj, value):
+        obj._derived[self.__name__] = value
+
+
+def _tree_property(field):
+    """
+    Return a property for the "<field>_tree" set by _build_tree
+    """
+    tree = field + "_tree"
+
+    def get(self):
+        try:
+            return self._derived[tree]
+        except KeyError:
+            raise AttributeError("{} is set by build_{}()".format(tree, tree))
+    return property(get, doc="The papers in the {} tree of the article, "
+                             "set by build_{}()".format(field, tree))
 
 
 class Article(object):
@@ -24,13 +67,72 @@ class Article(object):
     # services; this is why it is currently impossible for it to live in
     # base.py, which is the most logical place for it.
 
+    # The record is stored once, as the instance __dict__, so that loaded
+    # fields are plain attribute lookups; _page, and the values computed
+    # from the record (metrics, bibtex, trees) in _derived, live outside
+    # of it. _page is the _ArticlePage the article was returned in, or a
+    # weak reference to it for queries that do not retain their pages.
+    __slots__ = ('_page', '_derived', '__dict__')
+
+    # Fields that are loaded on demand by _get_field
+    FIELDS = [
+        'abstract', 'ack', 'aff', 'alternate_bibcode', 'alternate_title',
+        'arxiv_class', 'author', 'citation_count', 'bibcode', 'bibgroup',
+        'copyright', 'data', 'database', 'doctype', 'doi', 'identifier',
+        'indexstamp', 'first_author', 'grant', 'issue', 'keyword', 'page',
+        'property', 'pub', 'pubdate', 'read_count', 'title', 'vizier',
+        'volume', 'year', 'orcid_pub', 'orcid_user', 'orcid_other',
+    ]
+    FIELD_DOCS = {
+        'orcid_pub': "ORCiD identifiers assigned by publishers",
+        'orcid_user': "ORCiD claims by ADS verified users.",
+        'orcid_other': "ORCiD claims by everybody else.",
+    }
+
     def __init__(self, **kwargs):
         """
         :param kwargs: Set object attributes from kwargs
         """
-        self._raw = kwargs
-        for key, value in six.iteritems(kwargs):
-            setattr(self, key, value)
+        self.__dict__ = kwargs
+        self._page = None  # _ArticlePage this article was returned in
+        self._derived = {}
+
+    @classmethod
+    def _from_doc(cls, doc):
+        """
+        Create an article that uses the solr document `doc` as its record,
+        without copying it
+        """
+        article = cls.__new__(cls)
+        article.__dict__ = doc
+        article._page = None
+        article._derived = {}
+        return article
+
+    def __getstate__(self):
+        # The page is left out, so that pickling an article does not pickle
+        # every article of its page
+        return self.__dict__, self._derived
+
+    def __setstate__(self, state):
+        self.__dict__, self._derived = state
+        self._page = None
+
+    def _result_page(self):
+        """
+        Return the _ArticlePage this article was returned in, or None
+        """
+        page = self._page
+        if isinstance(page, weakref.ref):
+            page = page()
+        return page
+
+    @property
+    def _raw(self):
+        """
+        The record of this article: all fields set or loaded so far
+        """
+        return self.__dict__
 
     def __str__(self):
         if six.PY3:
@@ -66,7 +168,8 @@ class Article(object):
     def iteritems(self):
         return six.iteritems(self._raw)
 
-    def build_reference_tree(self, depth=1, **kwargs):
+    def build_reference_tree(self, depth=1, max_nodes=10000, workers=4,
+                             **kwargs):
         """
         Builds a reference tree for this paper.
 
@@ -76,18 +179,26 @@ class Article(object):
         :type depth:
             int
 
+        :param max_nodes: [optional]
+            The maximum number of papers to fetch for the tree.
+
+        :param workers: [optional]
+            The number of bigqueries of a level to send concurrently.
+
         :param kwargs: [optional]
-            Keyword arguments to pass to ``ads.search``.
+            Keyword arguments to pass to ``SearchQuery.from_bibcodes``,
+            e.g. ``fl``.
 
 
         :returns:
             A list of references to the current article, with pre-loaded
-            references down by ``depth``.
+            references down by ``depth`` in their ``reference_tree``.
         """
+        return self._build_tree("reference", depth, max_nodes, workers,
+                                **kwargs)
 
-        raise NotImplementedError
-
-    def build_citation_tree(self, depth=1, **kwargs):
+    def build_citation_tree(self, depth=1, max_nodes=10000, workers=4,
+                            **kwargs):
         """
         Builds a citation tree for this paper.
 
@@ -97,16 +208,84 @@ class Article(object):
         :type depth:
             int
 
+        :param max_nodes: [optional]
+            The maximum number of papers to fetch for the tree.
+
+        :param workers: [optional]
+            The number of bigqueries of a level to send concurrently.
+
         :param kwargs: [optional]
-            Keyword arguments to pass to ``ads.search``.
+            Keyword arguments to pass to ``SearchQuery.from_bibcodes``,
+            e.g. ``fl``.
 
 
         :returns:
             A list of citation to the current article, with pre-loaded
-            citation down by ``depth``.
+            citation down by ``depth`` in their ``citation_tree``.
         """
+        return self._build_tree("citation", depth, max_nodes, workers,
+                                **kwargs)
 
-        raise NotImplementedError
+    reference_tree = _tree_property("reference")
+    citation_tree = _tree_property("citation")
+
+    def _build_tree(self, field, depth, max_nodes, workers, **kwargs):
+        """
+        Breadth-first crawl of the bibcodes in the `field` ("citation" or
+        "reference") of the papers of each level. The papers of a whole
+        level are fetched at once with bigqueries, together with their own
+        `field` unless they are the last level, and each paper is set as
+        "<field>_tree" the list of the papers it links to that were first
+        reached from its level; the papers of the last level are leaves,
+        with an empty "<field>_tree". Papers that were already reached are
+        not fetched again.
+        """
+        fl = kwargs.pop('fl', SearchQuery.DEFAULT_FIELDS)
+        if isinstance(fl, six.string_types):
+            fl = [f.strip() for f in fl.split(',')]
+        # `field` is only fetched for the leaves if it was requested
+        leaf_fl = [f for f in fl if f != 'bibcode'] + ['bibcode']
+        fl = [f for f in leaf_fl if f != field] + [field]
+
+        def fetch(bibcodes):
+            return list(SearchQuery.from_bibcodes(bibcodes, fl=fl, **kwargs))
+
+        def fetch_leaves(bibcodes):
+            return list(SearchQuery.from_bibcodes(bibcodes, fl=leaf_fl,
+                                                  **kwargs))
+
+        if field not in self._raw:
+            found = fetch([self.bibcode])
+            self._raw[field] = found[0]._raw.get(field) if found else None
+        tree = field + "_tree"
+        level = [self]
+        visited = set([self.bibcode])
+        for level_index in range(depth):
+            wanted = []
+            for node in level:
+                for bibcode in node._raw.get(field) or []:
+                    if bibcode not in visited and len(visited) < max_nodes:
+                        visited.add(bibcode)
+                        wanted.append(bibcode)
+            chunks = [wanted[i:i+BigQuery.MAX_BIBCODES]
+                      for i in range(0, len(wanted), BigQuery.MAX_BIBCODES)]
+            # Only the papers first reached from this level are children
+            new = set(wanted)
+            fetched = {}
+            fetch_level = fetch_leaves if level_index == depth - 1 else fetch
+            for articles in ordered_map(fetch_level, chunks, workers):
+                fetched.update((a.bibcode, a) for a in articles
+                               if a.bibcode in new)
+            for node in level:
+                node._derived[tree] = [fetched[b] for b in
+                                   node._raw.get(field) or []
+                                   if b in fetched]
+            level = [fetched[b] for b in wanted if b in fetched]
+            if not level:
+                break
+        for node in level:
+            node._derived.setdefault(tree, [])
+        return self._derived.get(tree, [])
 
     def _get_field(self, field):
         """
@@ -116,6 +295,16 @@ class Article(object):
         """
         if not hasattr(self, "id") or self.id is None:
             raise APIResponseError("Cannot query an article without an id")
+        page = self._result_page()
+        if page is not None and field not in _ArticlePage.UNBATCHED:
+            # Load the field for every article of the page at once
+            page.load(field)
+            return self._raw.get(field)
+        if ads.config.store is not None and \
+                field not in _ArticlePage.UNBATCHED:
+            ads.config.store.fill([self._raw], field)
+            if field in self._raw:
+                return self._raw[field]
         sq = next(SearchQuery(q="id:{}".format(self.id), fl=field))
         # If the requested field is not present in the returning Solr doc,
         # return None instead of hitting _get_field again.
@@ -131,164 +320,43 @@ class Article(object):
         self._raw[field] = value
         return value
 
-    @cached_property
-    def abstract(self):
-        return self._get_field('abstract')
-
-    @cached_property
-    def ack(self):
-        return self._get_field('ack')
-
-    @cached_property
-    def aff(self):
-        return self._get_field('aff')
-
-    @cached_property
-    def alternate_bibcode(self):
-        return self._get_field('alternate_bibcode')
-
-    @cached_property
-    def alternate_title(self):
-        return self._get_field('alternate_title')
-
-    @cached_property
-    def arxiv_class(self):
-        return self._get_field('arxiv_class')
-
-    @cached_property
-    def author(self):
-        return self._get_field('author')
-
-    @cached_property
-    def citation_count(self):
-        return self._get_field('citation_count')
-
-    @cached_property
-    def bibcode(self):
-        return self._get_field('bibcode')
-
-    @cached_property
-    def bibgroup(self):
-        return self._get_field('bibgroup')
-
-    @cached_property
-    def copyright(self):
-        return self._get_field('copyright')
-
-    @cached_property
-    def data(self):
-        return self._get_field('data')
-
-    @cached_property
-    def database(self):
-        return self._get_field('database')
-
-    @cached_property
-    def doctype(self):
-        return self._get_field('doctype')
-
-    @cached_property
-    def doi(self):
-        return self._get_field('doi')
-
-    @cached_property
-    def identifier(self):
-        return self._get_field('identifier')
-
-    @cached_property
-    def indexstamp(self):
-        return self._get_field('indexstamp')
-
-    @cached_property
-    def first_author(self):
-        return self._get_field('first_author')
-
-    @cached_property
-    def grant(self):
-        return self._get_field('grant')
-
-    @cached_property
-    def issue(self):
-        return self._get_field('issue')
-
-    @cached_property
-    def keyword(self):
-        return self._get_field('keyword')
-
-    @cached_property
-    def page(self):
-        return self._get_field('page')
-
-    @cached_property
-    def property(self):
-        return self._get_field('property')
-
-    @cached_property
-    def pub(self):
-        return self._get_field('pub')
-
-    @cached_property
-    def pubdate(self):
-        return self._get_field('pubdate')
-
-    @cached_property
-    def read_count(self):
-        return self._get_field('read_count')
-
     @cached_property
     def reference(self):
-        q = SearchQuery(
-            q='references(id:{})'.format(self.id),
-            fl=['id', 'bibcode']
-        )
-        return [a.bibcode for a in q]
+        """
+        The complete list of references of the article; use
+        ads.fetch_references to load those of many articles at once. The references
+        of the other articles of its page of results are loaded with them.
+        """
+        fetch_references(self._page_articles())
+        return self._raw.get("reference", [])
 
     @cached_property
     def citation(self):
-        q = SearchQuery(
-            q='citations(id:{})'.format(self.id),
-            fl=['id', 'bibcode']
-        )
-        return [a.bibcode for a in q]
-
-    @cached_property
-    def title(self):
-        return self._get_field('title')
-
-    @cached_property
-    def vizier(self):
-        return self._get_field('vizier')
+        """
+        The complete list of citations of the article; use
+        ads.fetch_citations to load those of many articles at once. The citations
+        of the other articles of its page of results are loaded with them.
+        """
+        fetch_citations(self._page_articles())
+        return self._raw.get("citation", [])
 
-    @cached_property
-    def volume(self):
-        return self._get_field('volume')
+    def _page_articles(self):
+        """
+        Return the articles of the page of results of this article, or only
+        this article if it was not returned by a search
+        """
+        page = self._result_page()
+        if page is None:
+            return [self]
+        return page.articles
 
-    @cached_property
-    def year(self):
-        return self._get_field('year')
-    
-    @cached_property
-    def orcid_pub(self):
-        """ORCiD identifiers assigned by publishers"""
-        return self._get_field('orcid_pub')
-    
-    @cached_property
-    def orcid_user(self):
-        """ORCiD claims by ADS verified users."""
-        return self._get_field('orcid_user')
-    
-    @cached_property
-    def orcid_other(self):
-        """ORCiD claims by everybody else."""
-        return self._get_field('orcid_other')
-    
-    @cached_property
+    @_derived_property
     def metrics(self):
         warnings.warn("metrics should be queried with ads.MetricsQuery(); You will"
                       "hit API ratelimits very quickly otherwise.", UserWarning)
         return MetricsQuery(bibcodes=self.bibcode).execute()
 
-    @cached_property
+    @_derived_property
     def bibtex(self):
         """Return a BiBTeX entry for the current article."""
         warnings.warn("bibtex should be queried with ads.ExportQuery(); You will "
@@ -296,32 +364,114 @@ class Article(object):
         return ExportQuery(bibcodes=self.bibcode, format="bibtex").execute()
 
 
+def _lazy_field(name, doc=None):
+    """
+    Return a cached property that loads the field `name` with _get_field
+    """
+    def load(self):
+        return self._get_field(name)
+    load.__name__ = name
+    load.__doc__ = doc
+    return cached_property(load)
+
+
+for _field in Article.FIELDS:
+    setattr(Article, _field, _lazy_field(_field, Article.FIELD_DOCS.get(_field)))
+
+
+class _ArticlePage(object):
+    """
+    The articles of one page of search results. Lazily loading a field of
+    one of them loads it for every article of the page, with one
+    "id:(...)" query per chunk of ids rather than one query per article.
+    """
+    ID_CHUNK_SIZE = 200  # ids per query, to keep the query string short
+    # These fields are not loaded from the solr document by _get_field
+    UNBATCHED = ["reference", "citation", "metrics", "bibtex"]
+
+    def __init__(self, articles):
+        """
+        :param articles: the articles of the page
+        :type articles: list of Article
+        """
+        self.articles = articles
+        self.on_load = None  # called with the name of each loaded field
+        for article in articles:
+            article._page = self
+
+    def release(self):
+        """
+        Make the articles refer to the page weakly, so that the articles
+        kept once the page is dropped do not keep the whole page alive
+        """
+        ref = weakref.ref(self)
+        for article in self.articles:
+            article._page = ref
+
+    def load(self, field):
+        """
+        Load `field` for every article of the page that does not have it yet
+        :param field: name of the record field to load
+        """
+        if self.on_load is not None:
+            self.on_load(field)
+        if ads.config.store is not None:
+            ads.config.store.fill([a._raw for a in self.articles], field)
+        pending = [a for a in self.articles
+                   if field not in a._raw and a._raw.get("id") is not None]
+        for i in range(0, len(pending), self.ID_CHUNK_SIZE):
+            chunk = pending[i:i+self.ID_CHUNK_SIZE]
+            q = SearchQuery(
+                q="id:({})".format(" OR ".join(str(a.id) for a in chunk)),
+                fl=[field],
+                rows=len(chunk),
+            )
+            docs = dict((str(doc.id), doc) for doc in q)
+            for article in chunk:
+                doc = docs.get(str(article.id))
+                value = None if doc is None else doc._raw.get(field)
+                article._raw[field] = value
+
+
 class SolrResponse(APIResponse):
     """
     Base class for storing a solr response
     """
 
-    def __init__(self, http_response):
+    def __init__(self, http_response, json=None):
         """
         De-serialize a json string representing a solr response
         :param http_response: complete json response from solr
         :type http_response: request.response
+        :param json: the already decoded body of the response, if any
         """
-        self._raw = http_response.text
-        self.json = http_response.json()
+        if json is None:
+            self.json, self._raw = self._decode(http_response)
+        else:
+            self.json, self._raw = json, None
         self._articles = None
+        self._page = None
         try:
             self.responseHeader = self.json['responseHeader']
             self.params = self.json['responseHeader']['params']
-            self.fl = self.params.get('fl', [])
-            if isinstance(self.fl, six.string_types):
-                self.fl = self.fl.split(',')
+            self.fl = self._fields(self.params)
             self.response = self.json['response']
             self.numFound = self.response['numFound']
             self.docs = self.response['docs']
+            self.num_docs = len(self.docs)
         except KeyError as e:
             raise SolrResponseParseError("{}".format(e))
 
+    @staticmethod
+    def _fields(params):
+        """
+        Return the "fl" of the solr response params as a list
+        """
+        fl = params.get('fl', [])
+        if isinstance(fl, six.string_types):
+            fl = fl.split(',')
+        return fl
+
     @property
     def articles(self):
         """
@@ -334,7 +484,14 @@ class SolrResponse(APIResponse):
                 # issue #38
                 for k in set(self.fl).difference(doc.keys()):
                     doc[k] = None
-                self._articles.append(Article(**doc))
+                self._articles.append(Article._from_doc(doc))
+            self._page = _ArticlePage(self._articles)
+            if ads.config.store is not None:
+                ads.config.store.upsert(self.docs)
+            if self._lean():
+                # The documents live on as the records of the articles
+                self.docs = None
+                del self.json['response']['docs']
         return self._articles
 
 
@@ -346,10 +503,18 @@ class SearchQuery(BaseQuery):
     DEFAULT_FIELDS = ["author", "first_author", "bibcode", "id", "year",
                       "title"]
     HIGHLIGHT_FIELDS = ["abstract", "title", "body", "ack", "aff", "author"]
+    STREAM_CHUNK_SIZE = 16384  # bytes read at a time by incremental queries
+    # kwargs of from_bibcodes that do not restrict the records returned,
+    # with which they can be served from ads.config.store
+    _UNFILTERED_KWARGS = frozenset([
+        "fl", "sort", "rows", "token", "hl", "prefetch", "parallel_pages",
+        "retain", "auto_fl", "incremental",
+    ])
 
     def __init__(self, query_dict=None, q=None, fq=None, fl=DEFAULT_FIELDS,
                  sort=None, cursorMark=None, start=None, rows=50, max_pages=1,
-                 token=None, hl=None, **kwargs):
+                 token=None, hl=None, prefetch=0, parallel_pages=0,
+                 retain=True, auto_fl=False, incremental=False, **kwargs):
         """
         The constructor is designed to set valid and useful
         query params with potentially sparsely/selectively defined arguments
@@ -369,13 +534,43 @@ class SearchQuery(BaseQuery):
         :param token: optional API token to use for this searchquery
         :param hl: specify the type of highlights to return, 
                    ['abstract', 'title', 'body']
+        :param prefetch: number of pages to fetch and decode ahead of the
+            iterator on a background thread; 0 disables prefetching
+        :param parallel_pages: number of pages of a `start` based query to
+            request concurrently once the first page has returned numFound;
+            0 requests them one at a time
+        :param retain: if False, each page of articles (and its highlights)
+            is dropped once the iterator has moved past it, rather than
+            kept in `articles` for the life of the query
+        :param auto_fl: if True, fields that are lazily loaded on the
+            articles of a page are added to "fl" for the following pages. If
+            ads.config.auto_fl_file is set, the learned fields are persisted
+            there per "q" and "fq", and requested from the first page on
+        :param incremental: if True, each page is parsed while its body is
+            received, and the iterator returns each article as soon as its
+            document is complete instead of once the whole page has arrived.
+            Highlights and `response` are available once the page is
+            complete. Cannot be combined with prefetch or parallel_pages
         :param kwargs: kwargs to add to `q` as "key:value"
         """
         self._articles = []
         self._highlights = {}
         self.response = None  # current SolrResponse object
         self.max_pages = max_pages
-        self.__iter_counter = 0  # Counter for our custom iterator method
+        self.prefetch = int(prefetch)
+        self._prefetcher = None  # running _Prefetcher thread, if any
+        self.parallel_pages = int(parallel_pages)
+        self._pages = None  # ordered iterator of concurrently fetched pages
+        self.retain = retain
+        self._retrieved = 0  # Number of articles retrieved so far
+        self._dropped = 0  # Number of consumed articles no longer retained
+        self._iter_counter = 0  # Counter for our custom iterator method
+        self.auto_fl = auto_fl
+        self._learned_fields = set()
+        self.incremental = incremental
+        self._incoming = None  # generator of the articles of a streamed page
+        assert not (incremental and (self.prefetch or self.parallel_pages)), \
+            "incremental cannot be combined with prefetch or parallel_pages"
 
         if query_dict is not None:
             query_dict.setdefault('rows', 50)
@@ -449,11 +644,87 @@ class SearchQuery(BaseQuery):
         if token is not None:
             self.token = token
 
+        if self.auto_fl:
+            self._learned_fields.update(
+                self._load_learned_fields().get(self._signature, [])
+            )
+            self._add_learned_fields()
+
+    @property
+    def _signature(self):
+        """
+        Key under which the fields learned by auto_fl are persisted
+        """
+        return json.dumps([self._query.get('q'), self._query.get('fq')],
+                          sort_keys=True)
+
+    @staticmethod
+    def _load_learned_fields():
+        path = ads.config.auto_fl_file
+        if path is None or not os.path.exists(path):
+            return {}
+        with open(path) as fp:
+            try:
+                return json.load(fp)
+            except ValueError:
+                # a corrupt file is relearned from scratch
+                return {}
+
+    @staticmethod
+    def _save_learned_fields(learned):
+        """
+        Replace ads.config.auto_fl_file with `learned` at once, so that
+        readers and concurrent writers never see a partly written file
+        """
+        path = ads.config.auto_fl_file
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                   suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w') as fp:
+                json.dump(learned, fp)
+            # Python 2 lacks os.replace; os.rename replaces files on POSIX
+            getattr(os, "replace", os.rename)(tmp, path)
+        except Exception:
+            os.remove(tmp)
+            raise
+
+    def _learn_field(self, field):
+        """
+        Record a field that was lazily loaded on the articles of a page, and
+        persist it if ads.config.auto_fl_file is set
+        """
+        if field in self._learned_fields:
+            return
+        self._learned_fields.add(field)
+        if self._prefetcher is not None:
+            # the pages it requested ahead lack the field; request them
+            # again with it
+            self._prefetcher.stop()
+            self._prefetcher = None
+        if ads.config.auto_fl_file is not None:
+            learned = self._load_learned_fields()
+            learned[self._signature] = sorted(
+                self._learned_fields.union(learned.get(self._signature, []))
+            )
+            self._save_learned_fields(learned)
+
+    def _add_learned_fields(self):
+        """
+        Add the fields learned by auto_fl to "fl" of the next query
+        """
+        fl = self._query.get('fl', [])
+        if isinstance(fl, six.string_types):
+            fl = [f.strip() for f in fl.split(',')]
+        new = sorted(self._learned_fields.difference(fl))
+        if new:
+            self._query['fl'] = fl + new
+
     @property
     def articles(self):
         """
-        Read-only articles attribute should not be modified directly, as
-        it is used to gauge the progress of the query
+        Read-only articles attribute should not be modified directly. Unless
+        the query is created with retain=False, this holds every article
+        retrieved so far
         """
         return self._articles
 
@@ -466,7 +737,7 @@ class SearchQuery(BaseQuery):
         """
         if self.response is None:
             return "Query has not been executed"
-        return "{}/{}".format(len(self.articles), self.response.numFound)
+        return "{}/{}".format(self._retrieved, self.response.numFound)
 
     @property
     def query(self):
@@ -477,6 +748,46 @@ class SearchQuery(BaseQuery):
         """
         return self._query
 
+    @classmethod
+    def from_bibcodes(cls, bibcodes, use_store=True, **kwargs):
+        """
+        Stream the records of a (potentially very long) list of bibcodes.
+        The bibcodes are sent to the bigquery endpoint in chunks of at most
+        BigQuery.MAX_BIBCODES, and each chunk is paged with a cursor.
+        If ads.config.store is set, the records it holds with all the
+        fields of `fl` are returned from it first, unless `kwargs` restrict
+        the records returned (e.g. `q`, `fq`, `max_pages` or a "key:value"
+        kwarg): the store cannot apply a solr query, so every record is then
+        fetched from the api.
+        :param bibcodes: bibcodes of the records to return
+        :type bibcodes: list or string
+        :param use_store: False fetches every record from the api, e.g. to
+            refresh the records of ads.config.store
+        :param kwargs: kwargs passed to BigQuery, e.g. `fl`
+        :return: generator of Article
+        """
+        if isinstance(bibcodes, six.string_types):
+            bibcodes = [bibcodes]
+        bibcodes = list(bibcodes)
+        filtering = set(kwargs) - cls._UNFILTERED_KWARGS
+        if kwargs.get('q') in (None, '*:*'):
+            filtering.discard('q')
+        if not kwargs.get('fq'):
+            filtering.discard('fq')
+        if use_store and ads.config.store is not None and not filtering:
+            fl = kwargs.get('fl', cls.DEFAULT_FIELDS)
+            if isinstance(fl, six.string_types):
+                fl = [f.strip() for f in fl.split(',')]
+            stored = ads.config.store.get_many(bibcodes, ['id'] + list(fl))
+            for bibcode in bibcodes:
+                if bibcode in stored:
+                    yield Article._from_doc(stored[bibcode])
+            bibcodes = [b for b in bibcodes if b not in stored]
+        for i in range(0, len(bibcodes), BigQuery.MAX_BIBCODES):
+            chunk = bibcodes[i:i+BigQuery.MAX_BIBCODES]
+            for article in BigQuery(chunk, **kwargs):
+                yield article
+
     def highlights(self, article):
         """
         Return highlights for a given article
@@ -495,61 +806,591 @@ class SearchQuery(BaseQuery):
         """
         iterator method, for backwards compatibility with the list() workflow
         """
+        if self.incremental:
+            return self._next_incremental()
+
         # Allow immediate iteration without forcing a user to call .execute()
         # explicitly
         if self.response is None:
             self.execute()
 
         try:
-            cur = self._articles[self.__iter_counter]
+            cur = self._articles[self._iter_counter - self._dropped]
             # If no more articles, check to see if we should query for the
             # next page of results
         except IndexError:
-            # If we already have all the results, then iteration is done.
-            if len(self.articles) >= self.response.numFound:
-                raise StopIteration("All records found")
-
-            # if we have hit the max_pages limit, then iteration is done.
-            page = math.ceil(len(self.articles)/self.query['rows'])
-            if page >= self.max_pages:
-                raise StopIteration("Maximum number of pages queried")
+            # If we already have all the results or have hit the max_pages
+            # limit, then iteration is done.
+            reason = self._stop_reason(
+                self._retrieved, self.response.numFound, self.query['rows']
+            )
+            if reason is not None:
+                raise StopIteration(reason)
 
             # We aren't on the max_page of results nor do we have all
             # results: execute the next query and yield from the newly
             # extended .articles array.
-            self.execute()
-            cur = self._articles[self.__iter_counter]
+            self._next_page()
+            cur = self._articles[self._iter_counter - self._dropped]
 
-        self.__iter_counter += 1
+        self._iter_counter += 1
         return cur
 
+    def stream(self):
+        """
+        Iterate over the results without retaining them: each page is
+        dropped once it has been consumed, so that memory use stays flat
+        regardless of the number of results
+        :return: generator of Article
+        """
+        self.retain = False
+        for article in self:
+            yield article
+
+    def pages(self):
+        """
+        Iterate over the pages that have not been retrieved yet, without
+        retaining them: each page is dropped once the next one is requested
+        :return: generator of the list of articles of each page
+        """
+        self.retain = False
+        while self.response is None or self._stop_reason(
+                self._retrieved, self.response.numFound,
+                self.query['rows']) is None:
+            self._next_page()
+            if not self.response.num_docs:
+                return
+            # the caller takes over the page, so the iterator moves past it
+            self._iter_counter = self._retrieved
+            yield self.response.articles
+
+    def _stop_reason(self, retrieved, num_found, rows):
+        """
+        Return the reason that no further page should be requested once
+        `retrieved` of `num_found` records have been received, or None if
+        the next page should be requested
+        """
+        if retrieved >= num_found:
+            return "All records found"
+        page = math.ceil(retrieved/rows)
+        if page >= self.max_pages:
+            return "Maximum number of pages queried"
+        return None
+
+    def _next_page(self):
+        """
+        Load the next page of results, either by executing the query or by
+        taking the page from the background prefetcher
+        """
+        if self.auto_fl:
+            self._add_learned_fields()
+        if self.parallel_pages and self.response is not None \
+                and self.query.get('start') is not None:
+            return self._next_parallel_page()
+        if not self.prefetch:
+            return self.execute()
+
+        while True:
+            if self._prefetcher is None:
+                self._start_prefetcher()
+            item = self._prefetcher.queue.get()
+            if item is None:
+                # The prefetcher stopped at max_pages; max_pages has since
+                # been increased, so restart it from the current query
+                self._prefetcher = None
+                continue
+            response, next_query, error = item
+            if error is not None:
+                self._prefetcher = None
+                raise error
+            return self._load_response(response, next_query)
+
+    def _start_prefetcher(self):
+        """
+        Start requesting the pages that follow the current one in the
+        background
+        """
+        self._prefetcher = _Prefetcher(
+            self, self.query, self._retrieved, self.prefetch
+        )
+        self._prefetcher.start()
+
+    def _start_queries(self):
+        """
+        Generate the queries of the remaining pages of a `start` based
+        query, up to numFound or max_pages
+        """
+        query = self.query
+        retrieved = self._retrieved
+        while self._stop_reason(retrieved, self.response.numFound,
+                                query['rows']) is None:
+            if self.auto_fl and 'fl' in self._query:
+                # the fields learned since the pool started apply to the
+                # pages it has not requested yet
+                query = dict(query, fl=self._query['fl'])
+            yield query
+            retrieved += query['rows']
+            query = dict(query, start=query['start'] + query['rows'])
+
+    def _next_parallel_page(self):
+        """
+        Load the next page of a `start` based query from a pool of
+        parallel_pages threads; pages are requested ahead of the iterator
+        and loaded in order from a bounded reorder buffer
+        """
+        while True:
+            if self._pages is None:
+                self._pages = ordered_map(
+                    self._fetch_page, self._start_queries(),
+                    self.parallel_pages
+                )
+            try:
+                response, next_query = next(self._pages)
+            except StopIteration:
+                # The pages up to the former max_pages are exhausted, and
+                # max_pages has since been increased
+                self._pages = None
+                continue
+            return self._load_response(response, next_query)
+
+    def _fetch_page(self, query):
+        """
+        Request and decode the page for `query`, possibly on another thread
+        :param query: solr query params
+        :return: the SolrResponse and the query for the following page
+        """
+        response = self._get_response(query)
+        # build the articles here, off the consuming thread
+        response.articles
+        return response, self._advance(query, response)
+
+    def _send(self, query, stream=False):
+        """
+        Send the http request for `query`
+        :param query: solr query params
+        :param stream: if True, the body is not read until it is iterated
+        :return: requests.Response
+        """
+        return self._request("GET", self.HTTP_ENDPOINT, params=query,
+                             stream=stream)
+
+    def _get_response(self, query):
+        """
+        Send the http request for `query` and return the SolrResponse
+        :param query: solr query params
+        """
+        return SolrResponse.load_http_response(self._send(query))
+
+    def _next_incremental(self):
+        """
+        Return the next article of an incremental query, reading as much of
+        the current page as needed
+        """
+        while True:
+            if self._incoming is not None:
+                article = next(self._incoming, None)
+                if article is not None:
+                    self._iter_counter += 1
+                    return article
+                self._incoming = None
+            if self.response is not None:
+                reason = self._stop_reason(
+                    self._retrieved, self.response.numFound,
+                    self.query['rows']
+                )
+                if reason is not None:
+                    raise StopIteration(reason)
+                if not self.response.num_docs:
+                    raise StopIteration("All records found")
+            if self.auto_fl:
+                self._add_learned_fields()
+            self._incoming = self._stream_page(self.query)
+
+    def _stream_page(self, query):
+        """
+        Request the page for `query` and generate its articles as their
+        documents arrive. Once the body is complete, the page becomes the
+        current response and the query advances to the following page.
+        :param query: solr query params
+        """
+        http_response = self._send(query, stream=True)
+        if not http_response.ok:
+            raise APIResponseError(http_response.text)
+        if not self.retain:
+            self._drop_consumed()
+        page = _ArticlePage([])
+        if self.auto_fl:
+            page.on_load = self._learn_field
+        link = page if self.retain else weakref.ref(page)
+        parser = SolrStreamParser()
+        # solr echoes the requested "fl" in the header of the response
+        fl = set(SolrResponse._fields(query))
+        chunks = http_response.iter_content(self.STREAM_CHUNK_SIZE)
+        for chunk in itertools.chain(chunks, [None]):
+            docs = parser.feed(chunk)
+            for doc in docs:
+                # ensure all fields in the "fl" are in the doc, as
+                # SolrResponse.articles does
+                for k in fl.difference(doc.keys()):
+                    doc[k] = None
+            if docs and ads.config.store is not None:
+                # store the documents before the caller gets their articles,
+                # as SolrResponse.articles does
+                ads.config.store.upsert(docs)
+            for doc in docs:
+                article = Article._from_doc(doc)
+                article._page = link
+                page.articles.append(article)
+                self._articles.append(article)
+                yield article
+
+        response = SolrResponse.load_http_response(http_response,
+                                                   json=parser.result)
+        response.num_docs = len(page.articles)
+        response.docs = None  # the documents became the articles
+        response._articles, response._page = page.articles, page
+        self._load_response(response, articles=False)
+        self._highlights.update(response.json.get("highlighting", {}))
+
+    @staticmethod
+    def _advance(query, response):
+        """
+        Return the query that requests the page following `response`
+        :param query: solr query params that produced `response`
+        :param response: SolrResponse
+        """
+        query = dict(query)
+        # ADS will apply a ceiling to 'rows' and re-write the query
+        # references https://github.com/andycasey/ads/issues/45
+        query['rows'] = int(response.responseHeader.get("params", {}).get("rows"))
+        if query.get('start') is not None:
+            query['start'] += query['rows']
+        elif query.get('cursorMark') is not None:
+            query['cursorMark'] = response.json.get("nextCursorMark")
+        return query
+
+    def _load_response(self, response, next_query=None, articles=True):
+        """
+        Make `response` the current page of results and advance the query
+        to the following page
+        :param response: SolrResponse for self.query
+        :param next_query: the already computed query for the following page
+        :param articles: if False, only the progress of the query is
+            updated and no articles are created for the page
+        """
+        self.response = response
+        if next_query is None:
+            next_query = self._advance(self.query, response)
+
+        # This code checks if the rows were re-written by comparing the
+        # reponse "rows" with what we sent in our query
+        if next_query['rows'] != self.query.get("rows"):
+            warnings.warn("Response rows did not match input rows. "
+                          "Setting this query's rows to {}".format(next_query['rows']))
+
+        self._retrieved += response.num_docs
+        self._query = next_query
+        if not articles:
+            return
+
+        if not self.retain:
+            self._drop_consumed()
+        self._articles.extend(response.articles)
+        if not self.retain:
+            response._page.release()
+        if self.auto_fl:
+            response._page.on_load = self._learn_field
+        self._highlights.update(response.json.get("highlighting", {}))
+
+    def _drop_consumed(self):
+        """
+        Drop the articles the iterator has already moved past
+        """
+        consumed = self._iter_counter - self._dropped
+        del self._articles[:consumed]
+        self._dropped += consumed
+        self._highlights = {}
+
     def execute(self):
         """
         Sends the http request implied by the self.query
         In addition, set up the request such that we can call next()
         to provide the next page of results
         """
-        self.response = SolrResponse.load_http_response(
-            self.session.get(self.HTTP_ENDPOINT, params=self.query)
+        if self._prefetcher is not None:
+            # the prefetcher already requested the page of self.query
+            return self._next_page()
+        if self._pages is not None:
+            # the parallel_pages pool requested the pages from the offset of
+            # self.query; it is rebuilt from the offset of the next page
+            self._pages.close()
+            self._pages = None
+        self._load_response(self._get_response(self.query))
+        if self.prefetch and self._prefetcher is None:
+            # request the next page while this one is consumed, unless
+            # parallel_pages requests the following pages
+            reason = self._stop_reason(
+                self._retrieved, self.response.numFound, self.query['rows']
+            )
+            parallel = self.parallel_pages and \
+                self.query.get('start') is not None
+            if reason is None and self.response.num_docs and not parallel:
+                self._start_prefetcher()
+
+    def _responses(self):
+        """
+        Generate the SolrResponse of each page that has not been retrieved
+        yet, up to numFound or max_pages, without creating Articles
+        """
+        while self.response is None or self._stop_reason(
+                self._retrieved, self.response.numFound,
+                self.query['rows']) is None:
+            response = self._get_response(self.query)
+            self._load_response(response, articles=False)
+            yield response
+            if not response.num_docs:
+                return
+
+    def _fields(self):
+        """
+        Return the fields of "fl", or the default fields if the query does
+        not set it
+        """
+        fields = self.query.get('fl', self.DEFAULT_FIELDS)
+        if isinstance(fields, six.string_types):
+            fields = [f.strip() for f in fields.split(",")]
+        return fields
+
+    def to_columns(self, fields=None):
+        """
+        Build a columnar ResultTable straight from the docs of the pages
+        that have not been retrieved yet, without creating Articles.
+        Requires numpy.
+        :param fields: fields to build columns for; defaults to "fl"
+        :return: ads.table.ResultTable
+        """
+        from .table import ResultTable
+        if fields is None:
+            fields = self._fields()
+        return ResultTable.from_pages(
+            (response.docs for response in self._responses()), fields
+        )
+
+    def to_dataframe(self, fields=None):
+        """
+        Build a pandas DataFrame straight from the docs of the pages that
+        have not been retrieved yet, without creating Articles. "year" and
+        "citation_count" are integers, "read_count" floats, "pubdate"
+        datetime64, and multivalued fields such as "author" hold lists.
+        Requires pandas.
+        :param fields: fields to build columns for; defaults to "fl"
+        :return: pandas.DataFrame
+        """
+        from .table import to_dataframe
+        if fields is None:
+            fields = self._fields()
+        return to_dataframe(
+            (response.docs for response in self._responses()), fields
+        )
+
+    def to_arrow(self, fields=None):
+        """
+        Build a pyarrow Table with typed columns, as to_dataframe() does.
+        Requires pyarrow.
+        :param fields: fields to build columns for; defaults to "fl"
+        :return: pyarrow.Table
+        """
+        from .table import to_arrow
+        if fields is None:
+            fields = self._fields()
+        return to_arrow(
+            (response.docs for response in self._responses()), fields
         )
 
-        # ADS will apply a ceiling to 'rows' and re-write the query
-        # This code checks if that happened by comparing the reponse
-        # "rows" with what we sent in our query
-        # references https://github.com/andycasey/ads/issues/45
-        recv_rows = int(self.response.responseHeader.get("params", {}).get("rows"))
-        if recv_rows != self.query.get("rows"):
-            self._query['rows'] = recv_rows
-            warnings.warn("Response rows did not match input rows. "
-                          "Setting this query's rows to {}".format(self.query['rows']))
 
-        self._articles.extend(self.response.articles)
-        if self._query.get('start') is not None:
-            self._query['start'] += self._query['rows']
-        elif self._query.get('cursorMark') is not None:
-            self._query['cursorMark'] = self.response.json.get("nextCursorMark")
+class _Prefetcher(threading.Thread):
+    """
+    Background thread that requests and decodes the pages of a SearchQuery
+    ahead of its iterator. Pages are handed over on a queue that holds at
+    most `size` pages, and the thread stops at max_pages or once all records
+    are found, when the SearchQuery is garbage collected, or once stopped.
+    """
+    def __init__(self, search_query, query, retrieved, size):
+        """
+        :param search_query: SearchQuery to fetch pages for
+        :param query: solr query params of the first page to fetch
+        :param retrieved: number of records already retrieved
+        :param size: maximum number of pages to hold ahead of the iterator
+        """
+        super(_Prefetcher, self).__init__()
+        self.daemon = True
+        self.query = query
+        self.retrieved = retrieved
+        self.queue = six.moves.queue.Queue(maxsize=size)
+        self._search_query = weakref.ref(search_query)
+        self._stopped = threading.Event()
+        # the requests of the thread count in the job that started it
+        self.run = propagate(self.run)
+
+    def stop(self):
+        """
+        Stop requesting pages; the pages already requested are discarded
+        """
+        self._stopped.set()
+
+    def _put(self, item):
+        """
+        Block until the iterator accepts `item`; returns False if the
+        SearchQuery went away or the prefetcher was stopped in the meantime
+        """
+        while not self._stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except six.moves.queue.Full:
+                if self._search_query() is None:
+                    return False
+        return False
+
+    def run(self):
+        query, retrieved = self.query, self.retrieved
+        while not self._stopped.is_set():
+            search_query = self._search_query()
+            if search_query is None:
+                return
+            try:
+                response, next_query = search_query._fetch_page(query)
+                retrieved += response.num_docs
+                reason = search_query._stop_reason(
+                    retrieved, response.numFound, next_query['rows']
+                )
+            except Exception as error:
+                # drop every reference to the SearchQuery before blocking,
+                # including those of the frames of the traceback, so that
+                # _put gives up if it is abandoned
+                del search_query
+                if hasattr(traceback, "clear_frames"):
+                    traceback.clear_frames(error.__traceback__)
+                self._put((None, None, error))
+                return
+            del search_query
+
+            if not self._put((response, next_query, None)):
+                return
+            if reason is not None or not response.num_docs:
+                self._put(None)
+                return
+            query = next_query
+
+
+class BigQuery(SearchQuery):
+    """
+    Represents a query to the solr bigquery endpoint, which restricts the
+    results to a list of bibcodes sent in the body of the request
+    """
+    HTTP_ENDPOINT = BIGQUERY_URL
+    MAX_BIBCODES = 2000  # maximum number of bibcodes per bigquery
+
+    def __init__(self, bibcodes, q="*:*", rows=MAX_BIBCODES, max_pages=None,
+                 **kwargs):
+        """
+        :param bibcodes: bibcodes to restrict the query to
+        :type bibcodes: list or string
+        :param q: solr "q" param (query)
+        :param rows: solr "rows" param (rows)
+        :param max_pages: Maximum number of pages to return; by default all
+            records of the bibcodes are returned
+        :param kwargs: kwargs passed to SearchQuery
+        """
+        if isinstance(bibcodes, six.string_types):
+            bibcodes = [bibcodes]
+        assert len(bibcodes) <= self.MAX_BIBCODES, \
+            "A bigquery accepts at most {} bibcodes; use " \
+            "SearchQuery.from_bibcodes() for more".format(self.MAX_BIBCODES)
+        if max_pages is None:
+            # Each page returns at least one of the bibcodes
+            max_pages = max(len(bibcodes), 1)
+        # Not super(): ads.sandbox replaces the module level BigQuery
+        SearchQuery.__init__(self, q=q, rows=rows, max_pages=max_pages,
+                             **kwargs)
+        self.bibcodes = bibcodes
+        self.payload = u"bibcode\n{}".format(u"\n".join(bibcodes))
+
+    def _send(self, query, stream=False):
+        """
+        Post the bibcodes for `query`
+        :param query: solr query params
+        :param stream: if True, the body is not read until it is iterated
+        :return: requests.Response
+        """
+        return self._request(
+            "POST",
+            self.HTTP_ENDPOINT,
+            params=query,
+            data=self.payload.encode("utf-8"),
+            headers={"Content-Type": "big-query/csv"},
+            stream=stream,
+        )
+
+
+def fetch_references(articles, workers=4, **kwargs):
+    """
+    Load the complete `reference` of many articles at once, from their
+    stored reference field, which bigqueries of up to BigQuery.MAX_BIBCODES
+    articles return; the bigqueries are sent concurrently.
+    The references are cached on the articles, as if they had been lazily
+    loaded.
+    :param articles: Articles; those with references loaded are skipped
+    :param workers: number of bigqueries to send concurrently
+    :param kwargs: kwargs passed to SearchQuery.from_bibcodes
+    :return: list of the articles
+    """
+    return _fetch_links(articles, "reference", workers, **kwargs)
 
-        self._highlights.update(self.response.json.get("highlighting", {}))
+
+def fetch_citations(articles, workers=4, **kwargs):
+    """
+    Load the complete `citation` of many articles at once, from their
+    stored citation field, which bigqueries of up to BigQuery.MAX_BIBCODES
+    articles return; the bigqueries are sent concurrently.
+    The citations are cached on the articles, as if they had been lazily
+    loaded.
+    :param articles: Articles; those with citations loaded are skipped
+    :param workers: number of bigqueries to send concurrently
+    :param kwargs: kwargs passed to SearchQuery.from_bibcodes
+    :return: list of the articles
+    """
+    return _fetch_links(articles, "citation", workers, **kwargs)
+
+
+def _fetch_links(articles, field, workers, **kwargs):
+    """
+    Set the `field` ("reference" or "citation") of the articles that lack
+    it, to the bibcodes stored in that field of their records
+    """
+    articles = list(articles)
+    missing = OrderedDict()
+    for article in articles:
+        if field not in article._raw:
+            missing.setdefault(article.bibcode, []).append(article)
+    bibcodes = list(missing)
+    chunks = [bibcodes[i:i+BigQuery.MAX_BIBCODES]
+              for i in range(0, len(bibcodes), BigQuery.MAX_BIBCODES)]
+
+    def fetch(chunk):
+        return list(SearchQuery.from_bibcodes(
+            chunk, fl=['bibcode', field], **kwargs
+        ))
+
+    # a single chunk is fetched on this thread, without a pool
+    results = ordered_map(fetch, chunks, workers) if len(chunks) > 1 \
+        else map(fetch, chunks)
+    for found in results:
+        for record in found:
+            # solr leaves out the field of records that have no links
+            for article in missing.get(record.bibcode, []):
+                article._raw[field] = list(record._raw.get(field) or [])
+    return articles
 
 
 class query(SearchQuery):
@@ -0,0 +1,132 @@
+"""
+Local store of the records returned by the search api
+"""
+
+import json
+import time
+
+from .utils import SQLiteDatabase
+
+
+class ArticleStore(object):
+    """
+    A local mirror of solr records keyed by bibcode, in an sqlite database
+    shared by threads and processes. While it is set as ads.config.store,
+    every record that passes through SolrResponse.articles is merged into
+    it, keeping the union of the fields seen so far, and lazily loaded
+    fields and SearchQuery.from_bibcodes are served from it whenever it
+    holds the requested fields.
+    """
+    DEFAULT_PATH = "~/.ads/articles.sqlite"
+    CHUNK_SIZE = 500  # keys per statement, within sqlite's variable limit
+
+    def __init__(self, path=DEFAULT_PATH, timeout=30):
+        """
+        :param path: path of the sqlite database, created if needed
+        :param timeout: seconds to wait for a lock held by another writer
+        """
+        self._db = SQLiteDatabase(path, timeout=timeout)
+        self.path = self._db.path
+        conn = self._db.connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS articles ("
+            "bibcode TEXT PRIMARY KEY, id TEXT, updated REAL, record TEXT)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS articles_id "
+                     "ON articles (id)")
+
+    def __len__(self):
+        return self._db.connection().execute(
+            "SELECT COUNT(*) FROM articles").fetchone()[0]
+
+    def __contains__(self, bibcode):
+        return bool(self._find(self._db.connection(), bibcodes=[bibcode]))
+
+    def _find(self, conn, bibcodes=(), ids=()):
+        """
+        Return the stored (bibcode, id, record) of the given bibcodes and ids
+        """
+        rows = []
+        for column, keys in [("bibcode", list(bibcodes)),
+                             ("id", [str(i) for i in ids])]:
+            for i in range(0, len(keys), self.CHUNK_SIZE):
+                chunk = keys[i:i+self.CHUNK_SIZE]
+                rows.extend(conn.execute(
+                    "SELECT bibcode, id, record FROM articles "
+                    "WHERE {} IN ({})".format(column, ",".join("?" * len(chunk))),
+                    chunk
+                ))
+        return [(bibcode, id_, json.loads(record))
+                for bibcode, id_, record in rows]
+
+    def upsert(self, docs):
+        """
+        Merge solr documents into the store: the fields of a document are
+        added to, or replace, those stored for its bibcode. Documents
+        without a bibcode are merged into the record stored for their id.
+        :param docs: solr documents (dicts)
+        """
+        docs = [d for d in docs
+                if d.get("bibcode") or d.get("id") is not None]
+        with self._db.transaction() as conn:
+            for i in range(0, len(docs), self.CHUNK_SIZE):
+                chunk = docs[i:i+self.CHUNK_SIZE]
+                found = self._find(
+                    conn,
+                    bibcodes=[d["bibcode"] for d in chunk if d.get("bibcode")],
+                    ids=[d["id"] for d in chunk if not d.get("bibcode")],
+                )
+                records = dict((bibcode, record)
+                               for bibcode, _, record in found)
+                bibcodes = dict((id_, bibcode) for bibcode, id_, _ in found)
+                for doc in chunk:
+                    bibcode = doc.get("bibcode") or \
+                        bibcodes.get(str(doc.get("id")))
+                    if bibcode is not None:
+                        records.setdefault(bibcode, {}).update(doc)
+                now = time.time()
+                conn.executemany(
+                    "INSERT OR REPLACE INTO articles VALUES (?, ?, ?, ?)",
+                    [(bibcode, None if r.get("id") is None else str(r["id"]),
+                      now, json.dumps(r))
+                     for bibcode, r in records.items()]
+                )
+
+    def get(self, bibcode, fields=()):
+        """
+        Return the stored record of `bibcode`, or None if it is not stored
+        or lacks any of `fields`
+        """
+        return self.get_many([bibcode], fields).get(bibcode)
+
+    def get_many(self, bibcodes, fields=()):
+        """
+        Return the stored records of `bibcodes` that hold all of `fields`
+        :return: dict of bibcode -> record
+        """
+        found = self._find(self._db.connection(), bibcodes=bibcodes)
+        return dict((bibcode, record) for bibcode, _, record in found
+                    if all(f in record for f in fields))
+
+    def fill(self, records, field):
+        """
+        Set `field` on the records that lack it, if it is stored for their
+        bibcode or id
+        :param records: records (dicts), e.g. the _raw of articles
+        """
+        records = [r for r in records if field not in r and
+                   (r.get("bibcode") or r.get("id") is not None)]
+        if not records:
+            return
+        found = self._find(
+            self._db.connection(),
+            bibcodes=[r["bibcode"] for r in records if r.get("bibcode")],
+            ids=[r["id"] for r in records if not r.get("bibcode")],
+        )
+        by_bibcode = dict((b, s) for b, _, s in found if field in s)
+        by_id = dict((i, s) for _, i, s in found if field in s)
+        for record in records:
+            stored = by_bibcode.get(record.get("bibcode")) or \
+                by_id.get(str(record.get("id")))
+            if stored is not None:
+                record[field] = stored[field]
@@ -0,0 +1,435 @@
+"""
+Columnar result sets, for vectorized analytics over search results, and
+typed DataFrame/Arrow export. ResultTable requires numpy, to_dataframe
+requires pandas and to_arrow requires pyarrow.
+"""
+
+from collections import OrderedDict
+import datetime
+import numbers
+
+import six
+
+from .utils import np, _require_numpy
+
+# Fields holding a date, which ADS pads with "00" for an unknown day or month
+DATE_FIELDS = ['pubdate', 'date', 'entry_date']
+# Multivalued fields
+LIST_FIELDS = [
+    'author', 'author_norm', 'aff', 'title', 'alternate_title', 'keyword',
+    'identifier', 'doi', 'page', 'property', 'database', 'bibgroup', 'data',
+    'grant', 'orcid_pub', 'orcid_user', 'orcid_other', 'alternate_bibcode',
+    'arxiv_class', 'reference', 'citation', 'vizier', 'links_data', 'email',
+]
+
+
+def _parse_date(value):
+    """
+    Return the datetime of an ADS date such as "1971-10-00" or
+    "1971-10-01T00:00:00Z"; unknown months and days become 1
+    """
+    parts = [int(p) for p in value[:10].split("-")]
+    parts += [1] * (3 - len(parts))
+    return datetime.datetime(parts[0], max(parts[1], 1), max(parts[2], 1))
+
+
+def _field_type(field):
+    if field in DATE_FIELDS:
+        return datetime.datetime
+    if field in LIST_FIELDS:
+        return list
+    return ResultTable.FIELD_TYPES.get(field)
+
+
+_CONVERTERS = {
+    int: int,
+    float: float,
+    datetime.datetime: _parse_date,
+    list: lambda v: v if isinstance(v, list) else [v],
+}
+
+
+class _TypedColumns(object):
+    """
+    Accumulates the values of fields from pages of solr documents,
+    converted to the types of the fields as each page arrives
+    """
+    def __init__(self, fields):
+        self.columns = OrderedDict(
+            (f, []) for f in OrderedDict.fromkeys(fields)
+        )
+
+    def add(self, docs):
+        for field, values in self.columns.items():
+            convert = _CONVERTERS.get(_field_type(field))
+            if convert is None:
+                values.extend(doc.get(field) for doc in docs)
+            else:
+                values.extend(
+                    None if v is None else convert(v)
+                    for v in (doc.get(field) for doc in docs)
+                )
+
+
+def to_dataframe(pages, fields):
+    """
+    Build a pandas DataFrame from pages of solr documents. Integer fields
+    use the nullable "Int64" dtype when values are missing, dates are
+    datetime64 and multivalued fields hold lists.
+    :param pages: iterable of lists of solr documents (dicts)
+    :param fields: names of the fields to build columns for
+    """
+    import pandas as pd
+    columns = _TypedColumns(fields)
+    for docs in pages:
+        columns.add(docs)
+
+    data = OrderedDict()
+    for field, values in columns.columns.items():
+        kind = _field_type(field)
+        if kind is int:
+            series = pd.Series(values, dtype="Int64")
+            if not series.hasnans:
+                series = series.astype("int64")
+        elif kind is float:
+            series = pd.Series(values, dtype="float64")
+        elif kind is datetime.datetime:
+            series = pd.Series(pd.to_datetime(values))
+        else:
+            series = pd.Series(values, dtype=object)
+        data[field] = series
+    return pd.DataFrame(data, columns=list(data))
+
+
+def to_arrow(pages, fields):
+    """
+    Build a pyarrow Table from pages of solr documents, with typed columns:
+    int64, float64, timestamp for dates and list<string> for multivalued
+    fields; other fields are typed after their values.
+    :param pages: iterable of lists of solr documents (dicts)
+    :param fields: names of the fields to build columns for
+    """
+    import pyarrow as pa
+    types = {
+        int: pa.int64(),
+        float: pa.float64(),
+        str: pa.string(),
+        datetime.datetime: pa.timestamp("s"),
+        list: pa.list_(pa.string()),
+    }
+    columns = _TypedColumns(fields)
+    for docs in pages:
+        columns.add(docs)
+    return pa.table(OrderedDict(
+        (field, pa.array(values, type=types.get(_field_type(field))))
+        for field, values in columns.columns.items()
+    ))
+
+
+class EncodedColumn(object):
+    """
+    A dictionary encoded column of strings: `codes` holds, for every row,
+    the index of its value in `categories`, or -1 for missing values
+    """
+    def __init__(self, codes, categories):
+        """
+        :param codes: int32 array of category indices
+        :param categories: list of the distinct values
+        """
+        self.codes = codes
+        self.categories = categories
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __iter__(self):
+        for code in self.codes:
+            yield None if code < 0 else self.categories[code]
+
+    def __getitem__(self, index):
+        if isinstance(index, numbers.Integral):
+            code = self.codes[index]
+            return None if code < 0 else self.categories[code]
+        return EncodedColumn(self.codes[index], self.categories)
+
+    def _code(self, value):
+        try:
+            return self.categories.index(value)
+        except ValueError:
+            return None
+
+    def __eq__(self, value):
+        code = self._code(value)
+        if code is None:
+            return np.zeros(len(self), dtype=bool)
+        return self.codes == code
+
+    def __ne__(self, value):
+        return ~(self == value)
+
+    __hash__ = None
+
+    def isin(self, values):
+        """
+        Return a boolean mask of the rows whose value is one of `values`
+        """
+        codes = [c for c in map(self._code, values) if c is not None]
+        return np.isin(self.codes, codes)
+
+    def sort_keys(self):
+        """
+        Return an array that sorts like the values of the column, with
+        missing values last
+        """
+        order = sorted(range(len(self.categories)),
+                       key=lambda c: self.categories[c])
+        ranks = np.empty(len(self.categories) + 1, dtype=np.int32)
+        ranks[order] = np.arange(len(order), dtype=np.int32)
+        ranks[-1] = len(order)  # code -1
+        return ranks[self.codes]
+
+    def to_list(self):
+        return list(self)
+
+    def __repr__(self):
+        return "<EncodedColumn {} rows, {} categories>".format(
+            len(self), len(self.categories))
+
+
+class _ColumnBuilder(object):
+    """
+    Accumulates the values of one field, page by page
+    """
+    def __init__(self, field):
+        self.field = field
+        self.type = ResultTable.FIELD_TYPES.get(field)
+        self.chunks = []
+        self.categories = OrderedDict()
+
+    def add(self, values):
+        if self.type in (int, float):
+            self.chunks.append(np.array(
+                [np.nan if v is None else float(v) for v in values],
+                dtype=np.float64
+            ))
+        elif self.type is str:
+            setdefault = self.categories.setdefault
+            self.chunks.append(np.array(
+                [-1 if v is None else setdefault(v, len(self.categories))
+                 for v in values],
+                dtype=np.int32
+            ))
+        else:
+            self.chunks.append(values)
+
+    def build(self):
+        if self.type is int or self.type is float:
+            values = np.concatenate(self.chunks or [np.empty(0)])
+            if self.type is int and not np.isnan(values).any():
+                values = values.astype(np.int64)
+            return values
+        if self.type is str:
+            codes = np.concatenate(
+                self.chunks or [np.empty(0, dtype=np.int32)])
+            return EncodedColumn(codes, list(self.categories))
+
+        # Fields of unknown type are typed after their values
+        values = [v for chunk in self.chunks for v in chunk]
+        present = [v for v in values if v is not None]
+        if present and all(isinstance(v, numbers.Number)
+                           and not isinstance(v, bool) for v in present):
+            self.type = int if all(isinstance(v, numbers.Integral)
+                                   for v in present) else float
+        elif present and all(isinstance(v, six.string_types)
+                             for v in present):
+            self.type = str
+        else:
+            column = np.empty(len(values), dtype=object)
+            column[:] = values
+            return column
+        self.chunks = []
+        self.add(values)
+        return self.build()
+
+
+class ResultTable(object):
+    """
+    Search results stored as one array per field rather than one Article
+    per record. Numeric fields are numpy arrays (integer fields with
+    missing values become float arrays with NaN), string fields are
+    EncodedColumn, and multivalued fields are object arrays of lists.
+    """
+    # Types of the fields whose values are known; other fields are typed
+    # after their values
+    FIELD_TYPES = {
+        'year': int, 'citation_count': int, 'author_count': int,
+        'page_count': int, 'read_count': float, 'citation_count_norm': float,
+        'id': str, 'bibcode': str, 'first_author': str, 'pub': str,
+        'pubdate': str, 'date': str, 'doctype': str, 'volume': str,
+        'issue': str, 'copyright': str, 'indexstamp': str,
+    }
+
+    def __init__(self, columns):
+        """
+        :param columns: field name -> column, all of the same length
+        :type columns: OrderedDict
+        """
+        _require_numpy("ads.table")
+        self.columns = OrderedDict(columns)
+        lengths = set(len(c) for c in self.columns.values())
+        assert len(lengths) <= 1, "columns must have the same length"
+
+    @classmethod
+    def from_pages(cls, pages, fields):
+        """
+        Build a table from pages of solr documents, one page at a time
+        :param pages: iterable of lists of solr documents (dicts)
+        :param fields: names of the fields to build columns for
+        """
+        _require_numpy("ads.table")
+        builders = [_ColumnBuilder(f) for f in OrderedDict.fromkeys(fields)]
+        for docs in pages:
+            for builder in builders:
+                builder.add([doc.get(builder.field) for doc in docs])
+        return cls((b.field, b.build()) for b in builders)
+
+    @property
+    def fields(self):
+        return list(self.columns)
+
+    def __len__(self):
+        for column in self.columns.values():
+            return len(column)
+        return 0
+
+    def __contains__(self, field):
+        return field in self.columns
+
+    def __getitem__(self, field):
+        return self.columns[field]
+
+    def take(self, indices):
+        """
+        Return a table of the rows at `indices`, in that order
+        """
+        return ResultTable((f, c[indices]) for f, c in self.columns.items())
+
+    def filter(self, mask):
+        """
+        Return a table of the rows where the boolean `mask` is True, e.g.
+        table.filter(table['read_count'] > 10)
+        """
+        return self.take(np.asarray(mask, dtype=bool))
+
+    def sort(self, field, reverse=False):
+        """
+        Return a table sorted on `field`, with missing values last in both
+        directions; the sort is stable
+        """
+        column = self.columns[field]
+        if isinstance(column, EncodedColumn):
+            missing = column.codes < 0
+            column = column.sort_keys()
+        elif column.dtype.kind == "f":
+            missing = np.isnan(column)
+        else:
+            missing = np.zeros(len(column), dtype=bool)
+        if column.dtype.kind not in "iuf":
+            # Values of mixed types are compared as Python objects
+            if reverse:
+                # Sorting the reversed column keeps equal values in their
+                # original order once the result is reversed back
+                order = np.argsort(column[::-1], kind="stable")[::-1]
+                return self.take(len(column) - 1 - order)
+            return self.take(np.argsort(column, kind="stable"))
+        keys = -column if reverse else column
+        return self.take(np.lexsort((keys, missing)))
+
+    def group_by(self, field):
+        """
+        Group the rows on the values of `field`
+        :return: GroupBy
+        """
+        return GroupBy(self, field)
+
+    def __repr__(self):
+        return "<ResultTable {} rows: {}>".format(
+            len(self), ", ".join(self.fields))
+
+
+class GroupBy(object):
+    """
+    The rows of a ResultTable grouped on the values of a field. Aggregates
+    return a ResultTable with one row per group, sorted on the group key,
+    with missing values last.
+    """
+    def __init__(self, table, field):
+        self.table = table
+        self.field = field
+        column = table[field]
+        if isinstance(column, EncodedColumn):
+            # group on the ranks of the values, as codes are in first-seen
+            # order; the code of each group is taken from its first row
+            _, first, self._groups = np.unique(
+                column.sort_keys(), return_index=True, return_inverse=True
+            )
+            keys = EncodedColumn(column.codes[first], column.categories)
+        else:
+            keys, self._groups = np.unique(column, return_inverse=True)
+        self._groups = self._groups.reshape(-1)
+        self.keys = keys
+
+    def _result(self, name, values):
+        return ResultTable([(self.field, self.keys), (name, values)])
+
+    def count(self):
+        """
+        Number of rows of each group
+        """
+        return self._result(
+            "count", np.bincount(self._groups, minlength=len(self.keys))
+        )
+
+    def _values(self, field):
+        values = np.asarray(self.table[field], dtype=np.float64)
+        valid = ~np.isnan(values)
+        return values[valid], self._groups[valid]
+
+    def sum(self, field):
+        """
+        Sum of the numeric `field` over each group, ignoring missing values
+        """
+        values, groups = self._values(field)
+        sums = np.bincount(groups, weights=values, minlength=len(self.keys))
+        if self.table[field].dtype.kind in "iu":
+            sums = sums.astype(np.int64)
+        return self._result(field, sums)
+
+    def mean(self, field):
+        """
+        Mean of the numeric `field` over each group, ignoring missing values
+        """
+        values, groups = self._values(field)
+        sums = np.bincount(groups, weights=values, minlength=len(self.keys))
+        counts = np.bincount(groups, minlength=len(self.keys))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self._result(field, sums / counts)
+
+    def _extreme(self, field, ufunc, initial):
+        values, groups = self._values(field)
+        result = np.full(len(self.keys), initial)
+        ufunc.at(result, groups, values)
+        result[np.isinf(result)] = np.nan
+        return self._result(field, result)
+
+    def min(self, field):
+        """
+        Minimum of the numeric `field` over each group
+        """
+        return self._extreme(field, np.minimum, np.inf)
+
+    def max(self, field):
+        """
+        Maximum of the numeric `field` over each group
+        """
+        return self._extreme(field, np.maximum, -np.inf)
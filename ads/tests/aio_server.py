@@ -0,0 +1,121 @@
+"""
+Stub adsws server, and coroutines, for the tests of the asyncio interfaces.
+Requires Python 3.5+ and aiohttp; test_aio only imports it when both are
+available.
+"""
+import asyncio
+import json
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from ads.scheduler import current_job
+from .stubdata.solr import example_solr_response
+from .stubdata.metrics import example_metrics_response
+
+
+def solr_body(params, bibcodes=None, counts=None):
+    """
+    Stub solr response honouring "rows", like mocks.MockSolrResponse
+    :param bibcodes: posted bibcodes of a bigquery, which the documents
+        are restricted to
+    :param counts: dict of bibcode -> citation_count to set on the
+        documents
+    """
+    resp = json.loads(example_solr_response)
+    docs = resp['response']['docs']
+    if bibcodes is not None:
+        docs = [doc for doc in docs if doc['bibcode'] in bibcodes]
+    for doc in docs:
+        doc['citation_count'] = (counts or {}).get(doc['bibcode'], 0)
+    resp['response']['docs'] = docs
+    resp['response']['numFound'] = len(docs)
+    rows = min(int(params.get("rows", 50)), 300)
+    start = int(params.get("start", 0))
+    resp['response']['docs'] = resp['response']['docs'][start:start+rows]
+    resp['responseHeader']['params']['rows'] = rows
+    return json.dumps(resp)
+
+
+def export_entry(bibcode):
+    """
+    Stub bibtex entry of `bibcode`
+    """
+    return u"@ARTICLE{{{},\n  title = {{bibtex}}\n}}\n\n".format(bibcode)
+
+
+def export_body(payload):
+    """
+    Stub export response with an entry for each posted bibcode
+    """
+    return json.dumps({"export": u"".join(
+        export_entry(b) for b in json.loads(payload)["bibcode"]
+    )})
+
+
+class StubServer(object):
+    """
+    Local http server for the search, bigquery, metrics and export
+    services, which records the requests it receives
+    """
+
+    def __init__(self):
+        self.requests = []  # (method, path, query, body) of each request
+        self.counts = {}  # citation counts returned by bigqueries
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.ratelimit = {"x-ratelimit-limit": "400",
+                          "x-ratelimit-remaining": "10",
+                          "x-ratelimit-reset": "4102444800"}
+        app = web.Application()
+        app.router.add_get("/search/query/", self.search)
+        app.router.add_post("/search/bigquery/", self.bigquery)
+        app.router.add_post("/metrics/", self.metrics)
+        app.router.add_post("/export/{format}", self.export)
+        self.server = TestServer(app)
+
+    @property
+    def url(self):
+        return str(self.server.make_url("/"))
+
+    async def start(self):
+        await self.server.start_server()
+
+    async def close(self):
+        await self.server.close()
+
+    async def respond(self, request, body):
+        self.requests.append((request.method, request.path,
+                              request.query, await request.text()))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        # hold the request, so that concurrent ones overlap
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return web.Response(text=body, headers=self.ratelimit)
+
+    async def search(self, request):
+        return await self.respond(request, solr_body(request.query))
+
+    async def bigquery(self, request):
+        bibcodes = set((await request.text()).splitlines()[1:])
+        return await self.respond(request, solr_body(request.query, bibcodes,
+                                                      self.counts))
+
+    async def metrics(self, request):
+        return await self.respond(request, example_metrics_response)
+
+    async def export(self, request):
+        return await self.respond(request,
+                                  export_body(await request.text()))
+
+
+async def run_in_job(job, query, delay):
+    """
+    Execute `query` within `job`, `delay` seconds after entering it
+    :return: the current job once the query returned
+    """
+    with job:
+        await asyncio.sleep(delay)
+        await query.execute()
+        return current_job()
@@ -11,10 +11,14 @@ import json
 
 class HTTPrettyMock(object):
     """
-    httpretty context manager scaffolding
+    httpretty context manager scaffolding. Mocks can be nested, e.g. by the
+    sandbox within a test; httpretty is only reset and disabled when the
+    outermost of them exits.
     """
+    _depth = 0
 
     def __enter__(self):
+        HTTPrettyMock._depth += 1
         HTTPretty.enable()
 
     def __exit__(self, etype, value, traceback):
@@ -23,8 +27,10 @@ class HTTPrettyMock(object):
         :param value: exit value
         :param traceback: the traceback for the exit
         """
-        HTTPretty.reset()
-        HTTPretty.disable()
+        HTTPrettyMock._depth -= 1
+        if not HTTPrettyMock._depth:
+            HTTPretty.reset()
+            HTTPretty.disable()
 
 
 class MockResponse(object):
@@ -34,6 +40,10 @@ class MockResponse(object):
     def __init__(self, body):
         self.text = body
 
+    @property
+    def content(self):
+        return self.text.encode("utf-8")
+
     def json(self):
         return json.loads(self.text)
 
@@ -71,6 +81,16 @@ class MockSolrResponse(HTTPrettyMock):
     """
     context manager that mocks a Solr response
     """
+    method = HTTPretty.GET
+
+    def filter_docs(self, request, docs):
+        """
+        :param request: HTTP request
+        :param docs: stub solr documents
+        :return: the documents matched by the request
+        """
+        return docs
+
     def __init__(self, api_endpoint):
         """
         :param api_endpoint: name of the API end point
@@ -87,6 +107,10 @@ class MockSolrResponse(HTTPrettyMock):
             """
 
             resp = json.loads(example_solr_response)
+            resp['response']['docs'] = self.filter_docs(
+                request, resp['response']['docs']
+            )
+            resp['response']['numFound'] = len(resp['response']['docs'])
 
             # Mimic the start, rows behaviour
             rows = int(
@@ -117,13 +141,26 @@ class MockSolrResponse(HTTPrettyMock):
             return 200, headers, json.dumps(resp)
 
         HTTPretty.register_uri(
-            HTTPretty.GET,
+            self.method,
             self.api_endpoint,
             body=request_callback,
             content_type="application/json"
         )
 
 
+class MockBigQueryResponse(MockSolrResponse):
+    """
+    context manager that mocks a Solr bigquery response, returning only the
+    stub documents whose bibcodes were posted
+    """
+    method = HTTPretty.POST
+
+    def filter_docs(self, request, docs):
+        body = request.body.decode("utf-8").splitlines()
+        bibcodes = set(body[1:])
+        return [doc for doc in docs if doc['bibcode'] in bibcodes]
+
+
 class MockMetricsResponse(HTTPrettyMock):
     """
     context manager that mocks a metrics service response
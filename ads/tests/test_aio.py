@@ -0,0 +1,297 @@
+"""
+Tests for the asyncio interfaces
+"""
+import json
+import os
+import sys
+import time
+import unittest
+import six
+import shutil
+from tempfile import mkdtemp
+
+from mock import patch
+
+import ads.config
+from ads.exceptions import BudgetExceededError
+from ads.scheduler import Scheduler, Job, current_job, BULK, INTERACTIVE
+
+from .stubdata.solr import example_solr_response
+from .stubdata.metrics import example_metrics_response
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# the stub server is written with coroutines, which are a SyntaxError
+# before Python 3.5
+ASYNC = sys.version_info >= (3, 5) and aiohttp is not None
+if ASYNC:
+    from .aio_server import StubServer, export_entry, run_in_job
+
+
+@unittest.skipIf(not ASYNC, "requires Python 3.5+ and aiohttp")
+class TestAsyncQueries(unittest.TestCase):
+    """
+    Test AsyncSearchQuery, AsyncMetricsQuery and AsyncExportQuery against a
+    local http server
+    """
+
+    def setUp(self):
+        import asyncio
+
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.server = StubServer()
+        self.loop.run_until_complete(self.server.start())
+        self.url = self.server.url
+
+        from ads.aio import AsyncSearchQuery, AsyncBigQuery, \
+            AsyncMetricsQuery, AsyncExportQuery
+        self.patches = [
+            patch.object(AsyncSearchQuery, "HTTP_ENDPOINT",
+                         self.url + "search/query/"),
+            patch.object(AsyncBigQuery, "HTTP_ENDPOINT",
+                         self.url + "search/bigquery/"),
+            patch.object(AsyncMetricsQuery, "HTTP_ENDPOINT",
+                         self.url + "metrics/"),
+            patch.object(AsyncExportQuery, "HTTP_ENDPOINT",
+                         self.url + "export/"),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        from ads.aio import AsyncQuery
+        for p in self.patches:
+            p.stop()
+        self.loop.run_until_complete(AsyncQuery.close())
+        self.loop.run_until_complete(self.server.close())
+        self.loop.close()
+
+    def collect(self, query):
+        """
+        Run `async for` over query without async syntax, so that this
+        module can still be imported on Python 2
+        """
+        articles = []
+        while True:
+            try:
+                articles.append(self.loop.run_until_complete(query.__anext__()))
+            except StopAsyncIteration:
+                return articles
+
+    def test_search_query(self):
+        """
+        async iteration should page through the results like SearchQuery,
+        sending list params as repeated params
+        """
+        from ads.aio import AsyncSearchQuery
+        sq = AsyncSearchQuery(q="star", fq=["year:2000", "database:astronomy"],
+                              rows=10, start=0, max_pages=2)
+        articles = self.collect(sq)
+        self.assertEqual(len(articles), 20)
+        self.assertEqual(articles[0].bibcode, '1971Sci...174..142S')
+        self.assertEqual([r[2]['start'] for r in self.server.requests],
+                         ["0", "10"])
+        self.assertEqual(self.server.requests[0][2].getall('fq'),
+                         ["year:2000", "database:astronomy"])
+        self.assertEqual(sq.response.get_ratelimits()['remaining'], "10")
+
+        with self.assertRaises(TypeError):
+            iter(AsyncSearchQuery(q="star"))
+
+    def test_unsupported(self):
+        """
+        options and methods that need threads or blocking requests should
+        be refused
+        """
+        from ads.aio import AsyncSearchQuery
+        for name in AsyncSearchQuery.UNSUPPORTED:
+            with six.assertRaisesRegex(self, TypeError, name):
+                AsyncSearchQuery(q="star", **{name: 1})
+        sq = AsyncSearchQuery(q="star")
+        for method in [sq.stream, sq.pages, sq.to_columns, sq.to_dataframe,
+                       sq.to_arrow]:
+            with six.assertRaisesRegex(self, TypeError, method.__name__):
+                method()
+        with six.assertRaisesRegex(self, TypeError, "async for"):
+            next(sq)
+        self.assertEqual(self.server.requests, [])
+
+    def test_shared_pool(self):
+        """
+        concurrent queries should share one connection pool, with at most
+        max_concurrency requests in flight
+        """
+        import asyncio
+        from ads.aio import AsyncQuery, AsyncMetricsQuery
+        with patch.object(AsyncQuery, "max_concurrency", 2):
+            results = self.loop.run_until_complete(asyncio.gather(*[
+                AsyncMetricsQuery(['bibcode']).execute() for _ in range(6)
+            ]))
+        self.assertEqual(len(self.server.requests), 6)
+        self.assertEqual(self.server.max_in_flight, 2)
+        self.assertEqual(len(AsyncQuery._pools), 1)
+        self.assertEqual(results[0], json.loads(example_metrics_response))
+
+    def test_metrics_query(self):
+        """
+        awaiting execute() should return the metrics
+        """
+        from ads.aio import AsyncMetricsQuery
+        metrics = self.loop.run_until_complete(
+            AsyncMetricsQuery(['bibcode']).execute()
+        )
+        self.assertEqual(metrics, json.loads(example_metrics_response))
+        self.assertEqual(json.loads(self.server.requests[0][3]),
+                         {"bibcodes": ["bibcode"]})
+
+    def test_metrics_chunks(self):
+        """
+        more than MAX_BIBCODES bibcodes should be sent in chunks, and their
+        metrics merged with the citation counts of bigqueries
+        """
+        from ads.aio import AsyncMetricsQuery
+        docs = json.loads(example_solr_response)['response']['docs'][:4]
+        bibcodes = [doc['bibcode'] for doc in docs]
+        self.server.counts = dict(zip(bibcodes, [5, 0, 12, 3]))
+        with patch.object(AsyncMetricsQuery, "MAX_BIBCODES", 2):
+            metrics = self.loop.run_until_complete(
+                AsyncMetricsQuery(bibcodes).execute()
+            )
+        paths = sorted(r[1] for r in self.server.requests)
+        self.assertEqual(paths, ["/metrics/"] * 2 +
+                         ["/search/bigquery/"] * 2)
+        posted = [json.loads(r[3])["bibcodes"] for r in self.server.requests
+                  if r[1] == "/metrics/"]
+        self.assertEqual(sorted(posted), sorted([bibcodes[:2],
+                                                 bibcodes[2:]]))
+        # The stub returns the metrics of one paper for each chunk
+        self.assertEqual(metrics['basic stats']['number of papers'], 2)
+        self.assertIsNone(metrics['time series'])
+        self.assertEqual(metrics['indicators']['h'], 3)
+        self.assertEqual(
+            metrics['citation stats']['median number of citations'], 4.0
+        )
+
+    def test_export_query(self):
+        """
+        awaiting execute() should return the export string
+        """
+        from ads.aio import AsyncExportQuery
+        export = self.loop.run_until_complete(
+            AsyncExportQuery(['bibcode']).execute()
+        )
+        self.assertEqual(export, export_entry('bibcode'))
+        self.assertEqual(self.server.requests[0][1], "/export/bibtex")
+
+    def test_export_stream(self):
+        """
+        awaiting stream() should write the exports of the chunks in order,
+        with at most `workers` requests in flight
+        """
+        from ads.aio import AsyncExportQuery
+        bibcodes = ["bibcode{}".format(i) for i in range(5)]
+        fp = six.StringIO()
+        written = self.loop.run_until_complete(
+            AsyncExportQuery(bibcodes).stream(fp, chunk_size=2, workers=2)
+        )
+        expected = u"".join(export_entry(b) for b in bibcodes)
+        self.assertEqual(fp.getvalue(), expected)
+        self.assertEqual(written, len(expected))
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(self.server.max_in_flight, 2)
+
+    def test_export_cache(self):
+        """
+        only the bibcodes missing from ads.config.export_cache should be
+        requested
+        """
+        from ads.aio import AsyncExportQuery
+        from ads.cache import ExportCache
+        b1, b2, b3 = ['2001ApJ...551L..17T', '2002A&A...384..473A',
+                      '2003MNRAS.340..105S']
+        directory = mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        cache = ExportCache(os.path.join(directory, "exports.sqlite"))
+        with patch.object(ads.config, "export_cache", cache):
+            for bibcodes in [[b1, b2], [b3, b1], [b2, b1]]:
+                export = self.loop.run_until_complete(
+                    AsyncExportQuery(bibcodes).execute()
+                )
+                self.assertEqual(export, u"".join(export_entry(b)
+                                                  for b in bibcodes))
+        self.assertEqual([json.loads(r[3])["bibcode"]
+                          for r in self.server.requests], [[b1, b2], [b3]])
+
+    def test_scheduler(self):
+        """
+        Requests wait for ads.config.scheduler without blocking the event
+        loop, count against the budget of their job, and update the
+        scheduler with their rate limit headers
+        """
+        from ads.aio import AsyncMetricsQuery
+        s = Scheduler()
+        # the rate limit is used up for a moment
+        url = self.url + "metrics/"
+        s.update(url, {"x-ratelimit-limit": "400",
+                       "x-ratelimit-remaining": "0",
+                       "x-ratelimit-reset": str(time.time() + 0.2)})
+        received = []
+        self.loop.call_later(
+            0.05, lambda: received.append(len(self.server.requests))
+        )
+        with patch.object(ads.config, "scheduler", s), \
+                patch.object(s, "try_acquire", wraps=s.try_acquire) as tried, \
+                patch.object(s, "update", wraps=s.update) as update, \
+                Job(budget=1) as job:
+            begin = time.time()
+            self.loop.run_until_complete(
+                AsyncMetricsQuery(['bibcode']).execute()
+            )
+            self.assertGreaterEqual(time.time() - begin, 0.15)
+            with self.assertRaises(BudgetExceededError):
+                self.loop.run_until_complete(
+                    AsyncMetricsQuery(['bibcode']).execute()
+                )
+        # the loop ran while the request waited
+        self.assertEqual(received, [0])
+        self.assertGreater(tried.call_count, 1)
+        self.assertEqual(job.used, 1)
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(update.call_count, 1)
+        self.assertEqual(s.limits()[s.endpoint(url)]["remaining"], 10)
+
+    @unittest.skipIf(sys.version_info < (3, 7), "requires contextvars")
+    def test_scheduler_jobs(self):
+        """
+        Concurrent tasks should each charge the job they entered, in its
+        priority lane, even when their jobs are entered and exited
+        interleaved
+        """
+        import asyncio
+        from ads.aio import AsyncMetricsQuery
+        s = Scheduler()
+        bulk = Job("bulk", priority=BULK)
+        interactive = Job("interactive", priority=INTERACTIVE)
+        # leave bulk requests room within the rate limit of the stub
+        self.server.ratelimit["x-ratelimit-remaining"] = "400"
+        with patch.object(ads.config, "scheduler", s), \
+                patch.object(s, "try_acquire", wraps=s.try_acquire) as tried:
+            # bulk is entered first and exited first, while interactive is
+            # entered
+            jobs = self.loop.run_until_complete(asyncio.gather(
+                run_in_job(bulk, AsyncMetricsQuery(['bibcode']), 0),
+                run_in_job(interactive, AsyncMetricsQuery(['bibcode']), 0.05),
+            ))
+        self.assertEqual(jobs, [bulk, interactive])
+        self.assertEqual((bulk.used, interactive.used), (1, 1))
+        self.assertEqual(sorted(c[0][1] for c in tried.call_args_list),
+                         [BULK, INTERACTIVE])
+        self.assertIsNone(current_job())
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,279 @@
+"""
+Tests for the response caches
+"""
+import os
+import subprocess
+import sys
+import threading
+import unittest
+import shutil
+from tempfile import mkdtemp
+from mock import patch
+
+import ads.config
+from ads.cache import BaseCache, ResponseCache, DiskCache, ExportCache
+from ads.base import RateLimits
+from ads.search import SearchQuery
+from ads.metrics import MetricsQuery
+from ads.config import SEARCH_URL, METRICS_URL, EXPORT_URL
+from .mocks import MockSolrResponse, MockMetricsResponse
+
+
+class FakeResponse(object):
+    """
+    the parts of a requests.Response that the caches keep
+    """
+    ok = True
+    status_code = 200
+    headers = {"Content-Type": "application/json"}
+    url = SEARCH_URL
+    encoding = "utf-8"
+
+    def __init__(self, content):
+        self.content = content
+
+
+class TestBaseCache(unittest.TestCase):
+    """
+    Test the keys and services of the caches
+    """
+
+    def test_key(self):
+        """
+        requests that only differ in the order of fl or in whitespace should
+        share a key
+        """
+        key = BaseCache.key
+        self.assertEqual(
+            key("get", SEARCH_URL, {"q": "star  year:2000", "fl": ["id", "bibcode"]}),
+            key("GET", SEARCH_URL, {"fl": "bibcode, id", "q": " star year:2000"}),
+        )
+        self.assertNotEqual(
+            key("GET", SEARCH_URL, {"q": "star"}),
+            key("GET", SEARCH_URL, {"q": "stars"}),
+        )
+        self.assertNotEqual(
+            key("POST", METRICS_URL, data='{"bibcodes": ["a"]}'),
+            key("POST", METRICS_URL, data=b'{"bibcodes": ["b"]}'),
+        )
+
+    def test_service(self):
+        self.assertEqual(BaseCache.service(SEARCH_URL), "search")
+        self.assertEqual(BaseCache.service(METRICS_URL), "metrics")
+        self.assertEqual(BaseCache.service(EXPORT_URL + "bibtex"), "export")
+
+
+class TestResponseCache(unittest.TestCase):
+    """
+    Test the ResponseCache object
+    """
+
+    def test_get_set(self):
+        """
+        a cached response should be rebuilt as a requests.Response, and
+        hits and misses counted
+        """
+        cache = ResponseCache()
+        self.assertIsNone(cache.get("k"))
+        cache.set("k", SEARCH_URL, FakeResponse(b'{"a": 1}'))
+        r = cache.get("k")
+        self.assertTrue(r.from_cache)
+        self.assertEqual(r.json(), {"a": 1})
+        self.assertEqual(r.headers["content-type"], "application/json")
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        failed = FakeResponse(b"")
+        failed.ok = False
+        cache.set("failed", SEARCH_URL, failed)
+        self.assertIsNone(cache.get("failed"))
+
+    def test_lru(self):
+        """
+        the least recently used responses should be evicted past maxsize
+        """
+        cache = ResponseCache(maxsize=2)
+        cache.set("a", SEARCH_URL, FakeResponse(b"a"))
+        cache.set("b", SEARCH_URL, FakeResponse(b"b"))
+        cache.get("a")
+        cache.set("c", SEARCH_URL, FakeResponse(b"c"))
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNotNone(cache.get("c"))
+
+    def test_ttl(self):
+        """
+        responses should expire after the ttl of their service
+        """
+        cache = ResponseCache(ttl=100, ttls={"metrics": 10})
+        with patch("ads.cache.time.time", return_value=1000):
+            cache.set("s", SEARCH_URL, FakeResponse(b"s"))
+            cache.set("m", METRICS_URL, FakeResponse(b"m"))
+        with patch("ads.cache.time.time", return_value=1050):
+            self.assertIsNotNone(cache.get("s"))
+            self.assertIsNone(cache.get("m"))
+        with patch("ads.cache.time.time", return_value=1100):
+            self.assertIsNone(cache.get("s"))
+
+    def test_queries(self):
+        """
+        repeated queries should be served from the cache, without updating
+        the rate limits
+        """
+        cache = ResponseCache()
+        with patch.object(ads.config, "cache", cache):
+            with MockSolrResponse(SEARCH_URL):
+                first = [a.bibcode for a in SearchQuery(q="star", rows=5)]
+            RateLimits("SearchQuery").limits = {}
+            with MockSolrResponse(SEARCH_URL):
+                second = [a.bibcode for a in SearchQuery(q=" star", rows=5)]
+            self.assertEqual(first, second)
+            self.assertEqual(RateLimits("SearchQuery").limits, {})
+            self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+            with MockMetricsResponse(METRICS_URL):
+                metrics = MetricsQuery("bibcode").execute()
+                self.assertEqual(MetricsQuery("bibcode").execute(), metrics)
+            self.assertEqual((cache.hits, cache.misses), (2, 2))
+
+    def test_incremental_queries(self):
+        """
+        incremental queries should be able to stream the body of cached
+        responses
+        """
+        cache = ResponseCache()
+        with patch.object(ads.config, "cache", cache):
+            with MockSolrResponse(SEARCH_URL):
+                expected = [a.bibcode for a in SearchQuery(q="star", rows=5)]
+            for _ in range(2):
+                with MockSolrResponse(SEARCH_URL):
+                    sq = SearchQuery(q="star", rows=5, incremental=True)
+                    self.assertEqual([a.bibcode for a in sq], expected)
+            self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+
+class TestDiskCache(unittest.TestCase):
+    """
+    Test the DiskCache object
+    """
+
+    def setUp(self):
+        directory = mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "cache", "responses.sqlite")
+
+    def test_get_set(self):
+        """
+        responses should be stored compressed, and kept across instances
+        """
+        cache = DiskCache(self.path)
+        self.assertIsNone(cache.get("k"))
+        body = b'{"docs": "' + b"x" * 10000 + b'"}'
+        cache.set("k", SEARCH_URL, FakeResponse(body))
+        self.assertLess(os.path.getsize(self.path), len(body))
+
+        cache = DiskCache(self.path)
+        r = cache.get("k")
+        self.assertTrue(r.from_cache)
+        self.assertEqual(r.content, body)
+        self.assertEqual(r.headers["content-type"], "application/json")
+        self.assertEqual(len(cache), 1)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_evict(self):
+        """
+        expired responses should not be returned, and the oldest should be
+        evicted once the bodies exceed maxbytes
+        """
+        cache = DiskCache(self.path, ttl=100, ttls={"metrics": 10})
+        cache.EXPIRE_EVERY = 3
+        with patch("ads.cache.time.time", return_value=1000):
+            cache.set("s", SEARCH_URL, FakeResponse(b"s"))
+            cache.set("m", METRICS_URL, FakeResponse(b"m"))
+        with patch("ads.cache.time.time", return_value=1050):
+            self.assertIsNotNone(cache.get("s"))
+            self.assertIsNone(cache.get("m"))
+            cache.set("t", SEARCH_URL, FakeResponse(b"t"))
+            self.assertEqual(len(cache), 2)
+
+        cache = DiskCache(self.path, maxbytes=300, ttl=None)
+        for i in range(10):
+            with patch("ads.cache.time.time", return_value=2000 + i):
+                cache.set(str(i), SEARCH_URL, FakeResponse(os.urandom(100)))
+        self.assertEqual(len(cache), 2)
+        self.assertIsNotNone(cache.get("9"))
+        self.assertIsNone(cache.get("7"))
+
+    def test_size(self):
+        """
+        the total size of the bodies should be kept as responses are
+        replaced and cleared, and across instances
+        """
+        cache = DiskCache(self.path)
+        cache.set("a", SEARCH_URL, FakeResponse(os.urandom(100)))
+        cache.set("b", SEARCH_URL, FakeResponse(os.urandom(200)))
+        cache.set("a", SEARCH_URL, FakeResponse(os.urandom(300)))
+        total = cache._db.connection().execute(
+            "SELECT SUM(size) FROM responses").fetchone()[0]
+        self.assertEqual(cache.size, total)
+        self.assertGreater(total, 500)
+        self.assertEqual(DiskCache(self.path).size, total)
+        cache.clear()
+        self.assertEqual(cache.size, 0)
+
+    def test_concurrent(self):
+        """
+        threads and processes should be able to share the cache
+        """
+        cache = DiskCache(self.path)
+
+        def write(n):
+            for i in range(20):
+                cache.set("{}-{}".format(n, i), SEARCH_URL, FakeResponse(b"x"))
+        threads = [threading.Thread(target=write, args=(n,))
+                   for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(cache), 80)
+
+        code = ("from ads.cache import DiskCache; "
+                "from ads.config import SEARCH_URL; "
+                "import sys; c = DiskCache(sys.argv[1]); "
+                "assert c.get('0-0').content == b'x'; "
+                "c.set('other', SEARCH_URL, c.get('0-0'))")
+        subprocess.check_call([sys.executable, "-c", code, self.path])
+        self.assertEqual(cache.get("other").content, b"x")
+
+
+class TestExportCache(unittest.TestCase):
+    """
+    Test the ExportCache object
+    """
+
+    def test_get_set(self):
+        directory = mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "exports.sqlite")
+        cache = ExportCache(path)
+        cache.set_many("bibtex", {"b1": "@ARTICLE{b1}", "b2": "@ARTICLE{b2}"})
+        cache.set_many("ris", {"b1": "TY  - b1"})
+        self.assertEqual(len(cache), 3)
+        self.assertEqual(cache.get_many(["b1", "b2", "b3"], "bibtex"),
+                         {"b1": "@ARTICLE{b1}", "b2": "@ARTICLE{b2}"})
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+        # shared with other instances of the same file
+        self.assertEqual(ExportCache(path).get_many(["b1"], "ris"),
+                         {"b1": "TY  - b1"})
+
+        with patch("time.time", return_value=0):
+            cache.set_many("bibtex", {"b1": "old"})
+        self.assertEqual(cache.get_many(["b1"], "bibtex"), {})
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
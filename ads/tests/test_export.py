@@ -1,13 +1,21 @@
 """
 Tests for ExportQuery
 """
+import json
+import random
+import time
 import unittest
 import six
 import os
+import shutil
+from tempfile import mkdtemp
+from mock import patch
 
 from .mocks import MockResponse, MockExportResponse
 
-from ads.export import ExportQuery, ExportResponse
+import ads.config
+from ads.cache import ExportCache
+from ads.export import ExportQuery, ExportResponse, split_export
 from ads.config import EXPORT_URL
 
 
@@ -35,6 +43,117 @@ class TestMetricsQuery(unittest.TestCase):
         self.assertIsInstance(eq.response, ExportResponse)
         self.assertEqual(retval, eq.response.result)
 
+    def test_stream(self):
+        """
+        ExportQuery.stream() should export the bibcodes in chunks, and
+        write them to the file in their order
+        """
+        eq = ExportQuery(['b{}'.format(i) for i in range(10)])
+        fp = six.StringIO()
+        with MockExportResponse(os.path.join(EXPORT_URL, "bibtex")), \
+                patch.object(ExportQuery, '_request', autospec=True,
+                             side_effect=ExportQuery._request) as sent:
+            # httpretty is not thread safe, so the chunks are sent in turn
+            written = eq.stream(fp, chunk_size=4, workers=1)
+        self.assertEqual(sent.call_count, 3)
+        payloads = [json.loads(c[1]['data'])['bibcode']
+                    for c in sent.call_args_list]
+        self.assertEqual(payloads, [eq.bibcodes[:4], eq.bibcodes[4:8],
+                                    eq.bibcodes[8:]])
+        self.assertEqual(written, len(fp.getvalue()))
+        self.assertEqual(fp.getvalue().count("@ARTICLE"), 3)
+
+        def export(query, payload):
+            # chunks complete out of order
+            time.sleep(random.random() / 100)
+            return ExportResponse(MockResponse(json.dumps(
+                {"export": "".join(json.loads(payload)['bibcode'])}
+            )))
+
+        fp = six.StringIO()
+        with patch.object(ExportQuery, '_export', autospec=True,
+                          side_effect=export):
+            eq.stream(fp, chunk_size=3, workers=4)
+        self.assertEqual(fp.getvalue(),
+                         "b0b1b2\nb3b4b5\nb6b7b8\nb9\n")
+
+
+class TestExportCache(unittest.TestCase):
+    """
+    test ExportQuery with ads.config.export_cache
+    """
+
+    def setUp(self):
+        self.requested = []
+        directory = mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        ads.config.export_cache = ExportCache(
+            os.path.join(directory, "exports.sqlite")
+        )
+
+    def tearDown(self):
+        ads.config.export_cache = None
+
+    def export(self, query, payload):
+        """
+        Return the bibtex of the requested bibcodes, in reverse order as
+        the service sorts them
+        """
+        bibcodes = json.loads(payload)['bibcode']
+        self.requested.append(bibcodes)
+        return ExportResponse.from_result(u"".join(
+            u"@ARTICLE{{{},\n  title = {{{}}}\n}}\n\n".format(b, query.format)
+            for b in reversed(bibcodes)
+        ))
+
+    def test_split_export(self):
+        """
+        exports should be split into the entries of their bibcodes
+        """
+        eq = ExportQuery(['2013A&A...552A.143S', '2012GCN..13229...1S'])
+        result = self.export(eq, eq.json_payload).result
+        entries = split_export(result, "bibtex", eq.bibcodes)
+        self.assertEqual(u"".join(entries[b] for b in eq.bibcodes[::-1]),
+                         result)
+        self.assertIsNone(split_export(result, "bibtex", eq.bibcodes[:1]))
+        self.assertIsNone(split_export("text", "bibtex", eq.bibcodes))
+
+        aastex = (u"\\bibitem[Sudilovsky et al.(2013)]{2013A\\&A...552A.143S} "
+                  u"Sudilovsky, V.\n\\bibitem[X(2012)]{2012GCN..13229...1S} X\n")
+        entries = split_export(aastex, "aastex", eq.bibcodes)
+        self.assertTrue(entries['2012GCN..13229...1S'].startswith(
+            u"\\bibitem[X(2012)]"))
+
+    def test_execute(self):
+        """
+        only the bibcodes missing from the cache should be requested, and
+        the result should be in the order of the bibcodes
+        """
+        b1, b2, b3, b4 = ['2001ApJ...551L..17T', '2002A&A...384..473A',
+                          '2003MNRAS.340..105S', '2004Sci...306..636B']
+
+        def entry(bibcode):
+            return u"@ARTICLE{{{},\n  title = {{bibtex}}\n}}\n\n".format(
+                bibcode)
+
+        with patch.object(ExportQuery, '_export', autospec=True,
+                          side_effect=self.export):
+            self.assertEqual(ExportQuery([b1, b2]).execute(),
+                             entry(b1) + entry(b2))
+            self.assertEqual(ExportQuery([b3, b1, b2]).execute(),
+                             entry(b3) + entry(b1) + entry(b2))
+            self.assertEqual(ExportQuery([b2, b3]).execute(),
+                             entry(b2) + entry(b3))
+            ExportQuery([b1], format='ris').execute()
+            fp = six.StringIO()
+            ExportQuery([b4, b3]).stream(fp, chunk_size=1, workers=1)
+            # exports that cannot be split are returned, but not cached
+            ExportQuery(['unknown']).execute()
+        self.assertEqual(self.requested,
+                         [[b1, b2], [b3], [b1], [b4], ['unknown']])
+        self.assertEqual(fp.getvalue(), entry(b4) + entry(b3))
+        self.assertEqual(len(ads.config.export_cache), 4)
+
 
 class TestExportResponse(unittest.TestCase):
     """
@@ -0,0 +1,179 @@
+"""
+Tests for the compact citation graph
+"""
+import os
+import unittest
+import shutil
+from tempfile import mkdtemp
+
+from mock import patch
+
+from ads.search import Article
+from ads.graph import CitationGraph, np
+
+
+@unittest.skipIf(np is None, "requires numpy")
+class TestCitationGraph(unittest.TestCase):
+    """
+    Test the CitationGraph object
+    """
+
+    def setUp(self):
+        self.graph = CitationGraph.from_edges([
+            ("2001b", "2000a"),
+            ("2002c", "2000a"),
+            ("2002c", "2001b"),
+            ("2003d", "2002c"),
+            ("2002c", "2000a"),  # duplicate
+        ])
+
+    def test_from_edges(self):
+        """
+        Bibcodes are interned in sorted order, duplicate edges are dropped
+        and both directions are stored in CSR form
+        """
+        g = self.graph
+        self.assertEqual(len(g), 4)
+        self.assertEqual(g.num_edges, 4)
+        self.assertEqual([g.bibcode(i) for i in range(len(g))],
+                         ["2000a", "2001b", "2002c", "2003d"])
+        self.assertEqual(g.out_indices.dtype, np.int32)
+        self.assertEqual(g.in_indices.dtype, np.int32)
+        self.assertEqual(g.out_offsets.tolist(), [0, 0, 1, 3, 4])
+        self.assertEqual(g.out_indices.tolist(), [0, 0, 1, 2])
+        self.assertEqual(g.in_offsets.tolist(), [0, 2, 3, 4, 4])
+        self.assertEqual(g.in_indices.tolist(), [1, 2, 2, 3])
+
+        empty = CitationGraph.from_edges([])
+        self.assertEqual((len(empty), empty.num_edges), (0, 0))
+        self.assertNotIn("2000a", empty)
+
+    def test_queries(self):
+        """
+        Test the neighbour and degree queries
+        """
+        g = self.graph
+        self.assertEqual(g.references("2002c"), ["2000a", "2001b"])
+        self.assertEqual(g.citations("2000a"), ["2001b", "2002c"])
+        self.assertEqual(g.citations("2003d"), [])
+        self.assertEqual(g.out_degree("2002c"), 2)
+        self.assertEqual(g.in_degree("2000a"), 2)
+        self.assertEqual(g.out_degree().tolist(), [0, 1, 2, 1])
+        self.assertEqual(g.in_degree().tolist(), [2, 1, 1, 0])
+        self.assertEqual(g.in_neighbors(g.node("2001b")).tolist(), [2])
+
+        self.assertIn("2001b", g)
+        self.assertNotIn("2001", g)
+        self.assertNotIn("2001bb", g)
+        self.assertNotIn("9999z", g)
+        self.assertEqual(g.nodes(["2003d", "1999", "2000a"]).tolist(),
+                         [3, -1, 0])
+        with self.assertRaises(KeyError):
+            g.references("1999")
+
+    def test_from_articles(self):
+        """
+        Edges are read from the loaded reference and citation fields
+        """
+        g = CitationGraph.from_articles([
+            Article(bibcode="2002c", reference=["2000a", "2001b"],
+                    citation=["2003d"]),
+            {"bibcode": "2001b", "reference": ["2000a"],
+             "citation": ["2002c"]},
+            Article(bibcode="2000a"),
+        ])
+        self.assertEqual(g.num_edges, 4)
+        self.assertEqual(g.citations("2000a"), ["2001b", "2002c"])
+        self.assertEqual(g.references("2003d"), ["2002c"])
+
+    def test_save_load(self):
+        """
+        A saved graph is loaded memory mapped
+        """
+        directory = mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "graph")
+        self.graph.save(path)
+        for mmap in [True, False]:
+            g = CitationGraph.load(path, mmap=mmap)
+            self.assertEqual(isinstance(g.out_indices, np.memmap), mmap)
+            self.assertEqual(g.references("2002c"), ["2000a", "2001b"])
+            self.assertEqual(g.citations("2000a"), ["2001b", "2002c"])
+            self.assertEqual(g.in_degree().tolist(), [2, 1, 1, 0])
+
+
+@unittest.skipIf(np is None, "requires numpy")
+class TestRefresh(unittest.TestCase):
+    """
+    Test the incremental refresh of a CitationGraph
+    """
+
+    def setUp(self):
+        self.records = {
+            "2000a": {"citation_count": 2, "indexstamp": "t0",
+                      "reference": [], "citation": ["2001b", "2002c"]},
+            "2001b": {"citation_count": 1, "indexstamp": "t0",
+                      "reference": ["2000a"], "citation": ["2002c"]},
+            "2002c": {"citation_count": 0, "indexstamp": "t0",
+                      "reference": ["2000a", "2001b"], "citation": []},
+        }
+        self.requests = []
+
+    def from_bibcodes(self, bibcodes, fl, use_store=True):
+        """
+        Return the records of `bibcodes` with the fields of `fl`
+        """
+        self.assertFalse(use_store)
+        self.requests.append((sorted(bibcodes), sorted(fl)))
+        for bibcode in bibcodes:
+            record = dict(self.records[bibcode], bibcode=bibcode)
+            yield Article(**dict((f, record[f]) for f in fl))
+
+    def test_refresh(self):
+        """
+        Only the nodes whose citation_count or indexstamp changed are
+        re-crawled, and their edges are replaced
+        """
+        with patch("ads.graph.SearchQuery.from_bibcodes", self.from_bibcodes):
+            graph = CitationGraph.crawl(sorted(self.records))
+            self.assertEqual(graph.citation_counts.tolist(), [2, 1, 0])
+            self.assertEqual(graph.num_edges, 3)
+            del self.requests[:]
+
+            self.assertEqual(graph.refresh(), [])
+            self.assertEqual(len(self.requests), 1)
+            self.assertEqual(self.requests[0][1],
+                             ["bibcode", "citation_count", "indexstamp"])
+
+            # 2003d cites 2000a, and 2002c no longer cites 2001b
+            self.records["2000a"].update(citation_count=3,
+                                         citation=["2001b", "2002c", "2003d"])
+            self.records["2002c"].update(indexstamp="t1",
+                                         reference=["2000a"])
+            self.records["2003d"] = {"citation_count": 0, "indexstamp": "t1",
+                                     "reference": ["2000a"], "citation": []}
+            del self.requests[:]
+            self.assertEqual(graph.refresh(), ["2000a", "2002c"])
+            self.assertEqual(self.requests[1][0], ["2000a", "2002c"])
+
+        self.assertEqual(len(graph), 4)
+        self.assertEqual(graph.citations("2000a"),
+                         ["2001b", "2002c", "2003d"])
+        self.assertEqual(graph.references("2002c"), ["2000a"])
+        self.assertEqual(graph.citations("2001b"), [])
+        self.assertEqual(graph.references("2001b"), ["2000a"])
+        self.assertEqual(graph.citation_counts.tolist(), [3, 1, 0, -1])
+        self.assertEqual(graph.indexstamps.tolist(),
+                         [b"t0", b"t0", b"t1", b""])
+
+        # The states are saved with the graph
+        directory = mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "graph")
+        graph.save(path)
+        self.assertEqual(CitationGraph.load(path).citation_counts.tolist(),
+                         [3, 1, 0, -1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+"""
+Tests for the range-partitioned Harvester
+"""
+import re
+import unittest
+import warnings
+
+from mock import patch
+
+from .mocks import MockSolrResponse
+
+from ads.harvest import Harvester, Partition
+from ads.config import SEARCH_URL
+
+
+class MockPartitionedSolrResponse(MockSolrResponse):
+    """
+    mock Solr response that applies year range filter queries and sorts
+    the stub documents by date
+    """
+    undated = 0  # number of the earliest documents to strip the date of
+
+    def filter_docs(self, request, docs):
+        docs = sorted(docs, key=lambda d: d['date'])
+        for doc in docs[:self.undated]:
+            del doc['date']
+        for fq in request.querystring.get('fq', []):
+            if fq == 'date:[* TO *]':
+                docs = [d for d in docs if d.get('date')]
+                continue
+            outside, lo, hi = re.match(r'(-?)year:\[(\d+) TO (\d+)\]',
+                                       fq).groups()
+            docs = [d for d in docs
+                    if (int(lo) <= int(d['year']) <= int(hi)) != bool(outside)]
+        sort = request.querystring.get('sort', [''])[0]
+        return sorted(docs, key=lambda d: d.get('date', ''),
+                      reverse=sort == 'date desc')
+
+
+class TestPartition(unittest.TestCase):
+    """
+    Test the Partition object
+    """
+
+    def test_fq(self):
+        """
+        the fq of a partition should select its inclusive range of units
+        """
+        self.assertEqual(Partition('year', 2001, 2004, None).fq,
+                         'year:[2001 TO 2004]')
+        lo = Partition.unit('pubdate', '2001-00-00T00:00:00Z')
+        hi = Partition.unit('pubdate', '2001-12-01T00:00:00Z')
+        self.assertEqual(Partition('pubdate', lo, hi, None).fq,
+                         'pubdate:[2001-01 TO 2001-12]')
+
+    def test_split(self):
+        """
+        splitting a partition should return two disjoint, covering halves
+        """
+        left, right = Partition('year', 2000, 2003, 10).split()
+        self.assertEqual((left.lo, left.hi), (2000, 2001))
+        self.assertEqual((right.lo, right.hi), (2002, 2003))
+
+
+class TestHarvester(unittest.TestCase):
+    """
+    Test the Harvester object
+    """
+
+    def test_partitions(self):
+        """
+        partitions should be bisected until they hold at most partition_size
+        records, unless they cover a single year
+        """
+        h = Harvester(q="star", fl=['bibcode', 'year'], partition_size=5)
+        with MockPartitionedSolrResponse(SEARCH_URL):
+            partitions = h.partitions
+        self.assertEqual(sum(p.count for p in partitions), 28)
+        for p in partitions:
+            self.assertTrue(p.count <= 5 or p.lo == p.hi)
+        for a, b in zip(partitions, partitions[1:]):
+            self.assertLess(a.hi, b.lo)
+
+    def test_iter(self):
+        """
+        iterating should return every record of the query exactly once
+        """
+        h = Harvester(q="star", fl=['bibcode', 'year'], partition_size=5,
+                      workers=3, rows=300)
+        with MockPartitionedSolrResponse(SEARCH_URL):
+            with warnings.catch_warnings(record=True):
+                articles = h.execute()
+        self.assertEqual(len(articles), 28)
+        self.assertEqual(len(set(a.id for a in articles)), 28)
+
+    def test_undated(self):
+        """
+        records without a date should be harvested, including those outside
+        of the range of the dated records, or when no record has a date
+        """
+        for undated in [1, 28]:
+            h = Harvester(q="star", fl=['bibcode', 'year'], partition_size=5,
+                          workers=3, rows=300)
+            with patch.object(MockPartitionedSolrResponse, 'undated',
+                              undated), \
+                    MockPartitionedSolrResponse(SEARCH_URL):
+                self.assertEqual(sum(p.count for p in h.partitions), 28)
+                with warnings.catch_warnings(record=True):
+                    articles = h.execute()
+            self.assertEqual(len(set(a.id for a in articles)), 28)
+        self.assertEqual([p.fq for p in h.partitions], [None])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,69 @@
+"""
+Tests for the incremental solr response parser
+"""
+import json
+import unittest
+
+from ads.tests.stubdata.solr import example_solr_response
+
+from ads.jsonstream import SolrStreamParser
+from ads.exceptions import SolrResponseParseError
+
+
+class TestSolrStreamParser(unittest.TestCase):
+    """
+    Test the SolrStreamParser object
+    """
+
+    def setUp(self):
+        self.body = json.loads(example_solr_response)
+        self.body['nextCursorMark'] = "AoIH///3RmWrhAAjMTY0"
+        self.body['highlighting'] = {"1": {"abstract": [u"étoile"]}}
+
+    def parse(self, body, size):
+        parser = SolrStreamParser()
+        docs = []
+        for i in range(0, len(body), size):
+            docs.extend(parser.feed(body[i:i+size]))
+        docs.extend(parser.feed(None))
+        return parser, docs
+
+    def test_feed(self):
+        """
+        documents should be returned as they complete, whatever the chunk
+        boundaries (including within utf-8 sequences and escapes), and the
+        rest of the body should be set as result with an empty docs list
+        """
+        bodies = [
+            json.dumps(self.body).encode("utf-8"),
+            json.dumps(self.body, indent=2,
+                       ensure_ascii=False).encode("utf-8"),
+        ]
+        for body in bodies:
+            for size in [1, 3, 64, len(body)]:
+                parser, docs = self.parse(body, size)
+                self.assertEqual(docs, self.body['response']['docs'])
+                self.assertEqual(parser.result['response']['docs'], [])
+                parser.result['response']['docs'] = docs
+                self.assertEqual(parser.result, self.body)
+
+        parser = SolrStreamParser()
+        body = bodies[0]
+        first = body.index(b'"docs"')
+        docs = parser.feed(body[:first + 2000])
+        self.assertGreater(len(docs), 0)
+        self.assertLess(len(docs), len(self.body['response']['docs']))
+        self.assertIsNone(parser.result)
+
+    def test_incomplete(self):
+        """
+        a truncated or malformed body should raise SolrResponseParseError
+        """
+        body = json.dumps(self.body).encode("utf-8")
+        for malformed in [body[:-10], body[:len(body) // 2], b'{"a": ]}']:
+            with self.assertRaises(SolrResponseParseError):
+                self.parse(malformed, 100)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
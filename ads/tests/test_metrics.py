@@ -1,13 +1,26 @@
 """
 Tests for MetricsQuery
 """
+import datetime
+import json
+import os
 import unittest
+import shutil
+from tempfile import mkdtemp
+
 import six
+from mock import patch
+
+import ads.config
+from ads.store import ArticleStore
 
-from .mocks import MockResponse, MockMetricsResponse
+from .mocks import MockResponse, MockMetricsResponse, MockBigQueryResponse
+from .stubdata.metrics import example_metrics_response
+from .stubdata.solr import example_solr_response
 
-from ads.metrics import MetricsQuery, MetricsResponse
-from ads.config import METRICS_URL
+from ads.metrics import MetricsQuery, MetricsResponse, merge_metrics, \
+    compute_local, np
+from ads.config import METRICS_URL, BIGQUERY_URL
 
 
 class TestMetricsQuery(unittest.TestCase):
@@ -34,6 +47,110 @@ class TestMetricsQuery(unittest.TestCase):
         self.assertIsInstance(mq.response, MetricsResponse)
         self.assertEqual(retval, mq.response.metrics)
 
+    def test_execute_chunks(self):
+        """
+        More than MAX_BIBCODES bibcodes should be sent in chunks, whose
+        metrics are merged with the citation counts of the papers
+        """
+        docs = json.loads(example_solr_response)['response']['docs'][:4]
+        bibcodes = [doc['bibcode'] for doc in docs]
+        counts = dict(zip(bibcodes, [5, 0, 12, 3]))
+        filter_docs = MockBigQueryResponse.filter_docs
+
+        def counted(mock, request, docs):
+            docs = filter_docs(mock, request, docs)
+            for doc in docs:
+                doc['citation_count'] = counts[doc['bibcode']]
+            return docs
+
+        # stale counts in the store should not be used
+        directory = mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        ads.config.store = ArticleStore(os.path.join(directory, "a.sqlite"))
+        self.addCleanup(setattr, ads.config, "store", None)
+        ads.config.store.upsert([
+            dict(doc, citation_count=0, property=[], year="2000")
+            for doc in docs
+        ])
+
+        # httpretty is not thread safe, so the chunks are sent in turn
+        mq = MetricsQuery(bibcodes, workers=1)
+        with patch.object(MetricsQuery, 'MAX_BIBCODES', 2), \
+                patch.object(MockBigQueryResponse, 'filter_docs', counted), \
+                MockMetricsResponse(METRICS_URL), \
+                MockBigQueryResponse(BIGQUERY_URL), \
+                patch.object(MetricsQuery, '_request', autospec=True,
+                             side_effect=MetricsQuery._request) as sent:
+            metrics = mq.execute()
+        self.assertEqual(sent.call_count, 2)
+        self.assertEqual(mq.response.metrics, metrics)
+
+        # The mock returns the metrics of one paper for each chunk
+        stub = json.loads(example_metrics_response)
+        basic = metrics['basic stats']
+        self.assertEqual(basic['number of papers'], 2)
+        self.assertEqual(basic['total number of reads'], 222)
+        self.assertEqual(basic['average number of reads'], 111.0)
+        self.assertIsNone(basic['median number of reads'])
+        histogram = ['histograms', 'citations', 'refereed to refereed']
+        self.assertEqual(
+            metrics[histogram[0]][histogram[1]][histogram[2]]['1981'],
+            2 * stub[histogram[0]][histogram[1]][histogram[2]]['1981']
+        )
+        self.assertIsNone(metrics['time series'])
+
+        # Order statistics and indicators come from the citation counts
+        stats = metrics['citation stats']
+        self.assertEqual(stats['median number of citations'], 4.0)
+        self.assertIsNone(stats['number of citing papers'])
+        self.assertEqual(metrics['indicators']['h'], 3)
+        self.assertEqual(metrics['indicators']['i10'], 1)
+        self.assertIsNone(metrics['indicators']['tori'])
+        self.assertIsNone(metrics['indicators']['riq'])
+        self.assertEqual(metrics['indicators']['read10'],
+                         2 * stub['indicators']['read10'])
+        # read10 sums the recent reads of the papers of each chunk
+        parts = [{"indicators": {"read10": 1.5, "riq": 47}},
+                 {"indicators": {"read10": 2, "riq": 12}}]
+        merged = merge_metrics(parts, [(5, True, "2000")])["indicators"]
+        self.assertEqual((merged["read10"], merged["riq"]), (3.5, None))
+        first = min(int(doc['year']) for doc in docs)
+        self.assertEqual(metrics['indicators']['m'],
+                         3 / (datetime.date.today().year - first + 1.0))
+        # Only the first stub paper is refereed
+        self.assertEqual(metrics['indicators refereed']['h'], 1)
+        self.assertEqual(
+            metrics['citation stats refereed']['median number of citations'],
+            5.0
+        )
+
+
+class TestMergeMetrics(unittest.TestCase):
+    """
+    test merge_metrics
+    """
+
+    def test_indicators(self):
+        """
+        the h and g indices should be those of all the papers
+        """
+        papers = [(c, True, y) for c, y in
+                  zip([10, 8, 5, 4, 3, 0], ["2011", "2012", "2013", "2014",
+                                            "2015", None])]
+        metrics = merge_metrics([], papers, current_year=2020)
+        self.assertEqual(metrics['indicators']['h'], 4)
+        # h / the 10 years since the first paper
+        self.assertEqual(metrics['indicators']['m'], 0.4)
+        self.assertEqual(metrics['indicators']['g'], 5)
+        self.assertEqual(metrics['indicators']['i10'], 1)
+        self.assertEqual(
+            metrics['citation stats']['median number of citations'], 4.5
+        )
+        empty = merge_metrics([], [])
+        self.assertIsNone(empty['citation stats']
+                          ['median number of citations'])
+        self.assertIsNone(empty['indicators']['m'])
+
 
 class TestMetricsResponse(unittest.TestCase):
     """
@@ -49,5 +166,118 @@ class TestMetricsResponse(unittest.TestCase):
         self.assertIsInstance(mr.metrics, dict)
         self.assertIsInstance(mr._raw, six.string_types)
 
+@unittest.skipIf(np is None, "requires numpy")
+class TestComputeLocal(unittest.TestCase):
+    """
+    test compute_local
+    """
+
+    def setUp(self):
+        # Two papers: the first one is refereed, has 2 authors and is cited
+        # by 3 papers, 2 of them refereed
+        self.kwargs = dict(
+            citations=None,
+            years=[2010, 2012],
+            authors=[2, 1],
+            refereed=[True, False],
+            citing_offsets=[0, 3, 3],
+            citing_years=[2011, 2011, 2013],
+            citing_references=[10, 20, 1],
+            citing_refereed=[True, True, False],
+            reads=np.array([[1, 2, 3], [0, 4, 5]]),
+            read_years=[2013, 2014, 2015],
+            current_year=2015,
+        )
+
+    def test_compute_local(self):
+        """
+        compute_local should return the metrics of all the papers, in the
+        layout of the metrics service
+        """
+        metrics = compute_local(**self.kwargs)
+        basic = metrics['basic stats']
+        self.assertEqual(basic['number of papers'], 2)
+        self.assertEqual(basic['normalized paper count'], 1.5)
+        self.assertEqual(basic['total number of reads'], 15)
+        self.assertEqual(basic['median number of reads'], 7.5)
+        self.assertEqual(metrics['basic stats refereed']['number of papers'], 1)
+
+        stats = metrics['citation stats']
+        self.assertEqual(stats['total number of citations'], 3)
+        self.assertEqual(stats['total number of refereed citations'], 2)
+        self.assertEqual(stats['average number of citations'], 1.5)
+        self.assertEqual(stats['normalized number of citations'], 1.5)
+
+        indicators = metrics['indicators']
+        self.assertEqual(indicators['h'], 1)
+        self.assertEqual(indicators['g'], 1)
+        self.assertEqual(indicators['m'], 1 / 6.0)
+        self.assertAlmostEqual(indicators['tori'], (0.1 + 0.05 + 1) / 2)
+        self.assertEqual(indicators['riq'],
+                         int(1000 * ((0.1 + 0.05 + 1) / 2) ** 0.5 / 6))
+        self.assertEqual(indicators['read10'], 3 / 2.0 + 5)
+
+        histograms = metrics['histograms']
+        self.assertEqual(histograms['publications']['all publications'],
+                         {'2010': 1, '2011': 0, '2012': 1, '2013': 0,
+                          '2014': 0, '2015': 0})
+        self.assertEqual(
+            histograms['publications']['refereed publications normalized']
+            ['2010'], 0.5
+        )
+        citations = histograms['citations']
+        self.assertEqual(citations['refereed to refereed']['2011'], 2)
+        self.assertEqual(citations['nonrefereed to refereed']['2013'], 1)
+        self.assertEqual(sum(citations['refereed to nonrefereed'].values()),
+                         0)
+        self.assertEqual(histograms['reads']['all reads'],
+                         {'2013': 1, '2014': 6, '2015': 8})
+
+    def test_groups(self):
+        """
+        the metrics of groups of papers should be those of their papers
+        """
+        groups = compute_local(groups=[0, 1, 1, 3], members=[1, 0, 1, 0],
+                               **self.kwargs)
+        self.assertEqual(len(groups), 4)
+        self.assertEqual(groups[1], compute_local(**self.kwargs))
+        single = dict(self.kwargs, years=[2012], authors=[1],
+                      refereed=[False], citing_offsets=[0, 0],
+                      citing_years=[], citing_references=[],
+                      citing_refereed=[], reads=self.kwargs['reads'][1:])
+        self.assertEqual(groups[0]['indicators'],
+                         compute_local(**single)['indicators'])
+        self.assertEqual(
+            groups[3]['citation stats']['total number of citations'], 3
+        )
+        # groups without papers
+        self.assertEqual(groups[2]['basic stats']['number of papers'], 0)
+        self.assertIsNone(groups[2]['citation stats']
+                          ['median number of citations'])
+
+    def test_no_papers(self):
+        """
+        without papers, the counts and indicators should be zero and the
+        ratios None
+        """
+        empty = dict(self.kwargs, years=[], authors=[], refereed=[],
+                     citing_offsets=[0], citing_years=[],
+                     citing_references=[], citing_refereed=[],
+                     reads=np.zeros((0, 3)))
+        metrics = compute_local(**empty)
+        self.assertEqual(metrics['basic stats']['number of papers'], 0)
+        self.assertEqual(metrics['citation stats']
+                         ['total number of citations'], 0)
+        self.assertIsNone(metrics['citation stats']
+                          ['average number of citations'])
+        self.assertEqual(metrics['indicators'],
+                         {'h': 0, 'g': 0, 'i10': 0, 'i100': 0, 'm': 0.0,
+                          'tori': 0, 'riq': 0, 'read10': 0})
+        self.assertEqual(metrics['indicators refereed'],
+                         metrics['indicators'])
+        self.assertEqual(compute_local([], [], [])['indicators']['h'], 0)
+        self.assertEqual(compute_local(groups=[], members=[], **empty), [])
+
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)
\ No newline at end of file
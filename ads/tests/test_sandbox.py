@@ -3,6 +3,7 @@ Tests for the search interface
 """
 import json
 import unittest
+import six
 
 from ads.sandbox import SearchQuery, MetricsQuery, ExportQuery
 
@@ -29,6 +30,16 @@ class TestSandbox(unittest.TestCase):
 
         self.assertSequenceEqual(b1, b2)
 
+    def test_from_bibcodes(self):
+        """
+        Test you should receive the stub Solr data of the requested bibcodes
+        when using SearchQuery.from_bibcodes
+        """
+        bibcodes = ['1971Sci...174..142S', '2013A&A...552A.143S']
+        articles = SearchQuery.from_bibcodes(bibcodes, fl=['bibcode'])
+
+        self.assertEqual(sorted(a.bibcode for a in articles), bibcodes)
+
     def test_article_get_field(self):
         """
         Test you should receive stub data when accessing cached properties
@@ -68,5 +79,9 @@ class TestSandbox(unittest.TestCase):
 
         self.assertEqual(export, json.loads(example_export_response)['export'])
 
+        fp = six.StringIO()
+        eq.stream(fp)
+        self.assertEqual(fp.getvalue().strip(), export.strip())
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)
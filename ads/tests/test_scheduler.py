@@ -0,0 +1,175 @@
+"""
+Tests for the rate limit scheduler
+"""
+import threading
+import unittest
+
+from mock import patch
+
+import ads.config
+from ads.base import BaseQuery
+from ads.cache import ResponseCache
+from ads.config import SEARCH_URL, BIGQUERY_URL, EXPORT_URL
+from ads.exceptions import BudgetExceededError
+from ads.scheduler import Scheduler, Job, current_job, INTERACTIVE, BULK
+from ads.utils import ordered_map
+from .mocks import MockApiResponse
+
+
+def headers(limit, remaining, reset):
+    return {"x-ratelimit-limit": str(limit),
+            "x-ratelimit-remaining": str(remaining),
+            "x-ratelimit-reset": str(reset)}
+
+
+class TestScheduler(unittest.TestCase):
+    """
+    Test the Scheduler object
+    """
+
+    def setUp(self):
+        self.scheduler = Scheduler(reserve=0.1)
+        self.scheduler.update(SEARCH_URL, headers(100, 50, 1100))
+
+    def test_update(self):
+        """
+        Rate limits are kept per endpoint, and only lowered by late
+        responses of the same window
+        """
+        s = self.scheduler
+        s.update(EXPORT_URL, {})
+        s.update(EXPORT_URL, headers(100, "", 1100))
+        self.assertEqual(list(s.limits()), ["search/query"])
+        s.update(SEARCH_URL, headers(100, 60, 1100))
+        self.assertEqual(s.limits()["search/query"]["remaining"], 50)
+        s.update(SEARCH_URL, headers(100, 99, 2100))
+        self.assertEqual(s.limits()["search/query"],
+                         {"limit": 100, "remaining": 99, "reset": 2100})
+
+    def test_endpoints(self):
+        """
+        The endpoints of a service have rate limits of their own
+        """
+        s = self.scheduler
+        self.assertEqual(s.endpoint(SEARCH_URL + "?q=star"), "search/query")
+        s.update(BIGQUERY_URL, headers(100, 2, 1100))
+        self.assertEqual(s.limits()["search/bigquery"]["remaining"], 2)
+        self.assertEqual(s.limits()["search/query"]["remaining"], 50)
+        self.assertEqual(s.delay(SEARCH_URL, BULK, now=1000), 0)
+        self.assertEqual(s.delay(BIGQUERY_URL, BULK, now=1000), 100)
+
+    def test_pacing(self):
+        """
+        Bulk requests are spread evenly over the rest of the window and do
+        not use the reserve of interactive requests
+        """
+        s = self.scheduler
+        self.assertEqual(s.delay(EXPORT_URL, BULK, now=1000), 0)
+        self.assertEqual(s.delay(SEARCH_URL, BULK, now=1000), 0)
+        with patch("ads.scheduler.time.time", return_value=1000):
+            s.acquire(SEARCH_URL, BULK)
+        # 39 requests left to bulk for 100s
+        self.assertAlmostEqual(s.delay(SEARCH_URL, BULK, now=1000), 100. / 39)
+        self.assertEqual(s.delay(SEARCH_URL, INTERACTIVE, now=1000), 0)
+
+        s.update(SEARCH_URL, headers(100, 10, 1100))
+        self.assertEqual(s.delay(SEARCH_URL, BULK, now=1050), 50)
+        self.assertEqual(s.delay(SEARCH_URL, INTERACTIVE, now=1050), 0)
+        s.update(SEARCH_URL, headers(100, 0, 1100))
+        self.assertEqual(s.delay(SEARCH_URL, INTERACTIVE, now=1050), 50)
+
+        # the window is forgotten after its reset
+        self.assertEqual(s.delay(SEARCH_URL, BULK, now=1100), 0)
+        self.assertEqual(s.limits(), {})
+
+    def test_priority(self):
+        """
+        Bulk requests wait while interactive requests are waiting
+        """
+        s = self.scheduler
+        s._interactive = 1
+        done = threading.Event()
+
+        def bulk():
+            s.acquire(SEARCH_URL, BULK)
+            done.set()
+        thread = threading.Thread(target=bulk)
+        thread.start()
+        self.assertFalse(done.wait(0.1))
+        with s._cond:
+            s._interactive = 0
+            s._cond.notify_all()
+        self.assertTrue(done.wait(5))
+        thread.join()
+
+    def test_try_acquire(self):
+        """
+        try_acquire counts the request if it may be sent now, and otherwise
+        returns the time to wait, without blocking
+        """
+        s = self.scheduler
+        with patch("ads.scheduler.time.time", return_value=1000):
+            self.assertEqual(s.try_acquire(SEARCH_URL, BULK), 0)
+            self.assertEqual(s.limits()["search/query"]["remaining"], 49)
+            self.assertAlmostEqual(s.try_acquire(SEARCH_URL, BULK), 100. / 39)
+            self.assertEqual(s.try_acquire(SEARCH_URL), 0)
+            s._interactive = 1
+            self.assertEqual(s.try_acquire(EXPORT_URL, BULK), s.POLL)
+            s.update(SEARCH_URL, headers(100, 0, 1100))
+            self.assertEqual(s.try_acquire(SEARCH_URL), 100)
+        self.assertEqual(s.limits()["search/query"]["remaining"], 0)
+
+    def test_jobs(self):
+        """
+        Requests count against the budget of their job, in worker threads
+        too, and are scheduled in the lane of the job
+        """
+        s = self.scheduler
+        job = Job("nightly", budget=3)
+        self.assertIsNone(current_job())
+        with job:
+            self.assertIs(current_job(), job)
+            with patch.object(s, "_delay", wraps=s._delay) as delay:
+                list(ordered_map(lambda _: s.acquire(SEARCH_URL), range(2), 2))
+            self.assertEqual(set(c[0][1] for c in delay.call_args_list),
+                             set([BULK]))
+            s.acquire(SEARCH_URL)
+            self.assertEqual(job.remaining, 0)
+            with self.assertRaises(BudgetExceededError):
+                s.acquire(SEARCH_URL)
+        self.assertIsNone(current_job())
+        self.assertEqual(job.used, 3)
+        self.assertRaises(ValueError, Job, priority="urgent")
+
+
+class TestBaseQuery(unittest.TestCase):
+    """
+    Test that the requests of BaseQuery go through ads.config.scheduler
+    """
+
+    def setUp(self):
+        ads.config.scheduler = Scheduler()
+
+    def tearDown(self):
+        ads.config.scheduler = None
+        ads.config.cache = None
+
+    def test_request(self):
+        """
+        Requests wait for the scheduler and update it with their rate limit
+        headers; cached responses do not
+        """
+        s = ads.config.scheduler
+        ads.config.cache = ResponseCache()
+        with patch.object(s, "acquire", wraps=s.acquire) as acquire, \
+                patch.object(s, "update", wraps=s.update) as update, \
+                MockApiResponse("http://api.unittest"):
+            for _ in range(2):
+                BaseQuery()._request("GET", "http://api.unittest")
+        acquire.assert_called_once_with("http://api.unittest")
+        self.assertEqual(update.call_count, 1)
+        self.assertEqual(update.call_args[0][1]["x-ratelimit-limit"], "400")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,18 +2,31 @@
 """
 Tests for the search interface
 """
+import gc
 import sys
+import json
+import pickle
+import threading
 import unittest
 import requests
 from mock import patch
 import six
 import warnings
+import os
+import shutil
+from tempfile import mkdtemp
 
-from ads.tests.mocks import MockResponse, MockSolrResponse, MockExportResponse
+import ads.config
 
-from ads.search import SearchQuery, SolrResponse, APIResponse, Article, query
+from ads.tests.mocks import MockResponse, MockSolrResponse, \
+    MockExportResponse, MockBigQueryResponse
+from ads.tests.stubdata.solr import example_solr_response
+
+from ads.search import SearchQuery, SolrResponse, APIResponse, Article, \
+    BigQuery, query, fetch_references, fetch_citations, _Prefetcher, \
+    _ArticlePage
 from ads.exceptions import APIResponseError, SolrResponseParseError
-from ads.config import SEARCH_URL, EXPORT_URL
+from ads.config import SEARCH_URL, EXPORT_URL, BIGQUERY_URL
 
 
 class TestArticle(unittest.TestCase):
@@ -71,6 +84,40 @@ class TestArticle(unittest.TestCase):
                 msg="Instance attribute and _raw mismatch on {}".format(key)
             )
 
+    def test_single_copy(self):
+        """
+        an article should hold a single copy of its record, shared by _raw
+        and its attributes, and articles created from solr documents should
+        not copy them
+        """
+        self.assertIs(self.article._raw, self.article.__dict__)
+        self.article.volume = "552"
+        self.assertEqual(self.article._raw['volume'], "552")
+        self.assertNotIn('_page', self.article._raw)
+
+        doc = {"id": "1", "bibcode": "2013A&A...552A.143S"}
+        article = Article._from_doc(doc)
+        self.assertIs(article._raw, doc)
+        self.assertEqual(article, self.article)
+        self.assertIsNone(article._page)
+
+    def test_pickle(self):
+        """
+        an article should be pickled without the other articles of its page
+        """
+        sq = SearchQuery(q="unittest", rows=20, auto_fl=True)
+        with MockSolrResponse(sq.HTTP_ENDPOINT):
+            article = next(sq)
+        self.assertIs(article._result_page(), sq.response._page)
+        alone = Article._from_doc(dict(article._raw))
+        self.assertEqual(len(pickle.dumps(article, 2)),
+                         len(pickle.dumps(alone, 2)))
+        article.metrics = {"h": 1}
+        copy = pickle.loads(pickle.dumps(article, 2))
+        self.assertEqual(copy._raw, article._raw)
+        self.assertEqual(copy.metrics, {"h": 1})
+        self.assertIsNone(copy._page)
+
     def test_print_methods(self):
         """
         the class should return a user-friendly formatted identified when the
@@ -139,6 +186,39 @@ class TestArticle(unittest.TestCase):
             self.assertEqual(self.article.read_count, 0.0)
             self.assertIsNone(self.article.issue)
 
+    def test_get_field_batched(self):
+        """
+        lazily loading a field of an article from a search page should load
+        it for every article of the page with a single query
+        """
+        sq = SearchQuery(q="unittest", rows=5, fl=["bibcode"])
+        with MockSolrResponse(SEARCH_URL):
+            articles = list(sq)
+            with patch.object(SearchQuery, '_get_response', autospec=True,
+                              side_effect=SearchQuery._get_response) as sent, \
+                    warnings.catch_warnings(record=True):
+                pubdates = [a.pubdate for a in articles]
+        self.assertEqual(sent.call_count, 1)
+        query = sent.call_args[0][1]
+        self.assertEqual(
+            query['q'], "id:({})".format(" OR ".join(a.id for a in articles))
+        )
+        self.assertEqual(query['fl'], ['id', 'pubdate'])
+        self.assertEqual(pubdates[0], '1971-10-00')
+        self.assertEqual(pubdates[1:], ['2012-00-00'] * 4)
+
+        # smaller chunks of ids should be sent as separate queries
+        sq = SearchQuery(q="unittest", rows=5, fl=["bibcode"])
+        with MockSolrResponse(SEARCH_URL), \
+                patch('ads.search._ArticlePage.ID_CHUNK_SIZE', 2):
+            articles = list(sq)
+            with patch.object(SearchQuery, '_get_response', autospec=True,
+                              side_effect=SearchQuery._get_response) as sent, \
+                    warnings.catch_warnings(record=True):
+                articles[0].pubdate
+        self.assertEqual(sent.call_count, 3)
+        self.assertEqual(articles[1].__dict__['pubdate'], '2012-00-00')
+
     def test_get_field_bibtex(self):
         """
         should emit a warning when calling _get_field with bibtex but otherwise work
@@ -156,6 +236,7 @@ class TestArticle(unittest.TestCase):
                     self.assertEqual(msg, "bibtex should be queried with ads.ExportQuery(); "
                                           "You will hit API ratelimits very quickly otherwise.")
                 self.assertTrue(article.bibtex.startswith("@ARTICLE{2013A&A...552A.143S"))
+                self.assertNotIn("bibtex", article.keys())
 
 
 class TestSearchQuery(unittest.TestCase):
@@ -225,6 +306,317 @@ class TestSearchQuery(unittest.TestCase):
                 sq.query['cursorMark'], sq.response.json['nextCursorMark']
             )
 
+    def test_prefetch(self):
+        """
+        iterating with prefetch should return the same records as without,
+        while respecting max_pages and the rows rewrite
+        """
+        sq = SearchQuery(q="unittest", rows=1, max_pages=20, start=0)
+        with MockSolrResponse(sq.HTTP_ENDPOINT):
+            expected = [a.bibcode for a in sq]
+
+        sq = SearchQuery(q="unittest", rows=1, max_pages=20, start=0,
+                         prefetch=3)
+        with MockSolrResponse(sq.HTTP_ENDPOINT):
+            self.assertEqual([a.bibcode for a in sq], expected)
+            self.assertEqual(sq._query['start'], 20)
+            with six.assertRaisesRegex(
+                    self,
+                    StopIteration,
+                    "Maximum number of pages queried"):
+                next(sq)
+            # increasing max_pages should restart the prefetcher
+            sq.max_pages = 500
+            self.assertEqual(len(list(sq)), 28-20)
+            self.assertEqual(len(sq.articles), 28)
+
+        sq = SearchQuery(q="unittest", rows=10e6, prefetch=2)
+        with MockSolrResponse(sq.HTTP_ENDPOINT):
+            with warnings.catch_warnings(record=True) as w:
+                warnings.simplefilter("always")
+                next(sq)
+            self.assertIn("Setting this query's rows to 300",
+                          str(w[-1].message))
+            self.assertEqual(sq.query['rows'], 300)
+
+    def test_prefetch_second_page(self):
+        """
+        the second page should be requested while the first one is being
+        consumed
+        """
+        sq = SearchQuery(q="unittest", rows=10, max_pages=2, prefetch=1)
+        fetched = threading.Event()
+
+        def fetch_page(query):
+            fetched.set()
+            return SearchQuery._fetch_page(sq, query)
+        with MockSolrResponse(sq.HTTP_ENDPOINT), \
+                patch.object(sq, '_fetch_page', side_effect=fetch_page):
+            next(sq)
+            self.assertTrue(fetched.wait(5))
+            self.assertEqual(len(list(sq)), 19)
+        self.assertEqual(len(sq.articles), 20)
+
+    def test_prefetch_execute(self):
+        """
+        calling execute() while the prefetcher is running should take the
+        page from it rather than requesting that page again
+        """
+        sq = SearchQuery(q="unittest", rows=5, max_pages=4, start=0)
+        with MockSolrResponse(sq.HTTP_ENDPOINT):
+            sq.execute()
+            sq.execute()
+            expected = [a.bibcode for a in sq]
+
+        sq = SearchQuery(q="unittest", rows=5, max_pages=4, start=0,
+                         prefetch=2)
+        with MockSolrResponse(sq.HTTP_ENDPOINT):
+            sq.execute()
+            sq.execute()
+            bibcodes = [a.bibcode for a in sq]
+        self.assertEqual(bibcodes, expected)
+        self.assertEqual(len(set(bibcodes)), 20)
+
+    def test_prefetch_error_abandoned(self):
+        """
+        a prefetcher blocked on handing over an error should stop once its
+        SearchQuery is garbage collected
+        """
+        sq = SearchQuery(q="unittest", rows=1)
+        prefetcher = _Prefetcher(sq, sq.query, 0, size=1)
+        prefetcher.queue.put("a page the iterator did not take")
+        failed = threading.Event()
+
+        def fetch_page(query):
+            failed.set()
+            raise APIResponseError("error")
+        with patch.object(sq, '_fetch_page', side_effect=fetch_page):
+            prefetcher.start()
+            self.assertTrue(failed.wait(5))
+        del sq
+        for _ in range(50):
+            gc.collect()
+            prefetcher.join(0.1)
+            if not prefetcher.is_alive():
+                break
+        self.assertFalse(prefetcher.is_alive())
+
+    def test_parallel_pages(self):
+        """
+        a start based query with parallel_pages should return the records in
+        the same order as without, while respecting max_pages
+        """
+        sq = SearchQuery(q="unittest", rows=2, max_pages=500, start=0)
+        with MockSolrResponse(sq.HTTP_ENDPOINT):
+            expected = [a.bibcode for a in sq]
+
+        sq = SearchQuery(q="unittest", rows=2, max_pages=5, start=0,
+                         parallel_pages=3)
+        with MockSolrResponse(sq.HTTP_ENDPOINT):
+            self.assertEqual([a.bibcode for a in sq], expected[:10])
+            self.assertEqual(sq._query['start'], 10)
+            with six.assertRaisesRegex(
+                    self,
+                    StopIteration,
+                    "Maximum number of pages queried"):
+                next(sq)
+            sq.max_pages = 500
+            self.assertEqual([a.bibcode for a in sq], expected[10:])
+            with six.assertRaisesRegex(
+                    self,
+                    StopIteration,
+                    "All records found"):
+                next(sq)
+
+    def test_parallel_pages_execute(self):
+        """
+        calling execute() while the parallel_pages pool is running should
+        not make the iterator return pages twice or skip pages
+        """
+        sq = SearchQuery(q="unittest", rows=2, max_pages=10, start=0)
+        with MockSolrResponse(sq.HTTP_ENDPOINT):
+            expected = [a.bibcode for a in sq]
+
+        sq = SearchQuery(q="unittest", rows=2, max_pages=10, start=0,
+                         parallel_pages=3)
+        with MockSolrResponse(sq.HTTP_ENDPOINT):
+            bibcodes = [next(sq).bibcode for _ in range(5)]
+            sq.execute()
+            bibcodes += [a.bibcode for a in sq]
+        self.assertEqual(bibcodes, expected)
+        self.assertEqual(len(set(bibcodes)), 20)
+
+    def test_stream(self):
+        """
+        with retain=False, or via stream(), consumed pages should be dropped
+        while iteration and progress behave as when retaining them
+        """
+        sq = SearchQuery(q="unittest", rows=5, max_pages=500, start=0,
+                         hl=['abstract'])
+        with MockSolrResponse(sq.HTTP_ENDPOINT):
+            expected = [a.bibcode for a in sq]
+
+        sq = SearchQuery(q="unittest", rows=5, max_pages=500, start=0,
+                         hl=['abstract'], retain=False)
+        with MockSolrResponse(sq.HTTP_ENDPOINT):
+            bibcodes = []
+            for article in sq:
+                bibcodes.append(article.bibcode)
+                self.assertLessEqual(len(sq.articles), 5)
+                self.assertIn(article, sq.articles)
+            self.assertEqual(bibcodes, expected)
+            self.assertEqual(sq.progress, "28/28")
+
+        # a kept article does not keep its page alive once the query moved on
+        for kwargs in [{}, {"incremental": True}]:
+            sq = SearchQuery(q="unittest", rows=5, max_pages=2, start=0,
+                             **kwargs)
+            with MockSolrResponse(sq.HTTP_ENDPOINT):
+                stream = sq.stream()
+                kept = next(stream)
+                self.assertIsNotNone(kept._result_page())
+                self.assertEqual(len(list(stream)), 9)
+            gc.collect()
+            self.assertIsNone(kept._result_page())
+
+        sq = SearchQuery(q="unittest", rows=5, max_pages=2, start=0)
+        with MockSolrResponse(sq.HTTP_ENDPOINT):
+            self.assertEqual([a.bibcode for a in sq.stream()], expected[:10])
+            self.assertEqual(len(sq.articles), 5)
+            self.assertEqual(sq.progress, "10/28")
+
+    def test_pages(self):
+        """
+        pages() should generate the articles of each page that has not been
+        retrieved yet, without retaining them
+        """
+        sq = SearchQuery(q="unittest", rows=5, max_pages=500, start=0)
+        with MockSolrResponse(sq.HTTP_ENDPOINT):
+            expected = [a.bibcode for a in sq]
+
+        for kwargs in [{}, {"prefetch": 2}]:
+            sq = SearchQuery(q="unittest", rows=5, max_pages=4, start=0,
+                             **kwargs)
+            with MockSolrResponse(sq.HTTP_ENDPOINT):
+                pages = [[a.bibcode for a in page] for page in sq.pages()]
+                self.assertEqual(sum(pages, []), expected[:20])
+                self.assertEqual([len(page) for page in pages], [5] * 4)
+                self.assertLessEqual(len(sq.articles), 5)
+                sq.max_pages = 500
+                self.assertEqual(sum([[a.bibcode for a in page]
+                                      for page in sq.pages()], []),
+                                 expected[20:])
+                self.assertEqual(list(sq.pages()), [])
+
+    def test_incremental(self):
+        """
+        with incremental=True, articles should be returned as the body of
+        each page is parsed, and iteration, progress and highlights should
+        behave as for whole pages
+        """
+        sq = SearchQuery(q="unittest", rows=10, max_pages=500, start=0,
+                         hl=['abstract'])
+        with MockSolrResponse(sq.HTTP_ENDPOINT):
+            expected = [a.bibcode for a in sq]
+
+        sq = SearchQuery(q="unittest", rows=10, max_pages=500, start=0,
+                         hl=['abstract'], incremental=True)
+        with MockSolrResponse(sq.HTTP_ENDPOINT):
+            article = next(sq)
+            self.assertIsNone(sq.response)
+            bibcodes = [article.bibcode] + [a.bibcode for a in sq]
+        self.assertEqual(bibcodes, expected)
+        self.assertEqual(sq.progress, "28/28")
+        self.assertEqual(len(sq.articles), 28)
+        self.assertIsNone(sq.response.docs)
+        self.assertEqual(sq.response.articles, sq.articles[20:])
+        self.assertIn(sq.articles[0].id, sq._highlights)
+
+        sq = SearchQuery(q="unittest", rows=10, max_pages=2, start=0,
+                         incremental=True, retain=False)
+        with MockSolrResponse(sq.HTTP_ENDPOINT):
+            self.assertEqual([a.bibcode for a in sq], expected[:20])
+        self.assertEqual(len(sq.articles), 10)
+
+        with self.assertRaises(AssertionError):
+            SearchQuery(q="unittest", incremental=True, prefetch=2)
+
+    def test_auto_fl(self):
+        """
+        with auto_fl, lazily loaded fields should be requested in the "fl" of
+        the following pages, and optionally persisted per query
+        """
+        sq = SearchQuery(q="unittest", rows=5, max_pages=3, start=0,
+                         fl=["bibcode"], auto_fl=True)
+        # separate mock contexts, since ads.sandbox.Article enters and exits
+        # its own when lazy loading
+        with MockSolrResponse(sq.HTTP_ENDPOINT):
+            first = next(sq)
+        with MockSolrResponse(sq.HTTP_ENDPOINT):
+            with warnings.catch_warnings(record=True):
+                first.pubdate
+        with MockSolrResponse(sq.HTTP_ENDPOINT):
+            articles = list(sq)
+        self.assertIn('pubdate', sq.query['fl'])
+        for article in articles[4:]:
+            self.assertEqual(article._raw['pubdate'], article.pubdate)
+
+        directory = mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        ads.config.auto_fl_file = os.path.join(directory, "auto_fl.json")
+        try:
+            sq = SearchQuery(q="unittest", fl=["bibcode"], auto_fl=True)
+            with MockSolrResponse(sq.HTTP_ENDPOINT):
+                with warnings.catch_warnings(record=True):
+                    next(sq).pubdate
+            self.assertEqual(
+                SearchQuery(q="unittest", fl=["bibcode"], auto_fl=True)
+                .query['fl'],
+                ['id', 'bibcode', 'pubdate']
+            )
+            self.assertNotIn(
+                'pubdate',
+                SearchQuery(q="other", fl=["bibcode"], auto_fl=True)
+                .query['fl'],
+            )
+            self.assertEqual(os.listdir(directory), ["auto_fl.json"])
+
+            # a corrupt file is treated as empty, and replaced
+            with open(ads.config.auto_fl_file, 'w') as fp:
+                fp.write('{"truncated')
+            sq = SearchQuery(q="unittest", fl=["bibcode"], auto_fl=True)
+            self.assertEqual(sq.query['fl'], ['id', 'bibcode'])
+            with MockSolrResponse(sq.HTTP_ENDPOINT):
+                with warnings.catch_warnings(record=True):
+                    next(sq).pubdate
+            with open(ads.config.auto_fl_file) as fp:
+                self.assertEqual(list(json.load(fp).values()), [['pubdate']])
+        finally:
+            ads.config.auto_fl_file = None
+
+    def test_auto_fl_prefetch(self):
+        """
+        with auto_fl and prefetch or parallel_pages, the pages requested
+        ahead should be requested again with the fields learned since
+        """
+        for kwargs in [{"prefetch": 1}, {"parallel_pages": 2}]:
+            sq = SearchQuery(q="unittest", rows=5, max_pages=4, start=0,
+                             fl=["bibcode"], auto_fl=True, **kwargs)
+            with MockSolrResponse(sq.HTTP_ENDPOINT), \
+                    warnings.catch_warnings(record=True):
+                first = next(sq)
+                first.year
+                with patch.object(SearchQuery, '_send', autospec=True,
+                                  side_effect=SearchQuery._send) as sent:
+                    articles = list(sq)
+            self.assertEqual(len(articles), 19)
+            for article in articles[4:]:
+                self.assertIn('year', article._raw)
+            # only the pages of the query, without lazy loading
+            for call in sent.call_args_list:
+                self.assertEqual(call[0][1]['q'], "unittest")
+                self.assertIn('year', call[0][1]['fl'])
+
     def test_init(self):
         """
         init should result in a properly formatted query attribute
@@ -325,6 +717,195 @@ class TestSearchQuery(unittest.TestCase):
             )
 
 
+class TestBigQuery(unittest.TestCase):
+    """
+    Tests for BigQuery and SearchQuery.from_bibcodes
+    """
+    bibcodes = ['2012GCN..13229...1S', '1971Sci...174..142S',
+                '2013A&A...552A.143S', 'not-a-bibcode']
+
+    def test_init(self):
+        """
+        the bibcodes should be sent as a newline separated payload, and a
+        bigquery should not accept more than MAX_BIBCODES
+        """
+        bq = BigQuery(self.bibcodes, fl=['bibcode'])
+        self.assertEqual(bq.query['q'], '*:*')
+        self.assertEqual(bq.query['fl'], ['id', 'bibcode'])
+        self.assertEqual(bq.payload, u"bibcode\n" + u"\n".join(self.bibcodes))
+        self.assertEqual(bq.max_pages, 4)
+
+        with six.assertRaisesRegex(self, AssertionError, ".+from_bibcodes.+"):
+            BigQuery(['bibcode'] * (BigQuery.MAX_BIBCODES + 1))
+
+    def test_iter(self):
+        """
+        iterating over a BigQuery should post the bibcodes and return the
+        matching records
+        """
+        bq = BigQuery(self.bibcodes, fl=['bibcode'])
+        with MockBigQueryResponse(BIGQUERY_URL):
+            with warnings.catch_warnings(record=True):
+                bibcodes = [a.bibcode for a in bq]
+        self.assertEqual(sorted(bibcodes), sorted(self.bibcodes[:3]))
+
+    @patch('ads.search.BigQuery.MAX_BIBCODES', 2)
+    def test_from_bibcodes(self):
+        """
+        from_bibcodes should chunk the bibcodes and stream the records of
+        every chunk
+        """
+        bibcodes = self.bibcodes + ['2007ApJ...669..741S']
+        with MockBigQueryResponse(BIGQUERY_URL):
+            with warnings.catch_warnings(record=True):
+                articles = list(
+                    SearchQuery.from_bibcodes(bibcodes, fl=['bibcode'])
+                )
+        self.assertEqual(
+            sorted(a.bibcode for a in articles),
+            sorted(self.bibcodes[:3] + ['2007ApJ...669..741S']),
+        )
+
+
+class TestCitationTree(unittest.TestCase):
+    """
+    Tests for the citation and reference trees, and lists, of articles
+    """
+
+    def setUp(self):
+        docs = json.loads(example_solr_response)['response']['docs']
+        b = self.bibcodes = [doc['bibcode'] for doc in docs]
+        # A binary tree, where paper 1 also cites its sibling 2 and
+        # paper 4 is cited by both 1 and 2
+        citation = dict(
+            (b[i], [b[j] for j in (2*i + 1, 2*i + 2) if j < len(b)])
+            for i in range(len(b))
+        )
+        citation[b[1]].append(b[2])
+        citation[b[2]].append(b[4])
+        reference = {}
+        for cited, citing in six.iteritems(citation):
+            for bibcode in citing:
+                reference.setdefault(bibcode, []).append(cited)
+        self.links = {"citation": citation, "reference": reference}
+
+    def build(self, func, *args, **kwargs):
+        """
+        Call `func` with bigquery documents that have the links of the
+        test, and return its result and the number of requests
+        """
+        filter_docs = MockBigQueryResponse.filter_docs
+
+        def linked(mock, request, docs):
+            docs = filter_docs(mock, request, docs)
+            for doc in docs:
+                for field, links in six.iteritems(self.links):
+                    doc[field] = links.get(doc['bibcode'], [])
+            return docs
+
+        # Patch the class, as the sandbox may use its own mock instances
+        with patch.object(MockBigQueryResponse, 'filter_docs', linked), \
+                MockBigQueryResponse(BIGQUERY_URL), \
+                patch.object(SearchQuery, '_get_response', autospec=True,
+                             side_effect=SearchQuery._get_response) as sent, \
+                warnings.catch_warnings(record=True):
+            result = func(*args, **kwargs)
+        # the fields requested by each bigquery
+        self.fl = [c[0][1]['fl'] for c in sent.call_args_list]
+        return result, sent.call_count
+
+    def test_build_citation_tree(self):
+        """
+        each level should be fetched with one bigquery, and papers should
+        only be children of the level they are first reached from
+        """
+        b = self.bibcodes
+        root = Article(id="1", bibcode=b[0])
+        with self.assertRaises(AttributeError):
+            root.citation_tree
+        tree, requests = self.build(root.build_citation_tree, depth=2,
+                                    fl=["title"])
+        self.assertEqual(requests, 3)
+        self.assertEqual([a.bibcode for a in tree], [b[1], b[2]])
+        self.assertIs(root.citation_tree, tree)
+        self.assertEqual([a.bibcode for a in tree[0].citation_tree],
+                         [b[3], b[4]])
+        self.assertEqual([a.bibcode for a in tree[1].citation_tree],
+                         [b[5], b[6], b[4]])
+        self.assertIs(tree[0].citation_tree[1], tree[1].citation_tree[2])
+        self.assertIn('title', tree[0]._raw)
+        # the citations of the leaves are not fetched
+        self.assertIn('citation', self.fl[1])
+        self.assertNotIn('citation', self.fl[2])
+        self.assertEqual(tree[0].citation_tree[0].citation_tree, [])
+        # the trees are not part of the records
+        self.assertNotIn('citation_tree', root.keys())
+        self.assertNotIn('citation_tree', tree[0].keys())
+
+        root = Article(id="1", bibcode=b[0], citation=[b[1], b[2]])
+        tree, requests = self.build(root.build_citation_tree, depth=5,
+                                    max_nodes=4)
+        self.assertEqual(requests, 2)
+        self.assertEqual([a.bibcode for a in tree[0].citation_tree], [b[3]])
+        self.assertEqual(tree[1].citation_tree, [])
+
+    def test_build_reference_tree(self):
+        """
+        a reference tree should follow the references of each level, and
+        papers reached from two parents should be shared
+        """
+        b = self.bibcodes
+        root = Article(id="1", bibcode=b[4])
+        tree, requests = self.build(root.build_reference_tree, depth=3)
+        self.assertEqual(requests, 3)
+        self.assertEqual([a.bibcode for a in tree], [b[1], b[2]])
+        # 2 also references its sibling 1, which is not its child
+        self.assertEqual([a.bibcode for a in tree[1].reference_tree], [b[0]])
+        self.assertIs(tree[0].reference_tree[0], tree[1].reference_tree[0])
+
+    def test_fetch_links(self):
+        """
+        fetch_citations and fetch_references should load the complete
+        lists of many articles with bigqueries, and cache them
+        """
+        b = self.bibcodes
+        articles = [Article(id=str(i), bibcode=bibcode)
+                    for i, bibcode in enumerate(b)]
+        articles[1].citation = ["cached"]
+        # httpretty is not thread safe, so the chunks are sent in turn
+        with patch.object(BigQuery, 'MAX_BIBCODES', 10):
+            result, requests = self.build(fetch_citations, articles,
+                                          workers=1)
+        self.assertEqual(requests, 3)
+        self.assertEqual(result, articles)
+        self.assertEqual(articles[0].citation, [b[1], b[2]])
+        self.assertEqual(articles[1].citation, ["cached"])
+        self.assertEqual(articles[2].citation, [b[5], b[6], b[4]])
+        self.assertEqual(articles[-1].citation, [])
+
+        result, requests = self.build(fetch_references, articles[:5])
+        self.assertEqual(requests, 1)
+        self.assertEqual(articles[4].reference, [b[1], b[2]])
+        self.assertEqual(articles[0].reference, [])
+        self.assertNotIn("reference", articles[5]._raw)
+
+        # The lazily loaded list is complete, from the stored field
+        result, requests = self.build(lambda: articles[9].reference)
+        self.assertEqual((result, requests), ([b[4]], 1))
+
+        # Lazily loading the list of an article of a page loads those of
+        # the whole page, with a single bigquery sent without a pool
+        page = [Article(id=str(i), bibcode=bibcode)
+                for i, bibcode in enumerate(b)]
+        _ArticlePage(page)
+        with patch('ads.search.ordered_map') as pool:
+            result, requests = self.build(lambda: page[2].citation)
+        self.assertEqual((result, requests), ([b[5], b[6], b[4]], 1))
+        self.assertFalse(pool.called)
+        self.assertEqual(page[0]._raw['citation'], [b[1], b[2]])
+        self.assertEqual(page[-1]._raw['citation'], [])
+
+
 class TestSolrResponse(unittest.TestCase):
     """
     Test the SolrResponse object
@@ -386,6 +967,38 @@ class TestSolrResponse(unittest.TestCase):
         with self.assertRaises(APIResponseError):
             SolrResponse.load_http_response(self.response)
 
+    def test_lean(self):
+        """
+        with ads.config.lean_responses, the body should be decoded once by
+        json_decoder and neither the raw body nor the docs kept, unless
+        ads.config.debug is set
+        """
+        decoded = []
+
+        def decoder(content):
+            decoded.append(content)
+            return json.loads(content.decode("utf-8"))
+
+        with patch.multiple(ads.config, lean_responses=True,
+                            json_decoder=decoder):
+            sr = SolrResponse.load_http_response(self.response)
+            self.assertEqual(len(decoded), 1)
+            self.assertIsInstance(decoded[0], bytes)
+            self.assertIsNone(sr._raw)
+            self.assertNotEqual(sr.response, self.response)
+            self.assertEqual(sr.response.headers, self.response.headers)
+            self.assertEqual(len(sr.articles), 28)
+            self.assertIsNone(sr.docs)
+            self.assertNotIn('docs', sr.json['response'])
+            self.assertEqual(sr.num_docs, 28)
+            self.assertEqual(sr.articles[0].doi,
+                             [u'10.1126/science.174.4005.142'])
+
+            with patch.object(ads.config, 'debug', True):
+                sr = SolrResponse.load_http_response(self.response)
+                self.assertEqual(sr._raw, self.response.text)
+                self.assertEqual(sr.response, self.response)
+
     @patch('ads.search.Article._get_field')
     def test_default_article_fields(self, patched):
         """
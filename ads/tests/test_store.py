@@ -0,0 +1,147 @@
+"""
+Tests for the local article store
+"""
+import os
+import unittest
+import warnings
+import shutil
+from tempfile import mkdtemp
+from mock import patch
+
+import ads.config
+from ads.store import ArticleStore
+from ads.search import SearchQuery
+from ads.config import SEARCH_URL, BIGQUERY_URL
+from .mocks import MockSolrResponse, MockBigQueryResponse
+
+
+class TestArticleStore(unittest.TestCase):
+    """
+    Test the ArticleStore object
+    """
+
+    def setUp(self):
+        directory = mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.store = ArticleStore(os.path.join(directory, "articles.sqlite"))
+
+    def test_upsert(self):
+        """
+        documents should be merged by bibcode, or by id if they have no
+        bibcode, keeping the union of their fields
+        """
+        self.store.upsert([
+            {"id": "1", "bibcode": "b1", "title": ["t1"]},
+            {"id": "2", "bibcode": "b2", "title": ["t2"]},
+        ])
+        self.store.upsert([
+            {"bibcode": "b1", "year": "2000"},
+            {"id": "2", "abstract": "a2"},
+            {"id": "3", "abstract": "unknown"},
+            {"title": ["no key"]},
+        ])
+        self.assertEqual(len(self.store), 2)
+        self.assertIn("b1", self.store)
+        self.assertEqual(self.store.get("b1"),
+                         {"id": "1", "bibcode": "b1", "title": ["t1"],
+                          "year": "2000"})
+        self.assertEqual(self.store.get("b2")["abstract"], "a2")
+        self.assertIsNone(self.store.get("b2", ["year"]))
+        self.assertEqual(
+            sorted(self.store.get_many(["b1", "b2", "b3"], ["title"])),
+            ["b1", "b2"]
+        )
+
+    def test_fill(self):
+        """
+        fill should set a stored field on the records that lack it
+        """
+        self.store.upsert([{"id": "1", "bibcode": "b1", "year": "2000"}])
+        records = [{"bibcode": "b1"}, {"id": 1}, {"id": "9"},
+                   {"bibcode": "b1", "year": "1999"}]
+        self.store.fill(records, "year")
+        self.assertEqual([r.get("year") for r in records],
+                         ["2000", "2000", None, "1999"])
+
+    def test_queries(self):
+        """
+        records should be stored by searches and serve lazily loaded fields
+        and bibcode lookups without requests
+        """
+        with patch.object(ads.config, "store", self.store), \
+                patch.object(SearchQuery, "_get_response", autospec=True,
+                             side_effect=SearchQuery._get_response) as sent, \
+                warnings.catch_warnings(record=True):
+            sq = SearchQuery(q="star", fl=["bibcode", "year", "abstract"],
+                             rows=10)
+            with MockSolrResponse(SEARCH_URL):
+                articles = list(sq)
+            self.assertEqual(len(self.store), 10)
+            self.assertEqual(sent.call_count, 1)
+
+            article = SearchQuery(q="star", fl=["bibcode"], rows=1)
+            with MockSolrResponse(SEARCH_URL):
+                article = next(article)
+            self.assertEqual(sent.call_count, 2)
+            self.assertEqual(article.year, articles[0].year)
+            self.assertEqual(article.abstract, articles[0].abstract)
+            self.assertEqual(sent.call_count, 2)
+
+            bibcodes = [a.bibcode for a in articles[:3]]
+            found = list(SearchQuery.from_bibcodes(bibcodes,
+                                                   fl=["bibcode", "year"]))
+            self.assertEqual([a.bibcode for a in found], bibcodes)
+            self.assertEqual(sent.call_count, 2)
+
+            with MockBigQueryResponse(BIGQUERY_URL):
+                found = list(SearchQuery.from_bibcodes(bibcodes,
+                                                       fl=["pub"]))
+            self.assertEqual(sorted(a.bibcode for a in found),
+                             sorted(bibcodes))
+            self.assertEqual(sent.call_count, 3)
+            self.assertIsNotNone(self.store.get(bibcodes[0], ["pub", "year"]))
+
+            # use_store=False fetches records the store holds
+            with MockBigQueryResponse(BIGQUERY_URL):
+                found = list(SearchQuery.from_bibcodes(
+                    bibcodes, fl=["bibcode", "year"], use_store=False
+                ))
+            self.assertEqual(len(found), 3)
+            self.assertEqual(sent.call_count, 4)
+
+            # the store cannot apply filter queries, so they bypass it
+            with MockBigQueryResponse(BIGQUERY_URL):
+                found = list(SearchQuery.from_bibcodes(
+                    bibcodes, fl=["bibcode", "year"], fq=["year:1999"]
+                ))
+            self.assertEqual(sent.call_count, 5)
+            self.assertEqual(sent.call_args[0][0].query["fq"], ["year:1999"])
+            with MockBigQueryResponse(BIGQUERY_URL):
+                found = list(SearchQuery.from_bibcodes(
+                    bibcodes, fl=["bibcode", "year"], property="refereed"
+                ))
+            self.assertEqual(sent.call_count, 6)
+
+    def test_incremental(self):
+        """
+        incremental queries should store each document before its article
+        is returned, without the values the caller sets on the article
+        """
+        with patch.object(ads.config, "store", self.store):
+            sq = SearchQuery(q="star", fl=["bibcode", "year"], rows=10,
+                             incremental=True)
+            with MockSolrResponse(SEARCH_URL):
+                article = next(sq)
+                self.assertEqual(
+                    self.store.get(article.bibcode, ["year"])["year"],
+                    article.year
+                )
+                article.note = object()
+                articles = [article] + list(sq)
+        self.assertEqual(len(self.store), 10)
+        self.assertNotIn("note", self.store.get(articles[0].bibcode,
+                                                ["year"]))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,204 @@
+"""
+Tests for the columnar result sets
+"""
+import datetime
+import json
+import unittest
+
+from ads.tests.mocks import MockSolrResponse
+from ads.tests.stubdata.solr import example_solr_response
+
+from ads.search import SearchQuery
+from ads.table import ResultTable, EncodedColumn, np
+
+try:
+    import pandas
+except ImportError:
+    pandas = None
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+@unittest.skipIf(np is None, "requires numpy")
+class TestResultTable(unittest.TestCase):
+    """
+    Test the ResultTable object
+    """
+
+    def setUp(self):
+        docs = json.loads(example_solr_response)['response']['docs']
+        self.docs = docs
+        self.table = ResultTable.from_pages(
+            [docs[:10], docs[10:]],
+            ["bibcode", "year", "citation_count", "read_count", "pub",
+             "author", "recid", "missing"]
+        )
+
+    def test_from_pages(self):
+        """
+        numeric fields should be arrays, strings dictionary encoded and
+        multivalued fields object arrays, in the order of the docs
+        """
+        t = self.table
+        self.assertEqual(len(t), len(self.docs))
+        self.assertEqual(t["year"].dtype, np.int64)
+        self.assertEqual(list(t["year"]),
+                         [int(d["year"]) for d in self.docs])
+        self.assertEqual(t["read_count"].dtype, np.float64)
+        self.assertEqual(t["recid"].dtype, np.int64)
+        self.assertIsInstance(t["pub"], EncodedColumn)
+        self.assertEqual(t["pub"].to_list(), [d["pub"] for d in self.docs])
+        self.assertLess(len(t["pub"].categories), len(t))
+        self.assertEqual(t["author"][0], self.docs[0]["author"])
+        self.assertTrue(all(v is None for v in t["missing"]))
+
+    def test_filter_sort(self):
+        """
+        filter and sort should select and order all columns together
+        """
+        t = self.table
+        pub = self.docs[0]["pub"]
+        f = t.filter((t["pub"] == pub) & (t["year"] > 1900))
+        self.assertEqual(
+            f["bibcode"].to_list(),
+            [d["bibcode"] for d in self.docs if d["pub"] == pub]
+        )
+        self.assertEqual(len(t.filter(t["pub"] == "no such journal")), 0)
+
+        s = t.sort("citation_count", reverse=True)
+        expected = sorted(self.docs, key=lambda d: -d["citation_count"])
+        self.assertEqual(s["bibcode"].to_list(),
+                         [d["bibcode"] for d in expected])
+        s = t.sort("pub")
+        self.assertEqual(s["pub"].to_list(),
+                         sorted(d["pub"] for d in self.docs))
+
+    def test_sort_missing(self):
+        """
+        missing values should sort last in both directions
+        """
+        t = ResultTable.from_pages([[
+            {"bibcode": "a", "read_count": 2.0, "pub": "B"},
+            {"bibcode": "b"},
+            {"bibcode": "c", "read_count": 5.0, "pub": "A"},
+            {"bibcode": "d", "read_count": 2.0, "pub": "B"},
+        ]], ["bibcode", "read_count", "pub"])
+        for reverse, expected in [(False, ["a", "d", "c", "b"]),
+                                  (True, ["c", "a", "d", "b"])]:
+            self.assertEqual(
+                t.sort("read_count", reverse=reverse)["bibcode"].to_list(),
+                expected)
+        self.assertEqual(t.sort("pub")["bibcode"].to_list(),
+                         ["c", "a", "d", "b"])
+        self.assertEqual(t.sort("pub", reverse=True)["bibcode"].to_list(),
+                         ["a", "d", "c", "b"])
+
+    def test_group_by(self):
+        """
+        aggregates should return one row per group
+        """
+        g = self.table.group_by("pub")
+        counts = dict(zip(g.count()["pub"], g.count()["count"]))
+        sums = dict(zip(g.sum("citation_count")["pub"],
+                        g.sum("citation_count")["citation_count"]))
+        for pub in set(d["pub"] for d in self.docs):
+            docs = [d for d in self.docs if d["pub"] == pub]
+            self.assertEqual(counts[pub], len(docs))
+            self.assertEqual(sums[pub],
+                             sum(d["citation_count"] for d in docs))
+        years = self.table.group_by("year").max("read_count")
+        self.assertEqual(list(years["year"]),
+                         sorted(set(int(d["year"]) for d in self.docs)))
+
+        # encoded keys sort on their values, not in first-seen order
+        t = ResultTable.from_pages([[
+            {"bibcode": "a", "pub": "B"},
+            {"bibcode": "b"},
+            {"bibcode": "c", "pub": "C"},
+            {"bibcode": "d", "pub": "A"},
+            {"bibcode": "e", "pub": "B"},
+        ]], ["bibcode", "pub"])
+        counts = t.group_by("pub").count()
+        self.assertEqual(list(counts["pub"]), ["A", "B", "C", None])
+        self.assertEqual(list(counts["count"]), [1, 2, 1, 1])
+
+    def test_to_columns(self):
+        """
+        SearchQuery.to_columns should page through the results without
+        creating articles
+        """
+        sq = SearchQuery(q="unittest", fl=["bibcode", "citation_count"],
+                         rows=10, max_pages=100, start=0)
+        with MockSolrResponse(sq.HTTP_ENDPOINT):
+            t = sq.to_columns()
+        self.assertEqual(t.fields, ["id", "bibcode", "citation_count"])
+        self.assertEqual(len(t), 28)
+        self.assertEqual(t["citation_count"].sum(),
+                         sum(d["citation_count"] for d in self.docs))
+        self.assertEqual(sq.articles, [])
+        self.assertEqual(sq.progress, "28/28")
+
+        # a raw query without "fl" gets the default fields
+        sq = SearchQuery(query_dict={"q": "unittest", "rows": 10})
+        with MockSolrResponse(sq.HTTP_ENDPOINT):
+            t = sq.to_columns()
+        self.assertEqual(t.fields, SearchQuery.DEFAULT_FIELDS)
+
+
+class TestExport(unittest.TestCase):
+    """
+    Test the typed DataFrame and Arrow export
+    """
+    FIELDS = ["bibcode", "year", "citation_count", "read_count", "pubdate",
+              "author"]
+
+    def setUp(self):
+        self.docs = json.loads(example_solr_response)['response']['docs']
+
+    def query(self):
+        return SearchQuery(q="unittest", fl=self.FIELDS, rows=10,
+                           max_pages=100, start=0)
+
+    @unittest.skipIf(pandas is None, "requires pandas")
+    def test_to_dataframe(self):
+        """
+        to_dataframe should build typed columns without creating articles
+        """
+        sq = self.query()
+        with MockSolrResponse(sq.HTTP_ENDPOINT):
+            df = sq.to_dataframe()
+        self.assertEqual(list(df.columns), ["id"] + self.FIELDS)
+        self.assertEqual(len(df), 28)
+        self.assertEqual(str(df["year"].dtype), "int64")
+        self.assertEqual(str(df["citation_count"].dtype), "int64")
+        self.assertEqual(str(df["read_count"].dtype), "float64")
+        self.assertTrue(str(df["pubdate"].dtype).startswith("datetime64"))
+        self.assertEqual(df["pubdate"][0],
+                         pandas.Timestamp(datetime.datetime(1971, 10, 1)))
+        self.assertEqual(df["author"][0], self.docs[0]["author"])
+        self.assertEqual(sq.articles, [])
+
+    @unittest.skipIf(pyarrow is None, "requires pyarrow")
+    def test_to_arrow(self):
+        """
+        to_arrow should build a table with typed columns
+        """
+        sq = self.query()
+        with MockSolrResponse(sq.HTTP_ENDPOINT):
+            table = sq.to_arrow()
+        self.assertEqual(table.num_rows, 28)
+        self.assertEqual(table.schema.field("year").type, pyarrow.int64())
+        self.assertEqual(table.schema.field("read_count").type,
+                         pyarrow.float64())
+        self.assertEqual(table.schema.field("author").type,
+                         pyarrow.list_(pyarrow.string()))
+        self.assertEqual(table.column("year").to_pylist(),
+                         [int(d["year"]) for d in self.docs])
+        self.assertEqual(table.column("pubdate")[0].as_py(),
+                         datetime.datetime(1971, 10, 1))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -4,7 +4,9 @@ Tests for utility functions
 import warnings
 import unittest
 
-from ads.utils import cached_property
+import time
+
+from ads.utils import cached_property, ordered_map
 
 
 class TestUtils(unittest.TestCase):
@@ -43,5 +45,41 @@ class TestUtils(unittest.TestCase):
             dc.lazy_attribute
             self.assertEqual(len(w), 0)
 
+    def test_ordered_map(self):
+        """
+        ordered_map should yield results in the order of the items, consume
+        the items at most `window` ahead, and re-raise exceptions
+        """
+        def slow_square(x):
+            time.sleep(0.01 * (5 - x % 5))
+            return x * x
+
+        self.assertEqual(
+            list(ordered_map(slow_square, range(20), workers=4)),
+            [x * x for x in range(20)]
+        )
+
+        consumed = []
+
+        def items():
+            for i in range(100):
+                consumed.append(i)
+                yield i
+
+        results = ordered_map(slow_square, items(), workers=2, window=3)
+        self.assertEqual(next(results), 0)
+        self.assertEqual(len(consumed), 3)
+        results.close()
+
+        def fail(x):
+            if x == 2:
+                raise ValueError("item 2")
+            return x
+
+        results = ordered_map(fail, range(5), workers=2)
+        with self.assertRaises(ValueError):
+            list(results)
+
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)
@@ -3,33 +3,135 @@ Utilities and helpers
 """
 
 import warnings
-from werkzeug.utils import cached_property as _cached_property
-from werkzeug._internal import _missing
+import collections
+import contextlib
+import os
+import sqlite3
+import threading
+from multiprocessing.pool import ThreadPool
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
-class cached_property(_cached_property):
+
+class cached_property(object):
     """
-    Wrap cached property to print relevant warnings
+    A property that is computed once, on first access, and then cached in
+    the instance __dict__. Computing it prints a warning, since for ads
+    objects it implies a lazy API request.
+
+    This is a non-data descriptor: once a value is cached (or explicitly
+    set) on the instance, attribute access finds it in the instance __dict__
+    without calling into this class.
     """
     def __init__(self, func, name=None, doc=None):
-        super(cached_property, self).__init__(func, name, doc)
+        self.__name__ = name or func.__name__
+        self.__module__ = func.__module__
+        self.__doc__ = doc or func.__doc__
+        self.func = func
 
     def __get__(self, obj, type=None):
-        # Essentially copying to insert a message....: 
-        # https://github.com/pallets/werkzeug/blob/master/werkzeug/utils.py
-
         if obj is None:
             return self
-        value = obj.__dict__.get(self.__name__, _missing)
-        if value is _missing:
-            # One time warning that the user is using lazy loading
-            warnings.warn(
-                "You are lazy loading attributes via '{}', and so are "
-                "making multiple calls to the API. This will impact your overall "
-                "rate limits."
-                .format(self.func.__name__),
-                UserWarning,
-            )
-            value = self.func(obj)
-            obj.__dict__[self.__name__] = value
+        value = self._compute(obj)
+        obj.__dict__[self.__name__] = value
         return value
+
+    def _compute(self, obj):
+        """
+        Compute the value for `obj`, warning of the lazy API request
+        """
+        # One time warning that the user is using lazy loading
+        warnings.warn(
+            "You are lazy loading attributes via '{}', and so are "
+            "making multiple calls to the API. This will impact your overall "
+            "rate limits."
+            .format(self.func.__name__),
+            UserWarning,
+        )
+        return self.func(obj)
+
+
+def _require_numpy(feature):
+    """
+    Raise ImportError if numpy, which `feature` needs, is not installed
+    """
+    if np is None:
+        raise ImportError("{} requires numpy".format(feature))
+
+
+def ordered_map(func, iterable, workers, window=None):
+    """
+    Apply `func` to the items of `iterable` concurrently on a pool of
+    `workers` threads, and yield the results in the order of the items.
+    Exceptions raised by `func` are re-raised when their result is reached.
+
+    :param func: function of one item
+    :param iterable: items; consumed lazily, at most `window` items ahead
+        of the results yielded so far
+    :param workers: number of threads
+    :param window: maximum number of results (pending or done) held in the
+        reorder buffer; defaults to twice the number of workers
+    """
+    from .scheduler import propagate
+    func = propagate(func)  # the requests of the threads count in the job
+    window = window or 2 * workers
+    pool = ThreadPool(workers)
+    pending = collections.deque()
+    try:
+        for item in iterable:
+            pending.append(pool.apply_async(func, (item,)))
+            if len(pending) >= window:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+    finally:
+        pool.terminate()
+
+
+class SQLiteDatabase(object):
+    """
+    An sqlite database file in WAL mode, shared by the threads and
+    processes that use it: each of them gets its own connection, since
+    sqlite connections cannot be shared between threads nor survive a fork
+    """
+    def __init__(self, path, timeout=30):
+        """
+        :param path: path of the database file, created if needed
+        :param timeout: seconds to wait for a lock held by another writer
+        """
+        self.path = os.path.expanduser(path)
+        self.timeout = timeout
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.connection().execute("PRAGMA journal_mode=WAL")
+
+    def connection(self):
+        """
+        Return the connection of the current thread, in autocommit mode
+        """
+        pid, conn = getattr(self._local, "connection", (None, None))
+        if pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout,
+                                   isolation_level=None)
+            self._local.connection = (os.getpid(), conn)
+        return conn
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        Context manager for a write transaction on the connection of the
+        current thread
+        """
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
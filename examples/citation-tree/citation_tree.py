@@ -6,18 +6,25 @@ __author__ = "Andy Casey <acasey@mso.anu.edu.au>"
 
 import ads
 
+import json
+
 # Let's grab a paper to build a citation tree from
-paper = ads.search("^Hubble, E", sort="citations", order="desc")[0]
+paper = list(ads.SearchQuery(q="author:\"^Hubble, E\"", sort="citation_count desc",
+                             rows=1, fl=["bibcode", "author", "citation"]))[0]
 
 # Build our citation tree to a depth of 2
-paper.build_citation_tree(depth=2)
+paper.build_citation_tree(depth=2, fl=["author"])
 
 # Make a function that turns "Lastname, Firstname I." -> "Lastname, F"
 pretty_author_name = lambda author: author.split(",")[0] + author.split(",")[1].strip()[1] + "."
 
-# Export the network to citation-tree.json
-ads.network.export(paper, "citations", "citation-tree.json",
-    article_repr=lambda article: pretty_author_name(article.author[0]),
-    new_branch_repr=lambda article, branch: {"name": pretty_author_name(article.author[0]), "children": branch},
-    end_branch_repr=lambda article: {"name": pretty_author_name(article.author[0])},
-    indent=2, clobber=True)
+def branch(article):
+    node = {"name": pretty_author_name(article.author[0])}
+    children = article.citation_tree
+    if children:
+        node["children"] = [branch(child) for child in children]
+    return node
+
+# Export the network to citation_tree.json
+with open("citation_tree.json", "w") as fp:
+    json.dump(branch(paper), fp, indent=2)